@@ -0,0 +1,112 @@
+"""
+Autenticación JWT sin consultas por petición.
+
+El token lleva en sus claims el rol, la sucursal y el estado del usuario
+(claims_usuario, agregados al emitirlo). JWTClaimsAuthentication arma con ellos
+un Usuario en memoria (con su Rol) sin ir a la base de datos: get_queryset y
+perform_create pueden leer `user.id_rol.numero_rol` y `user.id_sucursal_id` gratis.
+Leer `user.id_sucursal` (el objeto) sí hace una consulta perezosa.
+
+Para que desactivar un usuario (o cambiarle rol o sucursal) tenga efecto
+inmediato se registra una revocación: se rechazan sus tokens emitidos hasta ese
+momento. La lista de revocaciones vigentes se guarda en la caché compartida
+(CACHE_REVOCACIONES) y se invalida al confirmar cada revocación; solo se lee de
+la base de datos cuando la caché está vacía.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevocacionToken, Rol, Usuario
+
+CACHE_REVOCACIONES = 'auth:revocaciones'
+CLAIMS = ('id_rol', 'numero_rol', 'nombre_rol', 'id_sucursal', 'activo', 'nombre_apellido')
+
+
+def claims_usuario(usuario):
+    """Claims que permiten reconstruir el usuario sin consultar la base de datos"""
+    return {
+        'id_rol': usuario.id_rol_id,
+        'numero_rol': usuario.id_rol.numero_rol,
+        'nombre_rol': usuario.id_rol.nombre_rol,
+        'id_sucursal': usuario.id_sucursal_id,
+        'activo': usuario.activo,
+        'nombre_apellido': usuario.nombre_apellido,
+    }
+
+
+def revocar(usuario_id, motivo):
+    """Rechaza los tokens ya emitidos del usuario (efectivo al confirmar la transacción)"""
+    RevocacionToken.objects.create(id_usuario_id=usuario_id, motivo=motivo)
+    transaction.on_commit(lambda: cache.delete(CACHE_REVOCACIONES))
+
+
+def revocaciones():
+    """
+    {id_usuario: timestamp (en segundos enteros, como el claim iat) de su última
+    revocación}. Solo cuentan las revocaciones más nuevas que la vida de un refresh
+    token: los tokens anteriores ya vencieron.
+    """
+    vigentes = cache.get(CACHE_REVOCACIONES)
+    if vigentes is None:
+        desde = timezone.now() - api_settings.REFRESH_TOKEN_LIFETIME
+        vigentes = {}
+        for usuario_id, fecha in RevocacionToken.objects.filter(fecha__gte=desde).values_list(
+            'id_usuario_id', 'fecha'
+        ).order_by('fecha'):
+            vigentes[usuario_id] = int(fecha.timestamp())
+        cache.set(CACHE_REVOCACIONES, vigentes, settings.REVOCACIONES_CACHE_SEGUNDOS)
+    return vigentes
+
+
+def revocado(usuario_id, token):
+    """
+    True si el token se emitió antes de la última revocación del usuario. iat no
+    tiene fracciones de segundo: un token del mismo segundo que la revocación (el
+    usuario reactivado o con rol nuevo que vuelve a entrar enseguida) es válido.
+    """
+    revocacion = revocaciones().get(usuario_id)
+    return revocacion is not None and token.get('iat', 0) < revocacion
+
+
+class JWTClaimsAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que construye el usuario desde los claims. Los tokens sin
+    claims (emitidos antes de este cambio) siguen el camino normal con consulta.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+
+        try:
+            # simplejwt guarda el id como texto
+            usuario_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken('El token no identifica a ningún usuario')
+
+        if not validated_token['activo']:
+            raise AuthenticationFailed('Esta cuenta ha sido desactivada.', code='user_inactive')
+        if revocado(usuario_id, validated_token):
+            raise AuthenticationFailed('La sesión fue revocada. Inicie sesión nuevamente.', code='token_revoked')
+
+        usuario = Usuario(
+            id_usuario=usuario_id,
+            nombre_apellido=validated_token['nombre_apellido'],
+            id_rol=Rol(
+                id_rol=validated_token['id_rol'],
+                numero_rol=validated_token['numero_rol'],
+                nombre_rol=validated_token['nombre_rol'],
+            ),
+            id_sucursal_id=validated_token['id_sucursal'],
+            activo=True,
+        )
+        # Instancias que representan filas existentes (no "nuevas"), para usarlas como FK
+        for instancia in (usuario, usuario.id_rol):
+            instancia._state.adding = False
+            instancia._state.db = 'default'
+        return usuario
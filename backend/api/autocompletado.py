@@ -0,0 +1,145 @@
+"""
+Índice en memoria de prefijos para los selectores de cliente y producto del POS.
+
+Cada worker guarda, por tipo, una lista ordenada de (clave, id) con las claves
+normalizadas (minúsculas, sin tildes) de cada registro activo: el nombre
+completo, cada palabra del nombre y los identificadores (CI, celulares, código
+de barras). Buscar un prefijo es un bisect sobre la lista más un recorrido
+mientras las claves empiecen con él; con varios términos, el primero busca y
+los demás deben ser prefijo de alguna clave del mismo registro.
+
+En cada búsqueda se compara el contador de versión del tipo ('clientes' o
+'productos', una consulta por PK). Si cambió, no se reconstruye todo: se releen
+solo las filas con updated_at posterior a la última sincronización (menos un
+margen, por las transacciones que confirman tarde) y se quitan/insertan sus
+claves. Cambios masivos (más de UMBRAL_RECONSTRUIR filas) reconstruyen el índice.
+
+Las respuestas son tuplas cortas, no el serializer completo:
+- clientes: [id_cliente, nombre_apellido, cedula_identidad, celular]
+- productos: [id_producto, nombre_producto, codigo_barras, precio]
+"""
+import threading
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from . import versiones
+from .busqueda import normalizar
+from .models import Cliente, Producto
+
+MARGEN_SINCRONIZACION = timedelta(minutes=5)
+UMBRAL_RECONSTRUIR = 5000
+
+
+def _fila_cliente(cliente):
+    etiqueta = (cliente['id_cliente'], cliente['nombre_apellido'], cliente['cedula_identidad'], cliente['celular'])
+    return etiqueta, (cliente['cedula_identidad'], cliente['celular'], cliente['otro_numero_celular'])
+
+
+def _fila_producto(producto):
+    etiqueta = (
+        producto['id_producto'], producto['nombre_producto'], producto['codigo_barras'], f'{producto["precio"]:.2f}'
+    )
+    return etiqueta, (producto['codigo_barras'],)
+
+
+class IndicePrefijos:
+    def __init__(self, modelo, clave_version, campos, fila):
+        self.modelo = modelo
+        self.clave_version = clave_version
+        self.campos = ('activo', 'updated_at') + campos
+        self.fila = fila
+        self.lock = threading.Lock()
+        self.version = None
+        self.sincronizado = None  # updated_at más reciente leído
+        self.entradas = []  # [(clave, id)] ordenada
+        self.claves = {}  # id -> claves del registro
+        self.etiquetas = {}  # id -> tupla de respuesta
+
+    def _claves(self, etiqueta, identificadores):
+        nombre = normalizar(etiqueta[1])
+        claves = {nombre, *nombre.split()}
+        claves.update(normalizar(str(i)).replace(' ', '') for i in identificadores if i)
+        claves.discard('')
+        return claves
+
+    def _quitar(self, pk):
+        for clave in self.claves.pop(pk, ()):
+            posicion = bisect_left(self.entradas, (clave, pk))
+            if posicion < len(self.entradas) and self.entradas[posicion] == (clave, pk):
+                del self.entradas[posicion]
+        self.etiquetas.pop(pk, None)
+
+    def _leer(self, filas):
+        for registro in filas.values(*self.campos).iterator(chunk_size=5000):
+            if self.sincronizado is None or registro['updated_at'] > self.sincronizado:
+                self.sincronizado = registro['updated_at']
+            etiqueta, identificadores = self.fila(registro)
+            yield etiqueta[0], registro['activo'], etiqueta, identificadores
+
+    def _reconstruir(self):
+        self.sincronizado = None
+        entradas, claves, etiquetas = [], {}, {}
+        for pk, activo, etiqueta, identificadores in self._leer(self.modelo.objects.all()):
+            if not activo:
+                continue
+            claves[pk] = self._claves(etiqueta, identificadores)
+            etiquetas[pk] = etiqueta
+            entradas.extend((clave, pk) for clave in claves[pk])
+        entradas.sort()
+        self.entradas, self.claves, self.etiquetas = entradas, claves, etiquetas
+
+    def _sincronizar(self, version):
+        if self.version is None or self.sincronizado is None:
+            self._reconstruir()
+        else:
+            cambios = self.modelo.objects.filter(updated_at__gte=self.sincronizado - MARGEN_SINCRONIZACION)
+            if cambios.count() > UMBRAL_RECONSTRUIR:
+                self._reconstruir()
+            else:
+                for pk, activo, etiqueta, identificadores in list(self._leer(cambios)):
+                    self._quitar(pk)
+                    if activo:
+                        self.claves[pk] = self._claves(etiqueta, identificadores)
+                        self.etiquetas[pk] = etiqueta
+                        for clave in self.claves[pk]:
+                            insort(self.entradas, (clave, pk))
+        self.version = version
+
+    def buscar(self, termino, limite=10):
+        """Tuplas de los registros activos cuyo nombre o identificador empieza con los términos"""
+        terminos = normalizar(termino).split()
+        if not terminos:
+            return []
+        version, = versiones.obtener(self.clave_version)
+        with self.lock:
+            if version != self.version:
+                self._sincronizar(version)
+
+            primero, resto = terminos[0], terminos[1:]
+            resultados, vistos = [], set()
+            posicion = bisect_left(self.entradas, (primero,))
+            while posicion < len(self.entradas) and len(resultados) < limite:
+                clave, pk = self.entradas[posicion]
+                if not clave.startswith(primero):
+                    break
+                posicion += 1
+                if pk in vistos:
+                    continue
+                vistos.add(pk)
+                claves = self.claves[pk]
+                if all(any(c.startswith(t) for c in claves) for t in resto):
+                    resultados.append(self.etiquetas[pk])
+            return resultados
+
+
+# Una instancia por tipo y proceso (worker de Gunicorn)
+INDICES = {
+    'clientes': IndicePrefijos(
+        Cliente, versiones.CLIENTES,
+        ('id_cliente', 'nombre_apellido', 'cedula_identidad', 'celular', 'otro_numero_celular'), _fila_cliente,
+    ),
+    'productos': IndicePrefijos(
+        Producto, versiones.PRODUCTOS,
+        ('id_producto', 'nombre_producto', 'codigo_barras', 'precio'), _fila_producto,
+    ),
+}
@@ -0,0 +1,193 @@
+"""
+Búsqueda de texto completo indexada para clientes, productos y servicios técnicos.
+
+SearchFilter arma un OR de `icontains` sobre varias columnas (incluidos TextField
+y columnas de tablas unidas): LIKE '%x%' no puede usar índices y cada búsqueda
+recorre la tabla entera. Aquí cada objeto buscable tiene una fila en
+indice_busqueda con sus campos concatenados y normalizados, indexada como texto
+completo:
+
+- MySQL: índice FULLTEXT con parser ngram (fragmentos de 2 caracteres)
+- SQLite: tabla FTS5 con tokenizador trigram (fragmentos de 3 caracteres)
+
+Ambos encuentran subcadenas (como icontains) desde el índice y ordenan por
+relevancia. Cada término debe aparecer (AND, como SearchFilter). Los términos
+más cortos que el fragmento mínimo, los demasiado amplios (más de
+BUSQUEDA_MAX_RESULTADOS coincidencias, para que el conjunto y el total del
+listado sigan siendo exactos) y otros motores de base de datos vuelven a
+SearchFilter.
+
+El texto de un servicio incluye el nombre de su cliente: "juan samsung" lo
+encuentra aunque los dos términos vengan de tablas distintas.
+
+Las vistas actualizan el índice al guardar (indexar/desindexar); la migración
+0028 lo llena con los datos existentes. Corregir el índice completo:
+`python manage.py reconstruir_indice_busqueda`.
+"""
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from rest_framework import filters
+
+from .models import Cliente, IndiceBusqueda, Producto, ServicioTecnico
+
+# tipo -> (modelo, campos que se indexan; 'fk__campo' para un campo de una tabla relacionada)
+TIPOS = {
+    'cliente': (Cliente, ('nombre_apellido', 'cedula_identidad', 'celular',
+                          'otro_numero_celular', 'correo_electronico')),
+    'producto': (Producto, ('nombre_producto', 'codigo_barras', 'descripcion')),
+    'servicio': (ServicioTecnico, ('numero_servicio', 'marca_dispositivo',
+                                   'modelo_dispositivo', 'descripcion_problema', 'id_cliente__nombre_apellido')),
+}
+
+# Largo mínimo de un término para que el índice lo encuentre
+LARGO_MINIMO = {'mysql': 2, 'sqlite': 3}
+
+SQL_MYSQL = (
+    'SELECT objeto_id, MATCH(texto) AGAINST (%s IN BOOLEAN MODE) AS puntaje '
+    'FROM indice_busqueda WHERE tipo = %s AND MATCH(texto) AGAINST (%s IN BOOLEAN MODE) '
+    'ORDER BY puntaje DESC LIMIT %s'
+)
+SQL_SQLITE = (
+    'SELECT i.objeto_id, -bm25(indice_busqueda_fts) AS puntaje '
+    'FROM indice_busqueda_fts JOIN indice_busqueda i ON i.id_indice = indice_busqueda_fts.rowid '
+    'WHERE indice_busqueda_fts MATCH %s AND i.tipo = %s '
+    'ORDER BY bm25(indice_busqueda_fts) LIMIT %s'
+)
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Pérez' y 'perez' se indexan y buscan igual"""
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _valor(instancia, campo):
+    for parte in campo.split('__'):
+        if instancia is None:
+            return None
+        instancia = getattr(instancia, parte)
+    return instancia
+
+
+def texto_indexable(instancia, campos):
+    return normalizar(' '.join(str(valor) for valor in (_valor(instancia, c) for c in campos) if valor))
+
+
+def instancias_indexables(modelo, campos):
+    """Queryset con solo los campos del índice (y las tablas relacionadas que usen)"""
+    relacionados = {campo.split('__')[0] for campo in campos if '__' in campo}
+    return modelo.objects.select_related(*relacionados).only(*campos)
+
+
+def indexar(tipo, *instancias):
+    """Crea o reemplaza las filas del índice de las instancias (dos consultas)"""
+    if not instancias:
+        return
+    campos = TIPOS[tipo][1]
+    filas = [
+        IndiceBusqueda(tipo=tipo, objeto_id=instancia.pk, texto=texto_indexable(instancia, campos))
+        for instancia in instancias
+    ]
+    with transaction.atomic():
+        IndiceBusqueda.objects.filter(tipo=tipo, objeto_id__in=[f.objeto_id for f in filas]).delete()
+        IndiceBusqueda.objects.bulk_create(filas)
+
+
+def desindexar(tipo, *ids):
+    IndiceBusqueda.objects.filter(tipo=tipo, objeto_id__in=ids).delete()
+
+
+def reconstruir(tipos=None, lote=2000, apps=None):
+    """
+    Vuelve a generar el índice de los tipos indicados (todos por defecto). Devuelve {tipo: filas}.
+    Desde una migración se pasa `apps` para usar los modelos históricos.
+    """
+    indice = apps.get_model('api', 'IndiceBusqueda') if apps else IndiceBusqueda
+    resultado = {}
+    for tipo in tipos or TIPOS:
+        modelo, campos = TIPOS[tipo]
+        if apps:
+            modelo = apps.get_model('api', modelo.__name__)
+        with transaction.atomic():
+            indice.objects.filter(tipo=tipo).delete()
+            filas = []
+            total = 0
+            for instancia in instancias_indexables(modelo, campos).order_by('pk').iterator(chunk_size=lote):
+                filas.append(indice(tipo=tipo, objeto_id=instancia.pk, texto=texto_indexable(instancia, campos)))
+                if len(filas) >= lote:
+                    indice.objects.bulk_create(filas)
+                    total += len(filas)
+                    filas = []
+            indice.objects.bulk_create(filas)
+            resultado[tipo] = total + len(filas)
+    return resultado
+
+
+def buscar(tipo, terminos, limite=None):
+    """
+    [(objeto_id, puntaje)] de mayor a menor relevancia, con todos los términos.
+    None si el índice no puede responder (motor sin soporte o término muy corto) o
+    si hay más de `limite` coincidencias: recortarlas cambiaría el resultado y el
+    total del listado, así que el llamador vuelve a SearchFilter.
+    """
+    minimo = LARGO_MINIMO.get(connection.vendor)
+    terminos = [normalizar(t).replace('"', '') for t in terminos]
+    terminos = [t for t in terminos if t]
+    if minimo is None or not terminos or any(len(t) < minimo for t in terminos):
+        return None
+
+    limite = limite or settings.BUSQUEDA_MAX_RESULTADOS
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            # +"frase": obligatorio y con los n-gramas en orden (subcadena)
+            consulta = ' '.join(f'+"{t}"' for t in terminos)
+            cursor.execute(SQL_MYSQL, [consulta, tipo, consulta, limite + 1])
+        else:
+            consulta = ' AND '.join(f'"{t}"' for t in terminos)
+            cursor.execute(SQL_SQLITE, [consulta, tipo, limite + 1])
+        filas = cursor.fetchall()
+    if len(filas) > limite:
+        return None
+    return [(objeto_id, float(puntaje)) for objeto_id, puntaje in filas]
+
+
+class BusquedaIndexada(filters.SearchFilter):
+    """
+    Reemplazo de SearchFilter (mismo parámetro ?search=) para vistas que declaran
+    `indice_busqueda = [(tipo, campo)]`: filtra `campo__in` los ids que devuelve el
+    índice de ese tipo (varias fuentes se combinan con OR) y ordena por relevancia.
+    Cada fuente debe contener todos los términos por sí sola: a diferencia de
+    SearchFilter, un término de una fuente y otro de otra no combinan (por eso el
+    servicio indexa también el nombre de su cliente).
+    `busqueda_prefijo` agrega campos con índice B-tree comparados por prefijo
+    (ej. numero_boleta). Si el índice no puede responder se usa `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fuentes = getattr(view, 'indice_busqueda', None)
+        terminos = self.get_search_terms(request)
+        if not fuentes or not terminos:
+            return super().filter_queryset(request, queryset, view)
+
+        condicion = Q()
+        relevancia = []
+        for tipo, campo in fuentes:
+            resultados = buscar(tipo, terminos)
+            if resultados is None:
+                return super().filter_queryset(request, queryset, view)
+            condicion |= Q(**{f'{campo}__in': [objeto_id for objeto_id, _ in resultados]})
+            relevancia += [When(**{campo: objeto_id}, then=Value(puntaje)) for objeto_id, puntaje in resultados]
+
+        for campo in getattr(view, 'busqueda_prefijo', ()):
+            condicion |= Q(**{f'{campo}__istartswith': ' '.join(terminos)})
+
+        queryset = queryset.filter(condicion)
+        if not relevancia:
+            return queryset
+        orden = queryset.query.order_by or queryset.model._meta.ordering
+        return queryset.annotate(
+            relevancia=Case(*relevancia, default=Value(0.0), output_field=FloatField())
+        ).order_by('-relevancia', *orden)
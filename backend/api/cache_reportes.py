@@ -0,0 +1,87 @@
+"""
+Caché de resultados de los dashboards de reportes.
+
+La clave combina ámbito, sucursal (o todas), rango de días locales y la versión
+de datos del rango (versiones.version_rango, una consulta): cada escritura de
+Venta, DetalleVenta o ServicioTecnico incrementa la versión de su día, por lo que
+un cambio en el rango produce otra clave y se recalcula; las entradas viejas
+quedan huérfanas y las descarta el backend de caché.
+
+Un rango ya cerrado (termina antes de hoy) solo cambia por una anulación o
+edición tardía, así que su entrada no vence. Si el rango incluye hoy, la entrada
+vence a las DASHBOARD_CACHE_TTL_HOY segundos para no acumular versiones del día.
+
+El resumen de inicio (resumen_inicio) usa el mismo esquema sobre sus 12 meses de
+series, más los contadores de productos y clientes.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.response import Response
+
+from . import versiones
+from .consultas_reportes import ConsultaInicio
+
+
+def _clave(ambito, sucursal_id, desde, hasta):
+    version = versiones.version_rango(ambito, desde, hasta, sucursal_id)
+    clave = f'dashboard:{ambito}:{sucursal_id or "todas"}:{desde:%Y%m%d}:{hasta:%Y%m%d}:v{version}'
+    if ambito == 'ventas':
+        # Los tops muestran nombres de producto: un cambio de catálogo también invalida
+        clave += f':p{versiones.obtener(versiones.PRODUCTOS)[0]}'
+    return clave
+
+
+def dashboard_cacheado(ambito):
+    """
+    Decora el get() de un dashboard (ReporteBaseView). Agrega a la respuesta
+    `cache: {hit, clave}` y la cabecera X-Cache (HIT/MISS) para medir la tasa de aciertos.
+    """
+    def decorador(get):
+        @wraps(get)
+        def envoltura(self, request, *args, **kwargs):
+            fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
+            desde = timezone.localtime(fecha_desde).date()
+            hasta = timezone.localtime(fecha_hasta).date()
+            clave = _clave(ambito, self.get_sucursal_filtro(request), desde, hasta)
+
+            datos = cache.get(clave)
+            hit = datos is not None
+            if not hit:
+                response = get(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                datos = response.data
+                cerrado = hasta < timezone.localdate()
+                cache.set(clave, datos, None if cerrado else settings.DASHBOARD_CACHE_TTL_HOY)
+
+            response = Response({**datos, 'cache': {'hit': hit, 'clave': clave}})
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response
+        return envoltura
+    return decorador
+
+
+def resumen_inicio(sucursal_id):
+    """
+    Resumen de la página de inicio de una sucursal (None = todas) desde la caché.
+    Un acierto cuesta dos consultas (versiones); un fallo, las 7 de ConsultaInicio.
+    Devuelve (datos, hit, clave).
+    """
+    consulta = ConsultaInicio(sucursal_id)
+    rango = versiones.version_rangos(('ventas', 'servicios'), consulta.desde, consulta.hoy, sucursal_id)
+    # Los conteos de servicios no tienen rango: además de los 12 meses, el contador global
+    productos, clientes, servicios = versiones.obtener(versiones.PRODUCTOS, versiones.CLIENTES, versiones.SERVICIOS)
+    clave = (
+        f'inicio:{sucursal_id or "todas"}:{consulta.hoy:%Y%m%d}'
+        f':v{rango["ventas"]}.{rango["servicios"]}:p{productos}:c{clientes}:s{servicios}'
+    )
+
+    datos = cache.get(clave)
+    hit = datos is not None
+    if not hit:
+        datos = consulta.resumen()
+        cache.set(clave, datos, settings.DASHBOARD_CACHE_TTL_HOY)
+    return datos, hit, clave
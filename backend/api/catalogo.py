@@ -0,0 +1,73 @@
+"""
+Índice en memoria del catálogo para el escaneo de códigos de barras en el POS.
+
+Cada worker guarda un diccionario codigo_barras -> EntradaCatalogo (objetos con
+__slots__, sin el overhead de instancias de modelo) y, por sucursal, las
+cantidades de stock ya consultadas. Ambos se validan en cada escaneo contra los
+contadores de versión (una consulta por PK): el catálogo se reconstruye cuando
+cambia la versión 'productos' y el stock de una sucursal se descarta cuando
+cambia 'inventario:<id>', volviéndose a leer producto por producto.
+"""
+from .models import Inventario, Producto
+from . import versiones
+
+
+class EntradaCatalogo:
+    __slots__ = ('id_producto', 'codigo_barras', 'nombre_producto', 'precio', 'foto_producto')
+
+    def __init__(self, id_producto, codigo_barras, nombre_producto, precio, foto_producto):
+        self.id_producto = id_producto
+        self.codigo_barras = codigo_barras
+        self.nombre_producto = nombre_producto
+        # Ya formateado como lo devuelve el serializer ("1250.00")
+        self.precio = f'{precio:.2f}'
+        self.foto_producto = foto_producto or None
+
+
+class IndiceCatalogo:
+    def __init__(self):
+        self.version = None
+        self.por_codigo = {}
+        # id_sucursal -> (versión, {id_producto: cantidad o None si no está en inventario})
+        self.stock = {}
+
+    def _cargar(self, version):
+        por_codigo = {}
+        filas = Producto.objects.filter(activo=True, codigo_barras__isnull=False).values_list(
+            'id_producto', 'codigo_barras', 'nombre_producto', 'precio', 'foto_producto'
+        )
+        for fila in filas.iterator(chunk_size=5000):
+            por_codigo[fila[1]] = EntradaCatalogo(*fila)
+        # Reemplazo en una sola asignación: un lector concurrente nunca ve el índice a medias
+        self.por_codigo = por_codigo
+        self.version = version
+
+    def buscar(self, codigo_barras, sucursal_id):
+        """
+        Devuelve (EntradaCatalogo, cantidad) o (None, None) si el código no existe
+        o el producto está inactivo. cantidad es None si el producto no está en
+        el inventario de la sucursal.
+        """
+        version_catalogo, version_stock = versiones.obtener(
+            versiones.PRODUCTOS, versiones.clave_inventario(sucursal_id)
+        )
+        if version_catalogo != self.version:
+            self._cargar(version_catalogo)
+
+        entrada = self.por_codigo.get(codigo_barras)
+        if entrada is None:
+            return None, None
+
+        stock = self.stock.get(sucursal_id)
+        if stock is None or stock[0] != version_stock:
+            stock = self.stock[sucursal_id] = (version_stock, {})
+        cantidades = stock[1]
+        if entrada.id_producto not in cantidades:
+            cantidades[entrada.id_producto] = Inventario.objects.filter(
+                id_sucursal_id=sucursal_id, id_producto_id=entrada.id_producto
+            ).values_list('cantidad', flat=True).first()
+        return entrada, cantidades[entrada.id_producto]
+
+
+# Una instancia por proceso (worker de Gunicorn)
+indice_catalogo = IndiceCatalogo()
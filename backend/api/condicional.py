@@ -0,0 +1,60 @@
+"""
+GET condicional (ETag / If-None-Match) para datos de referencia.
+
+Categorías, sucursales, roles y productos se vuelven a pedir en casi todas las
+páginas. Cada escritura incrementa su contador de versión (versiones.py), así
+que la versión identifica el contenido: el ETag combina las versiones de las que
+depende la vista, la URL completa (filtros, página, ?fields=), el formato y el
+ámbito del usuario (rol y sucursal, que cambian lo que ve). Si el navegador
+envía ese mismo ETag en If-None-Match se responde 304 tras una sola consulta
+(las versiones), sin ejecutar el listado ni el serializer.
+
+La versión se lee antes que los datos: si una escritura se confirma entre ambas
+lecturas, la respuesta lleva datos nuevos con el ETag viejo y la siguiente
+petición simplemente los vuelve a descargar (nunca al revés).
+"""
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import versiones
+
+
+class ETagVersionMixin:
+    """list y retrieve con ETag; la vista declara `versiones_etag` (claves de versiones.py)"""
+    versiones_etag = ()
+
+    def calcular_etag(self, request):
+        user = request.user
+        base = '|'.join(str(valor) for valor in (
+            self.basename,
+            versiones.obtener(*self.versiones_etag),
+            getattr(user, 'id_rol_id', None),
+            getattr(user, 'id_sucursal_id', None),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        ))
+        return f'"{hashlib.md5(base.encode()).hexdigest()}"'
+
+    def _condicional(self, vista, request, *args, **kwargs):
+        etag = self.calcular_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = vista(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        # El navegador guarda la respuesta pero revalida siempre (el 304 le llega a JS como 200)
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._condicional(super().retrieve, request, *args, **kwargs)
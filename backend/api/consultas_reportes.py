@@ -0,0 +1,427 @@
+"""
+Capa de consultas de los reportes de ventas y servicios técnicos (y del resumen
+de la página de inicio).
+
+Todas las secciones comparten un único conjunto de filtros (rango de fechas,
+sucursal) que se aplica tanto sobre Venta como sobre DetalleVenta por JOIN
+(id_venta__...), sin subconsultas id_venta__in ni recorridos en Python.
+
+Agrupación por hora/día local en la base de datos: se suma a fecha_venta el
+desfase de America/La_Paz (UTC-4, sin horario de verano) y se extrae en UTC.
+Así no se usa CONVERT_TZ, que en MySQL requiere cargar las tablas de zonas
+horarias y devuelve NULL si no están.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db.models import (
+    Avg, Count, DateTimeField, DecimalField, DurationField, ExpressionWrapper, F, Q, Sum, Value,
+)
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import Cliente, DetalleVenta, Producto, ResumenVentaDiario, ServicioTecnico, Venta
+
+COSTO_DETALLE = ExpressionWrapper(
+    F('costo_unitario') * F('cantidad'), output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+MONTO_DETALLE = ExpressionWrapper(
+    F('precio_venta') * F('cantidad'), output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+# Demora de un servicio entregado (recepción -> entrega), calculada en la base de datos
+DEMORA_SERVICIO = ExpressionWrapper(F('fecha_entrega') - F('fecha_inicio'), output_field=DurationField())
+
+
+class ConsultaVentas:
+    """
+    Consultas agregadas sobre las ventas de un rango [fecha_desde, fecha_hasta]
+    (datetimes aware; None = sin límite) y opcionalmente una sucursal.
+    Desde una migración se pasa `apps` para usar los modelos históricos.
+    """
+
+    def __init__(self, fecha_desde=None, fecha_hasta=None, sucursal_id=None, apps=None):
+        self.venta = apps.get_model('api', 'Venta') if apps else Venta
+        self.detalle_venta = apps.get_model('api', 'DetalleVenta') if apps else DetalleVenta
+        self.fecha_desde = fecha_desde
+        self.fecha_hasta = fecha_hasta
+        self.filtros = {}
+        if fecha_desde:
+            self.filtros['fecha_venta__gte'] = fecha_desde
+        if fecha_hasta:
+            self.filtros['fecha_venta__lte'] = fecha_hasta
+        if sucursal_id:
+            self.filtros['id_sucursal_id'] = sucursal_id
+        self.desfase = timezone.localtime(fecha_desde or timezone.now()).utcoffset()
+
+    # Bases filtradas compartidas
+
+    def ventas(self, **extra):
+        return self.venta.objects.filter(**self.filtros, **extra).order_by()
+
+    def detalles(self, **extra):
+        filtros = {f'id_venta__{campo}': valor for campo, valor in {**self.filtros, **extra}.items()}
+        return self.detalle_venta.objects.filter(**filtros).order_by()
+
+    def _hora_local(self, campo):
+        """Expresión SQL con la fecha/hora local de `campo` (desfase fijo, sin CONVERT_TZ)"""
+        return ExpressionWrapper(F(campo) + Value(self.desfase), output_field=DateTimeField())
+
+    # Secciones del dashboard
+
+    def resumen_diario(self):
+        """
+        KPIs, serie por día, estados y tipos de pago en una sola consulta agrupada
+        sobre el rollup (resumen_ventas_diario), plegada en Python.
+        """
+        resumen = ResumenVentaDiario.objects.all()
+        if self.fecha_desde:
+            resumen = resumen.filter(fecha__gte=timezone.localtime(self.fecha_desde).date())
+        if self.fecha_hasta:
+            resumen = resumen.filter(fecha__lte=timezone.localtime(self.fecha_hasta).date())
+        if 'id_sucursal_id' in self.filtros:
+            resumen = resumen.filter(id_sucursal_id=self.filtros['id_sucursal_id'])
+        filas = resumen.values('fecha', 'tipo_pago', 'estado').annotate(
+            ventas=Sum('cantidad'), monto=Sum('total'), costo_total=Sum('costo')
+        ).order_by()
+
+        dias = defaultdict(lambda: {'cantidad': 0, 'total': Decimal('0'), 'costo': Decimal('0')})
+        estados = defaultdict(int)
+        tipos_pago = defaultdict(lambda: {'cantidad': 0, 'total': Decimal('0')})
+        totales = {'cantidad': 0, 'total': Decimal('0'), 'costo': Decimal('0')}
+        for fila in filas:
+            estados[fila['estado']] += fila['ventas']
+            if fila['estado'] != 'Completada':
+                continue
+            for acumulado in (dias[fila['fecha']], totales):
+                acumulado['cantidad'] += fila['ventas']
+                acumulado['total'] += fila['monto']
+                acumulado['costo'] += fila['costo_total']
+            tipos_pago[fila['tipo_pago']]['cantidad'] += fila['ventas']
+            tipos_pago[fila['tipo_pago']]['total'] += fila['monto']
+
+        return {
+            'dias': sorted((dia, valores) for dia, valores in dias.items() if valores['cantidad'] > 0),
+            # Completada primero
+            'estados': sorted(((estado, n) for estado, n in estados.items() if n > 0), reverse=True),
+            'tipos_pago': sorted((tipo, valores) for tipo, valores in tipos_pago.items() if valores['cantidad'] > 0),
+            'totales': totales,
+        }
+
+    def por_hora(self):
+        """{hora local: cantidad de ventas completadas} agrupado en la base de datos"""
+        filas = self.ventas(estado='Completada').annotate(
+            hora=ExtractHour(self._hora_local('fecha_venta'), tzinfo=dt_timezone.utc)
+        ).values('hora').annotate(cantidad=Count('id_venta'))
+        return {fila['hora']: fila['cantidad'] for fila in filas}
+
+    def top_productos(self, limite=10):
+        return self.detalles(estado='Completada').values('id_producto__nombre_producto').annotate(
+            cantidad_total=Sum('cantidad'),
+            monto_total=Sum(MONTO_DETALLE)
+        ).order_by('-cantidad_total')[:limite]
+
+    def top_vendedores(self, limite=10):
+        return self.ventas(estado='Completada').values('id_usuario__nombre_apellido').annotate(
+            cantidad_ventas=Count('id_venta'),
+            monto_total=Sum('total_venta')
+        ).order_by('-cantidad_ventas')[:limite]
+
+    # Reconstrucción del rollup
+
+    def totales_por_dia(self):
+        """
+        Filas (id_sucursal, día local, tipo_pago, estado, cantidad, total, costo) calculadas
+        desde las ventas: dos consultas agrupadas (cabeceras y detalles) sin correlacionar.
+        """
+        claves = ('id_sucursal_id', 'tipo_pago', 'estado')
+        ventas = self.ventas().annotate(
+            dia=TruncDate(self._hora_local('fecha_venta'), tzinfo=dt_timezone.utc)
+        ).values('dia', *claves).annotate(cantidad=Count('id_venta'), total=Sum('total_venta'))
+        costos = self.detalles().annotate(
+            dia=TruncDate(self._hora_local('id_venta__fecha_venta'), tzinfo=dt_timezone.utc)
+        ).values('dia', *[f'id_venta__{clave}' for clave in claves]).annotate(costo=Sum(COSTO_DETALLE))
+
+        costo_por_clave = {
+            (fila['id_venta__id_sucursal_id'], fila['dia'], fila['id_venta__tipo_pago'], fila['id_venta__estado']):
+                fila['costo']
+            for fila in costos
+        }
+        for fila in ventas:
+            clave = (fila['id_sucursal_id'], fila['dia'], fila['tipo_pago'], fila['estado'])
+            yield (*clave, fila['cantidad'], fila['total'] or Decimal('0'), costo_por_clave.get(clave) or Decimal('0'))
+
+
+def _cero(expresion):
+    return Coalesce(expresion, Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _horas(duracion):
+    return round(duracion.total_seconds() / 3600, 1) if duracion is not None else None
+
+
+def _percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)) - 1, 0)]
+
+
+class ConsultaServicios:
+    """
+    Consultas agregadas sobre los servicios técnicos recibidos en [fecha_desde, fecha_hasta]
+    (datetimes aware; None = sin límite) y opcionalmente una sucursal.
+    """
+    ABIERTOS = ('En Reparación', 'Para Retirar')
+    # Antigüedad de las órdenes abiertas, en días cumplidos desde la recepción (hasta None = o más)
+    TRAMOS_ANTIGUEDAD = [(0, 2), (3, 7), (8, 15), (16, 30), (31, None)]
+
+    def __init__(self, fecha_desde=None, fecha_hasta=None, sucursal_id=None):
+        self.sucursal_id = sucursal_id
+        self.filtros = {}
+        if fecha_desde:
+            self.filtros['fecha_inicio__gte'] = fecha_desde
+        if fecha_hasta:
+            self.filtros['fecha_inicio__lte'] = fecha_hasta
+        if sucursal_id:
+            self.filtros['id_sucursal_id'] = sucursal_id
+        self.desfase = timezone.localtime(fecha_desde or timezone.now()).utcoffset()
+
+    def servicios(self, **extra):
+        return ServicioTecnico.objects.filter(**self.filtros, **extra).order_by()
+
+    def _hora_local(self, campo):
+        return ExpressionWrapper(F(campo) + Value(self.desfase), output_field=DateTimeField())
+
+    def kpis(self):
+        """Todos los KPIs del rango en una sola consulta con agregación condicional"""
+        entregado = Q(estado='Entregado')
+        para_retirar = Q(estado='Para Retirar')
+        en_reparacion = Q(estado='En Reparación')
+        abierto = Q(estado__in=self.ABIERTOS)
+        kpis = self.servicios().aggregate(
+            # 1. Entregados (Realizados/Cobrados)
+            monto_entregado=_cero(Sum('costo_estimado', filter=entregado)),
+            transacciones_entregado=Count('id_servicio', filter=entregado),
+            # 2. Para Retirar (Listos para entrega)
+            monto_para_retirar=_cero(Sum('costo_estimado', filter=para_retirar)),
+            transacciones_para_retirar=Count('id_servicio', filter=para_retirar),
+            # 3. En Proceso (En Taller)
+            monto_en_reparacion=_cero(Sum('costo_estimado', filter=en_reparacion)),
+            transacciones_en_reparacion=Count('id_servicio', filter=en_reparacion),
+            transacciones_anulado=Count('id_servicio', filter=Q(estado='Anulado')),
+            # Saldo por cobrar de las órdenes abiertas y adelantos recibidos
+            saldo_pendiente=_cero(Sum('saldo', filter=abierto)),
+            servicios_con_saldo=Count('id_servicio', filter=abierto & Q(saldo__gt=0)),
+            adelantos=_cero(Sum('adelanto', filter=~Q(estado='Anulado'))),
+            demora_promedio=Avg(DEMORA_SERVICIO, filter=entregado & Q(fecha_entrega__isnull=False)),
+        )
+        kpis['demora_promedio_horas'] = _horas(kpis.pop('demora_promedio'))
+        return kpis
+
+    def por_dia(self):
+        """[(día local, cantidad)] de servicios recibidos, agrupado en la base de datos"""
+        filas = self.servicios().annotate(
+            dia=TruncDate(self._hora_local('fecha_inicio'), tzinfo=dt_timezone.utc)
+        ).values('dia').annotate(cantidad=Count('id_servicio')).order_by('dia')
+        return [(fila['dia'], fila['cantidad']) for fila in filas]
+
+    def por_hora(self):
+        """{hora local: cantidad de servicios recibidos}"""
+        filas = self.servicios().annotate(
+            hora=ExtractHour(self._hora_local('fecha_inicio'), tzinfo=dt_timezone.utc)
+        ).values('hora').annotate(cantidad=Count('id_servicio'))
+        return {fila['hora']: fila['cantidad'] for fila in filas}
+
+    def demoras(self):
+        """
+        Demora recepción -> entrega de los servicios entregados, por técnico y por categoría:
+        cantidad, promedio, p50, p90 y máximo en horas. La base de datos calcula cada
+        demora y las devuelve ordenadas (una consulta de dos columnas de texto y un
+        intervalo); los percentiles se toman por rango en una sola pasada.
+        """
+        filas = self.servicios(estado='Entregado', fecha_entrega__isnull=False).annotate(
+            demora=DEMORA_SERVICIO
+        ).values_list('id_tecnico_asignado__nombre_apellido', 'id_categoria__nombre_categoria', 'demora')
+        por_tecnico = defaultdict(list)
+        por_categoria = defaultdict(list)
+        for tecnico, categoria, demora in filas.order_by('demora'):
+            por_tecnico[tecnico or 'Sin Asignar'].append(demora)
+            por_categoria[categoria or 'Sin Categoría'].append(demora)
+
+        def resumen(grupos):
+            return sorted((
+                {
+                    'nombre': nombre,
+                    'cantidad': len(demoras),
+                    'promedio_horas': _horas(sum(demoras, timedelta()) / len(demoras)),
+                    'p50_horas': _horas(_percentil(demoras, 50)),
+                    'p90_horas': _horas(_percentil(demoras, 90)),
+                    'max_horas': _horas(demoras[-1]),
+                }
+                for nombre, demoras in grupos.items()
+            ), key=lambda grupo: (-grupo['cantidad'], grupo['nombre']))
+
+        return {'por_tecnico': resumen(por_tecnico), 'por_categoria': resumen(por_categoria)}
+
+    def antiguedad(self):
+        """
+        Histograma de antigüedad de las órdenes abiertas HOY (sin filtro de fechas, solo
+        sucursal): cantidad por tramo y estado y saldo pendiente por tramo, en una consulta.
+        """
+        ahora = timezone.now()
+        abiertos = ServicioTecnico.objects.filter(estado__in=self.ABIERTOS)
+        if self.sucursal_id:
+            abiertos = abiertos.filter(id_sucursal_id=self.sucursal_id)
+
+        agregados = {}
+        for i, (desde, hasta) in enumerate(self.TRAMOS_ANTIGUEDAD):
+            tramo = Q(fecha_inicio__lte=ahora - timedelta(days=desde))
+            if hasta is not None:
+                tramo &= Q(fecha_inicio__gt=ahora - timedelta(days=hasta + 1))
+            agregados[f'en_reparacion_{i}'] = Count('id_servicio', filter=tramo & Q(estado='En Reparación'))
+            agregados[f'para_retirar_{i}'] = Count('id_servicio', filter=tramo & Q(estado='Para Retirar'))
+            agregados[f'saldo_{i}'] = _cero(Sum('saldo', filter=tramo))
+        fila = abiertos.order_by().aggregate(**agregados)
+
+        tramos = range(len(self.TRAMOS_ANTIGUEDAD))
+        return {
+            'labels': [
+                f'{desde}-{hasta} días' if hasta is not None else f'{desde}+ días'
+                for desde, hasta in self.TRAMOS_ANTIGUEDAD
+            ],
+            'en_reparacion': [fila[f'en_reparacion_{i}'] for i in tramos],
+            'para_retirar': [fila[f'para_retirar_{i}'] for i in tramos],
+            'saldo': [fila[f'saldo_{i}'] for i in tramos],
+        }
+
+
+class ConsultaInicio:
+    """
+    Resumen de la página de inicio de una sucursal (None = todas): conteos, ventas de hoy
+    y del mes, series de los últimos 7 días y 12 meses y últimos movimientos. Siempre
+    las mismas 7 consultas agregadas, sin importar cuántas ventas o servicios haya.
+    """
+    DIAS = 7
+    MESES = 12
+    ULTIMOS = 5
+
+    def __init__(self, sucursal_id=None, hoy=None):
+        self.sucursal_id = sucursal_id
+        self.hoy = hoy or timezone.localdate()
+        self.dias = [self.hoy - timedelta(days=i) for i in range(self.DIAS - 1, -1, -1)]
+        self.meses = [self.hoy.replace(day=1)]
+        while len(self.meses) < self.MESES:
+            self.meses.insert(0, (self.meses[0] - timedelta(days=1)).replace(day=1))
+        # Primer día cubierto por las series (el de los 12 meses siempre es anterior al de los 7 días)
+        self.desde = self.meses[0]
+        self.desfase = timezone.localtime().utcoffset()
+
+    def _de_sucursal(self, queryset):
+        if self.sucursal_id:
+            return queryset.filter(id_sucursal_id=self.sucursal_id)
+        return queryset
+
+    def _series(self, filas, vacio, acumular):
+        """Pliega filas por día local en las series diaria y mensual (listas paralelas)"""
+        dias = {dia: vacio() for dia in self.dias}
+        meses = {mes: vacio() for mes in self.meses}
+        for fila in filas:
+            for serie, clave in ((dias, fila['dia']), (meses, fila['dia'].replace(day=1))):
+                if clave in serie:
+                    acumular(serie[clave], fila)
+
+        def columnas(serie, formato):
+            valores = list(serie.values())
+            return {
+                'fechas': [clave.strftime(formato) for clave in serie],
+                **{campo: [valor[campo] for valor in valores] for campo in valores[0]},
+            }
+
+        return columnas(dias, '%Y-%m-%d'), columnas(meses, '%Y-%m')
+
+    def ventas(self):
+        """Hoy, mes en curso y series de ventas completadas: una consulta sobre el resumen diario"""
+        filas = self._de_sucursal(ResumenVentaDiario.objects.filter(fecha__gte=self.desde, estado='Completada'))
+        filas = [
+            {'dia': fila['fecha'], **fila}
+            for fila in filas.values('fecha', 'tipo_pago').annotate(
+                ventas=Sum('cantidad'), monto=Sum('total')
+            ).order_by()
+        ]
+
+        def vacio():
+            return {'total': Decimal('0'), 'efectivo': Decimal('0'), 'qr': Decimal('0'), 'cantidad': 0}
+
+        def acumular(valor, fila):
+            valor['total'] += fila['monto']
+            valor['cantidad'] += fila['ventas']
+            if fila['tipo_pago'] == 'Efectivo':
+                valor['efectivo'] += fila['monto']
+            elif fila['tipo_pago'] == 'QR':
+                valor['qr'] += fila['monto']
+
+        dias, meses = self._series(filas, vacio, acumular)
+        return {
+            'hoy': {'cantidad': dias['cantidad'][-1], 'total': dias['total'][-1]},
+            'mes': {'cantidad': meses['cantidad'][-1], 'total': meses['total'][-1]},
+            'dias': dias,
+            'meses': meses,
+        }
+
+    def servicios(self):
+        """Servicios recibidos (sin anulados) por día local y estado: una consulta agrupada"""
+        desde = timezone.make_aware(datetime.combine(self.desde, time.min))
+        filas = self._de_sucursal(
+            ServicioTecnico.objects.filter(fecha_inicio__gte=desde).exclude(estado='Anulado')
+        ).annotate(
+            dia=TruncDate(
+                ExpressionWrapper(F('fecha_inicio') + Value(self.desfase), output_field=DateTimeField()),
+                tzinfo=dt_timezone.utc
+            )
+        ).values('dia', 'estado').annotate(cantidad=Count('id_servicio')).order_by()
+        campos = {'En Reparación': 'en_reparacion', 'Para Retirar': 'para_retirar', 'Entregado': 'entregado'}
+
+        def vacio():
+            return {'total': 0, 'en_reparacion': 0, 'para_retirar': 0, 'entregado': 0}
+
+        def acumular(valor, fila):
+            valor['total'] += fila['cantidad']
+            valor[campos[fila['estado']]] += fila['cantidad']
+
+        dias, meses = self._series(filas, vacio, acumular)
+        return {'hoy': {'recibidos': dias['total'][-1]}, 'dias': dias, 'meses': meses}
+
+    def conteos(self):
+        """Productos y clientes activos (globales) y servicios de la sucursal: tres COUNT"""
+        servicios = self._de_sucursal(ServicioTecnico.objects.order_by()).aggregate(
+            servicios=Count('id_servicio'),
+            servicios_en_reparacion=Count('id_servicio', filter=Q(estado='En Reparación')),
+            servicios_para_retirar=Count('id_servicio', filter=Q(estado='Para Retirar')),
+        )
+        return {
+            'productos': Producto.objects.filter(activo=True).count(),
+            'clientes': Cliente.objects.filter(activo=True).count(),
+            **servicios,
+        }
+
+    def ultimas_ventas(self):
+        return list(self._de_sucursal(Venta.objects.order_by('-pk')).values(
+            'id_venta', 'numero_boleta', 'fecha_venta', 'total_venta', 'estado',
+            nombre_cliente=F('id_cliente__nombre_apellido'),
+        )[:self.ULTIMOS])
+
+    def ultimos_servicios(self):
+        return list(self._de_sucursal(ServicioTecnico.objects.order_by('-pk')).values(
+            'id_servicio', 'numero_servicio', 'marca_dispositivo', 'modelo_dispositivo', 'estado', 'fecha_inicio',
+            nombre_cliente=F('id_cliente__nombre_apellido'),
+        )[:self.ULTIMOS])
+
+    def resumen(self):
+        return {
+            'hoy': self.hoy,
+            'conteos': self.conteos(),
+            'ventas': self.ventas(),
+            'servicios': self.servicios(),
+            'ultimas_ventas': self.ultimas_ventas(),
+            'ultimos_servicios': self.ultimos_servicios(),
+        }
@@ -0,0 +1,117 @@
+"""
+Claves de idempotencia para las escrituras del POS.
+
+El cliente envía `Idempotency-Key: <uuid>` en el POST. La clave se inserta en la
+misma transacción que la escritura: si la petición se reintenta (timeout del
+navegador mientras el servidor aún confirmaba), el INSERT del reintento choca con
+el índice único (esperando a que la transacción original termine) y se devuelve
+la respuesta guardada sin volver a ejecutar la venta ni descontar stock.
+"""
+import functools
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import ClaveIdempotencia
+
+CABECERA = 'HTTP_IDEMPOTENCY_KEY'
+LARGO_MAXIMO = 100
+
+
+def _reservar(usuario, clave, ruta):
+    """Inserta la clave; devuelve None si ya existía una vigente."""
+    ahora = timezone.now()
+    try:
+        with transaction.atomic():
+            return ClaveIdempotencia.objects.create(
+                id_usuario=usuario, clave=clave, ruta=ruta,
+                expira=ahora + timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+            )
+    except IntegrityError:
+        # Una clave vencida que el job de limpieza aún no purgó se puede reutilizar
+        vencidas = ClaveIdempotencia.objects.filter(id_usuario=usuario, clave=clave, expira__lte=ahora).delete()[0]
+        if not vencidas:
+            return None
+    return _reservar(usuario, clave, ruta)
+
+
+def _repetir(usuario, clave, ruta):
+    """Respuesta para una clave ya usada: la guardada, o un error si no corresponde"""
+    registro = ClaveIdempotencia.objects.filter(id_usuario=usuario, clave=clave).first()
+    if registro is None or registro.status_code is None:
+        return Response(
+            {'error': 'La petición original con esta clave aún está en proceso'},
+            status=status.HTTP_409_CONFLICT
+        )
+    if registro.ruta != ruta:
+        return Response(
+            {'error': 'La clave de idempotencia ya se usó en otra operación'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(registro.respuesta, status=registro.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotente(vista):
+    """
+    Decorador para acciones de escritura de un ViewSet.
+    Sin cabecera Idempotency-Key la vista se ejecuta normalmente.
+    Solo se guardan respuestas exitosas: si la escritura falla (stock insuficiente,
+    validación) la clave se libera junto con el rollback y el reintento se ejecuta.
+    """
+    @functools.wraps(vista)
+    def envoltura(self, request, *args, **kwargs):
+        clave = (request.META.get(CABECERA) or '').strip()
+        if not clave or not request.user.is_authenticated:
+            return vista(self, request, *args, **kwargs)
+        if len(clave) > LARGO_MAXIMO:
+            return Response(
+                {'error': f'Idempotency-Key no puede superar {LARGO_MAXIMO} caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ruta = f'{request.method} {request.path}'[:255]
+        with transaction.atomic():
+            registro = _reservar(request.user, clave, ruta)
+            if registro is not None:
+                response = vista(self, request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    registro.status_code = response.status_code
+                    registro.respuesta = response.data
+                    registro.save(update_fields=['status_code', 'respuesta'])
+                else:
+                    registro.delete()
+                return response
+        # Fuera de la transacción: leer la respuesta ya confirmada por la petición original
+        return _repetir(request.user, clave, ruta)
+    return envoltura
+
+
+def purgar_vencidas(tamano_lote=1000):
+    """
+    Elimina las claves vencidas en lotes por PK para no bloquear la tabla
+    con un único DELETE grande mientras el POS sigue vendiendo.
+    """
+    ahora = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            ClaveIdempotencia.objects.filter(expira__lte=ahora)
+            .order_by('pk').values_list('pk', flat=True)[:tamano_lote]
+        )
+        if not ids:
+            return total
+        total += ClaveIdempotencia.objects.filter(pk__in=ids).delete()[0]
+
+
+class IdempotenciaMixin:
+    """Acepta la cabecera Idempotency-Key en el POST de creación del ViewSet"""
+
+    @idempotente
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
@@ -0,0 +1,335 @@
+"""
+Importación y exportación masiva en XLSX/CSV.
+
+Los archivos se leen en streaming (openpyxl en modo read_only, csv fila a fila)
+y se procesan por lotes, de modo que la memoria no crece con el tamaño del archivo.
+Las exportaciones se escriben igual: csv fila a fila u openpyxl en modo write_only.
+"""
+import codecs
+import csv
+import tempfile
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import openpyxl
+from django.utils import timezone
+
+from . import busqueda, versiones
+from .models import Categoria, Producto
+from .stock import fijar_stock_lote
+
+TAMANO_LOTE = 1000
+
+
+class ArchivoInvalidoError(Exception):
+    pass
+
+
+def _normalizar_encabezado(valor):
+    return str(valor or '').strip().lower().replace(' ', '_')
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera (numero_fila, dict) por cada fila de datos de un XLSX o CSV.
+    La primera fila son los encabezados. `archivo` es un objeto binario
+    (UploadedFile o archivo abierto en modo 'rb').
+    """
+    nombre = (nombre or '').lower()
+    if nombre.endswith('.xlsx'):
+        libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            yield from _filas_con_encabezado(filas)
+        finally:
+            libro.close()
+    elif nombre.endswith('.csv'):
+        yield from _filas_con_encabezado(csv.reader(codecs.iterdecode(archivo, 'utf-8-sig')))
+    else:
+        raise ArchivoInvalidoError('Formato no soportado, use .xlsx o .csv')
+
+
+def _filas_con_encabezado(filas):
+    encabezados = next(filas, None)
+    if not encabezados:
+        raise ArchivoInvalidoError('El archivo está vacío')
+    encabezados = [_normalizar_encabezado(e) for e in encabezados]
+    for numero, fila in enumerate(filas, start=2):
+        if not any(v not in (None, '') for v in fila):
+            continue
+        yield numero, dict(zip(encabezados, fila))
+
+
+def _lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # Excel guarda códigos numéricos como float
+    return str(valor).strip()
+
+
+# Límite de IntegerField (INT con signo en MySQL)
+CANTIDAD_MAXIMA = 2147483647
+
+
+def _cantidad(valor):
+    """Cantidad entera de una celda ('5', 5.0, '5.0'). ValueError si no es un entero representable"""
+    try:
+        numero = Decimal(_texto(valor))
+    except InvalidOperation:
+        raise ValueError(valor)
+    # 'inf', 'nan', '2.7' y '1e400' se rechazan en vez de truncarse o desbordar
+    if not numero.is_finite() or numero != numero.to_integral_value() or abs(numero) > CANTIDAD_MAXIMA:
+        raise ValueError(valor)
+    return int(numero)
+
+
+def importar_inventario(filas, sucursal_id, usuario=None, dry_run=False, tamano_lote=TAMANO_LOTE):
+    """
+    Aplica un conteo físico (codigo_barras, cantidad) al inventario de una sucursal.
+
+    Los productos se resuelven con un único mapa codigo_barras -> id_producto y
+    los cambios se escriben por lotes a través del servicio de stock.
+    Devuelve un resumen con el reporte de errores por fila y, en dry_run,
+    el diff que se aplicaría.
+    """
+    productos = dict(
+        Producto.objects.filter(codigo_barras__isnull=False).values_list('codigo_barras', 'id_producto')
+    )
+    resumen = {
+        'filas_procesadas': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0,
+        'errores': [], 'dry_run': dry_run,
+    }
+    if dry_run:
+        resumen['diferencias'] = []
+
+    for lote in _lotes(filas, tamano_lote):
+        cantidades, codigos = {}, {}
+        for numero, fila in lote:
+            resumen['filas_procesadas'] += 1
+            codigo = _texto(fila.get('codigo_barras', fila.get('codigo')))
+            id_producto = productos.get(codigo)
+            if not codigo:
+                resumen['errores'].append({'fila': numero, 'error': 'Falta codigo_barras'})
+                continue
+            if id_producto is None:
+                resumen['errores'].append({'fila': numero, 'codigo_barras': codigo, 'error': 'Producto no encontrado'})
+                continue
+            try:
+                cantidad = _cantidad(fila.get('cantidad'))
+            except ValueError:
+                resumen['errores'].append({'fila': numero, 'codigo_barras': codigo, 'error': 'Cantidad inválida'})
+                continue
+            if cantidad < 0:
+                resumen['errores'].append({'fila': numero, 'codigo_barras': codigo, 'error': 'Cantidad negativa'})
+                continue
+            cantidades[id_producto] = cantidad
+            codigos[id_producto] = codigo
+
+        diferencias = fijar_stock_lote(sucursal_id, cantidades, usuario=usuario, dry_run=dry_run)
+        creados = sum(1 for _, anterior, _ in diferencias if anterior is None)
+        resumen['creados'] += creados
+        resumen['actualizados'] += len(diferencias) - creados
+        resumen['sin_cambios'] += len(cantidades) - len(diferencias)
+        if dry_run:
+            resumen['diferencias'].extend(
+                {'codigo_barras': codigos[id_producto], 'cantidad_anterior': anterior, 'cantidad_nueva': nueva}
+                for id_producto, anterior, nueva in diferencias
+            )
+
+    return resumen
+
+
+# --- CATÁLOGO DE PRODUCTOS ---
+
+COLUMNAS_PRODUCTOS = ['codigo_barras', 'nombre_producto', 'descripcion', 'categoria',
+                      'precio', 'precio_compra', 'activo']
+CAMPOS_ACTUALIZABLES = ['nombre_producto', 'descripcion', 'id_categoria', 'precio', 'precio_compra',
+                        'activo', 'updated_at']
+
+
+def filas_catalogo(queryset=None):
+    """Genera las filas de exportación del catálogo sin instanciar modelos"""
+    queryset = queryset if queryset is not None else Producto.objects.all()
+    yield COLUMNAS_PRODUCTOS
+    yield from queryset.order_by('pk').values_list(
+        'codigo_barras', 'nombre_producto', 'descripcion', 'id_categoria__nombre_categoria',
+        'precio', 'precio_compra', 'activo'
+    ).iterator(chunk_size=2000)
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve la línea en lugar de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(filas):
+    """Iterador de líneas CSV (para StreamingHttpResponse)"""
+    writer = csv.writer(_Eco())
+    yield '\ufeff'  # BOM para que Excel reconozca UTF-8
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+def exportar_xlsx(filas, titulo='Datos', destino=None):
+    """
+    Escribe las filas en un libro write_only volcado a `destino` (por defecto un
+    archivo temporal; openpyxl no mantiene las filas en memoria). Devuelve el
+    archivo abierto y posicionado al inicio, listo para FileResponse.
+    """
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet(title=titulo)
+    for fila in filas:
+        hoja.append([float(v) if isinstance(v, Decimal) else v for v in fila])
+    archivo = destino if destino is not None else tempfile.TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+# Límites de Producto: precio/precio_compra DecimalField(max_digits=10, decimal_places=2)
+# y codigo_barras CharField(max_length=100)
+PRECIO_MAXIMO = Decimal('99999999.99')
+LARGO_CODIGO_BARRAS = 100
+
+
+def _decimal(valor):
+    """Precio de una celda con 2 decimales. InvalidOperation si no es un número representable"""
+    texto = _texto(valor).replace(',', '.')
+    if not texto:
+        return None
+    numero = Decimal(texto)
+    # 'nan', 'inf' y valores que no entran en la columna se rechazan por fila
+    if not numero.is_finite():
+        raise InvalidOperation(valor)
+    numero = numero.quantize(Decimal('0.01'))
+    if abs(numero) > PRECIO_MAXIMO:
+        raise InvalidOperation(valor)
+    return numero
+
+
+def _booleano(valor, defecto=True):
+    texto = _texto(valor).lower()
+    if not texto:
+        return defecto
+    return texto in ('1', 'true', 'si', 'sí', 'verdadero', 'x')
+
+
+def _resolver_categorias(nombres, categorias, dry_run):
+    """Crea en una sola pasada las categorías de producto que no existen"""
+    faltantes = {nombre.lower(): nombre for nombre in nombres if nombre.lower() not in categorias}
+    if not faltantes:
+        return 0
+    if not dry_run:
+        Categoria.objects.bulk_create(
+            [Categoria(nombre_categoria=nombre, tipo='producto') for nombre in faltantes.values()],
+            ignore_conflicts=True
+        )
+        versiones.incrementar(versiones.CATEGORIAS)
+        for id_categoria, nombre in Categoria.objects.filter(
+            tipo='producto', nombre_categoria__in=faltantes.values()
+        ).values_list('id_categoria', 'nombre_categoria'):
+            categorias[nombre.lower()] = id_categoria
+    else:
+        for clave in faltantes:
+            categorias[clave] = None
+    return len(faltantes)
+
+
+def importar_productos(filas, dry_run=False, tamano_lote=TAMANO_LOTE):
+    """
+    Upsert del catálogo por codigo_barras.
+
+    Las categorías se resuelven por nombre con un mapa precargado (las faltantes
+    se crean en bloque) y los productos se insertan/actualizan con bulk_create y
+    bulk_update por lotes. Devuelve un resumen con el reporte de errores por fila.
+    """
+    categorias = {
+        nombre.lower(): id_categoria
+        for id_categoria, nombre in Categoria.objects.filter(tipo='producto').values_list(
+            'id_categoria', 'nombre_categoria'
+        )
+    }
+    resumen = {
+        'filas_procesadas': 0, 'creados': 0, 'actualizados': 0, 'categorias_creadas': 0,
+        'errores': [], 'dry_run': dry_run,
+    }
+
+    for lote in _lotes(filas, tamano_lote):
+        validas = {}
+        for numero, fila in lote:
+            resumen['filas_procesadas'] += 1
+            codigo = _texto(fila.get('codigo_barras'))
+            nombre = _texto(fila.get('nombre_producto'))
+            if not codigo:
+                resumen['errores'].append({'fila': numero, 'error': 'Falta codigo_barras'})
+                continue
+            if not nombre:
+                resumen['errores'].append({'fila': numero, 'codigo_barras': codigo, 'error': 'Falta nombre_producto'})
+                continue
+            if len(codigo) > LARGO_CODIGO_BARRAS:
+                resumen['errores'].append({
+                    'fila': numero, 'codigo_barras': codigo[:LARGO_CODIGO_BARRAS], 'error': 'codigo_barras demasiado largo'
+                })
+                continue
+            try:
+                precio = _decimal(fila.get('precio'))
+                precio_compra = _decimal(fila.get('precio_compra')) or Decimal('0')
+            except InvalidOperation:
+                resumen['errores'].append({'fila': numero, 'codigo_barras': codigo, 'error': 'Precio inválido'})
+                continue
+            if precio is None or precio < 0 or precio_compra < 0:
+                resumen['errores'].append({'fila': numero, 'codigo_barras': codigo, 'error': 'Precio inválido'})
+                continue
+            # Solo se actualizan las columnas presentes en el archivo
+            datos = {'nombre_producto': nombre[:200], 'precio': precio}
+            if 'precio_compra' in fila:
+                datos['precio_compra'] = precio_compra
+            if 'descripcion' in fila:
+                datos['descripcion'] = _texto(fila.get('descripcion')) or None
+            if 'activo' in fila:
+                datos['activo'] = _booleano(fila.get('activo'))
+            if 'categoria' in fila:
+                datos['categoria'] = _texto(fila.get('categoria'))[:100]
+            validas[codigo] = datos
+
+        resumen['categorias_creadas'] += _resolver_categorias(
+            {datos['categoria'] for datos in validas.values() if datos.get('categoria')}, categorias, dry_run
+        )
+
+        existentes = {p.codigo_barras: p for p in Producto.objects.filter(codigo_barras__in=validas.keys())}
+        ahora = timezone.now()
+        nuevos, cambiados = [], []
+        for codigo, datos in validas.items():
+            if 'categoria' in datos:
+                nombre_categoria = datos.pop('categoria')
+                datos['id_categoria_id'] = categorias.get(nombre_categoria.lower()) if nombre_categoria else None
+            producto = existentes.get(codigo)
+            if producto is None:
+                nuevos.append(Producto(codigo_barras=codigo, **datos))
+            else:
+                for campo, valor in datos.items():
+                    setattr(producto, campo, valor)
+                producto.updated_at = ahora
+                cambiados.append(producto)
+
+        if not dry_run:
+            Producto.objects.bulk_create(nuevos)
+            Producto.objects.bulk_update(cambiados, CAMPOS_ACTUALIZABLES)
+            # bulk_create no devuelve ids en MySQL: se releen por código para indexarlos
+            busqueda.indexar('producto', *Producto.objects.filter(codigo_barras__in=validas.keys()).only(
+                *busqueda.TIPOS['producto'][1]
+            ))
+        resumen['creados'] += len(nuevos)
+        resumen['actualizados'] += len(cambiados)
+
+    if not dry_run and (resumen['creados'] or resumen['actualizados']):
+        versiones.incrementar(versiones.PRODUCTOS)
+    return resumen
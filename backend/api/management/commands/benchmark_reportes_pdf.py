@@ -0,0 +1,121 @@
+"""
+Management command to benchmark PDF report rendering
+Usage: python manage.py benchmark_reportes_pdf [--filas 1000 10000 100000] [--comparar] [--salida resultados.json]
+Mide tiempo y pico de memoria (tracemalloc) del armado del PDF con filas sintéticas
+(sin base de datos), con el mismo pipeline por partes que usan los reportes.
+"""
+import json
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+from api.reportes import (
+    ALTO_ENCABEZADO_VENTAS, ANCHOS_PDF_VENTAS, COLUMNAS_PDF_VENTAS, ESTILO_TABLA_VENTAS, ESTILOS,
+    alto_flowables, construir_pdf, tablas_por_partes,
+)
+
+
+def _filas(cantidad):
+    for idx in range(1, cantidad + 1):
+        yield [idx, '10/03/2026 23:30', f'VTA-2026-{idx:06d}', 'Cliente de prueba', 'Vendedor de prueba',
+               'Completado', '8.00', '20.00', '12.00']
+
+
+def _pie():
+    return ['', '', '', '', '', 'TOTAL:', '0.00', '0.00', '0.00']
+
+
+def _por_partes(cantidad, destino):
+    encabezados = [Paragraph('Benchmark', ESTILOS['Title']), Spacer(1, 20)]
+
+    def flowables():
+        yield from encabezados
+        yield from tablas_por_partes(
+            COLUMNAS_PDF_VENTAS, _filas(cantidad), ANCHOS_PDF_VENTAS, ESTILO_TABLA_VENTAS, pie=_pie,
+            alto_encabezado=ALTO_ENCABEZADO_VENTAS, alto_previo=alto_flowables(encabezados)
+        )
+
+    construir_pdf(destino, flowables())
+
+
+def _tabla_unica(cantidad, destino):
+    """Armado anterior: una sola Table con todas las filas (referencia para --comparar)"""
+    datos = [COLUMNAS_PDF_VENTAS, *_filas(cantidad), _pie()]
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    doc.build([Paragraph('Benchmark', ESTILOS['Title']), Spacer(1, 20),
+               Table(datos, colWidths=ANCHOS_PDF_VENTAS, style=ESTILO_TABLA_VENTAS)])
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria del armado de reportes PDF con 1k/10k/100k filas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Cantidades de filas a medir (por defecto 1000 10000 100000)',
+        )
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Mide también el armado anterior (una sola tabla) hasta --limite-comparar filas',
+        )
+        parser.add_argument(
+            '--limite-comparar',
+            type=int,
+            default=10000,
+            help='Máximo de filas para el armado anterior, que crece superlinealmente (por defecto 10000)',
+        )
+        parser.add_argument(
+            '--salida',
+            help='Guarda los resultados en este archivo JSON',
+        )
+
+    def _medir(self, renderizar, cantidad):
+        # Tiempo y memoria en pasadas separadas: tracemalloc distorsiona los tiempos
+        with tempfile.TemporaryFile() as destino:
+            inicio = time.perf_counter()
+            renderizar(cantidad, destino)
+            segundos = time.perf_counter() - inicio
+            tamano = destino.tell()
+
+        with tempfile.TemporaryFile() as destino:
+            tracemalloc.start()
+            try:
+                renderizar(cantidad, destino)
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        return {'segundos': round(segundos, 3), 'pico_mb': round(pico / 1024 / 1024, 2),
+                'bytes_pdf': tamano}
+
+    def handle(self, *args, **options):
+        modos = [('por_partes', _por_partes)]
+        if options['comparar']:
+            modos.append(('tabla_unica', _tabla_unica))
+
+        resultados = []
+        for cantidad in options['filas']:
+            for modo, renderizar in modos:
+                if modo == 'tabla_unica' and cantidad > options['limite_comparar']:
+                    continue
+                medicion = {'filas': cantidad, 'modo': modo, **self._medir(renderizar, cantidad)}
+                resultados.append(medicion)
+                self.stdout.write(
+                    f"📄 {cantidad:>7} filas [{modo}]: {medicion['segundos']:.2f} s, "
+                    f"pico {medicion['pico_mb']:.1f} MB, {medicion['bytes_pdf'] / 1024:.0f} KB"
+                )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(f"💾 Resultados guardados en {options['salida']}")
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark terminado'))
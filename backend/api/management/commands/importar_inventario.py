@@ -0,0 +1,48 @@
+"""
+Management command to bulk load a physical stock count into a sucursal
+Usage: python manage.py importar_inventario conteo.xlsx --sucursal 1 [--dry-run]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importacion import ArchivoInvalidoError, importar_inventario, leer_filas
+from api.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = 'Importa un conteo físico (codigo_barras, cantidad) desde XLSX o CSV al inventario de una sucursal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al archivo .xlsx o .csv')
+        parser.add_argument('--sucursal', type=int, required=True, help='ID de la sucursal')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar las diferencias sin guardar cambios',
+        )
+
+    def handle(self, *args, **options):
+        if not Sucursal.objects.filter(pk=options['sucursal']).exists():
+            raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resumen = importar_inventario(
+                    leer_filas(archivo, options['archivo']), options['sucursal'], dry_run=options['dry_run']
+                )
+        except (OSError, ArchivoInvalidoError) as e:
+            raise CommandError(str(e))
+
+        for diferencia in resumen.get('diferencias', []):
+            self.stdout.write(
+                f"  {diferencia['codigo_barras']}: {diferencia['cantidad_anterior']} → {diferencia['cantidad_nueva']}"
+            )
+        for error in resumen['errores']:
+            self.stdout.write(self.style.ERROR(f"  ❌ Fila {error['fila']}: {error['error']}"))
+
+        estilo = self.style.WARNING if options['dry_run'] else self.style.SUCCESS
+        prefijo = '🔍 (dry-run) ' if options['dry_run'] else '✅ '
+        self.stdout.write(estilo(
+            f"{prefijo}{resumen['filas_procesadas']} filas: {resumen['creados']} creados, "
+            f"{resumen['actualizados']} actualizados, {resumen['sin_cambios']} sin cambios, "
+            f"{len(resumen['errores'])} errores"
+        ))
@@ -0,0 +1,37 @@
+"""
+Management command to bulk import/update the product catalog
+Usage: python manage.py importar_productos catalogo.xlsx [--dry-run]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importacion import ArchivoInvalidoError, importar_productos, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos (upsert por codigo_barras) desde XLSX o CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al archivo .xlsx o .csv')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validar el archivo sin guardar cambios',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resumen = importar_productos(leer_filas(archivo, options['archivo']), dry_run=options['dry_run'])
+        except (OSError, ArchivoInvalidoError) as e:
+            raise CommandError(str(e))
+
+        for error in resumen['errores']:
+            self.stdout.write(self.style.ERROR(f"  ❌ Fila {error['fila']}: {error['error']}"))
+
+        estilo = self.style.WARNING if options['dry_run'] else self.style.SUCCESS
+        prefijo = '🔍 (dry-run) ' if options['dry_run'] else '✅ '
+        self.stdout.write(estilo(
+            f"{prefijo}{resumen['filas_procesadas']} filas: {resumen['creados']} creados, "
+            f"{resumen['actualizados']} actualizados, {resumen['categorias_creadas']} categorías nuevas, "
+            f"{len(resumen['errores'])} errores"
+        ))
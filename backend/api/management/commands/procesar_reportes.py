@@ -0,0 +1,85 @@
+"""
+Management command to run the background report worker
+Usage: python manage.py procesar_reportes [--procesos N] [--una-vez] [--intervalo S] [--limpiar-dias D]
+Dejar corriendo como servicio (systemd/supervisor) junto a Gunicorn.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.trabajos import limpiar, procesar_en_hijo, procesar_trabajo, reencolar_colgados, tomar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes PDF/Excel encolados en trabajos_reporte'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=2,
+            help='Procesos generadores en paralelo (0 = en este mismo proceso). Por defecto 2',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa la cola hasta vaciarla y termina (útil con cron o en pruebas)',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando la cola está vacía (por defecto 2)',
+        )
+        parser.add_argument(
+            '--limpiar-dias',
+            type=int,
+            default=None,
+            help='Antes de empezar, borra archivos y trabajos terminados de más de D días',
+        )
+
+    def handle(self, *args, **options):
+        procesos = options['procesos']
+
+        if options['limpiar_dias'] is not None:
+            archivos, trabajos = limpiar(options['limpiar_dias'])
+            self.stdout.write(f'🧹 {archivos} archivos y {trabajos} trabajos antiguos eliminados')
+
+        pool = None
+        if procesos > 0:
+            # Los hijos no deben heredar la conexión abierta del padre
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=procesos, initializer=django.setup)
+
+        completados = errores = 0
+        try:
+            while True:
+                reencolados = reencolar_colgados()
+                if reencolados:
+                    self.stdout.write(self.style.WARNING(f'⚠️ {reencolados} trabajos colgados vueltos a la cola'))
+
+                ids = tomar_pendientes(limite=max(procesos, 1))
+                if not ids:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                resultados = pool.map(procesar_en_hijo, ids) if pool else map(procesar_trabajo, ids)
+                for id_trabajo, ok in zip(ids, resultados):
+                    if ok:
+                        completados += 1
+                        self.stdout.write(f'📄 Trabajo {id_trabajo} completado')
+                    else:
+                        errores += 1
+                        self.stdout.write(self.style.ERROR(f'❌ Trabajo {id_trabajo} con error'))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {completados} reportes generados, {errores} con error'))
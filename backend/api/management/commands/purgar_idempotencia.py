@@ -0,0 +1,24 @@
+"""
+Management command to purge expired idempotency keys
+Usage: python manage.py purgar_idempotencia [--lote N]
+Programar con cron (p. ej. cada hora).
+"""
+from django.core.management.base import BaseCommand
+
+from api.idempotencia import purgar_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Elimina en lotes las claves de idempotencia vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de claves a eliminar por sentencia (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        total = purgar_vencidas(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} claves de idempotencia eliminadas'))
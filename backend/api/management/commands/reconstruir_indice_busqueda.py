@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the full-text search index
+Usage: python manage.py reconstruir_indice_busqueda [--tipo cliente|producto|servicio]
+Ejecutar una vez tras migrar (indexa los registros existentes) o para corregir el índice.
+"""
+from django.core.management.base import BaseCommand
+
+from api.busqueda import TIPOS, reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Regenera la tabla indice_busqueda (texto completo de clientes, productos y servicios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=list(TIPOS), action='append',
+                            help='Tipo a reconstruir (repetible; por defecto todos)')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por inserción (por defecto 2000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Reconstruyendo índice de búsqueda...'))
+        for tipo, filas in reconstruir(tipos=options['tipo'], lote=options['lote']).items():
+            self.stdout.write(self.style.SUCCESS(f'✅ {tipo}: {filas} registros indexados'))
@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the daily sales rollup from the ventas table
+Usage: python manage.py reconstruir_resumen_ventas [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD] [--sucursal ID]
+Ejecutar una vez tras migrar (carga el histórico) o para corregir un rango.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.resumen_ventas import reconstruir
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (formato YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la tabla resumen_ventas_diario a partir de las ventas y sus detalles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Primer día local a recalcular (por defecto todo)')
+        parser.add_argument('--hasta', type=_fecha, help='Último día local a recalcular (por defecto todo)')
+        parser.add_argument('--sucursal', type=int, help='ID de la sucursal (por defecto todas)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Reconstruyendo resumen diario de ventas...'))
+        filas = reconstruir(desde=options['desde'], hasta=options['hasta'], sucursal_id=options['sucursal'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {filas} filas de resumen generadas'))
@@ -0,0 +1,48 @@
+"""
+Management command to seed numbering counters from existing rows
+Usage: python manage.py sembrar_secuencias
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Secuencia, Venta, ServicioTecnico
+
+
+class Command(BaseCommand):
+    help = 'Siembra los contadores de numeración (VTA/ST por año) a partir de las boletas y servicios existentes'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Sembrando secuencias...'))
+
+        origenes = [
+            ('VTA', Venta, 'numero_boleta'),
+            ('ST', ServicioTecnico, 'numero_servicio'),
+        ]
+
+        for prefijo, modelo, campo in origenes:
+            codigos = modelo.objects.filter(**{f'{campo}__startswith': f'{prefijo}-'}).values_list(campo, flat=True)
+            maximos = defaultdict(int)
+            for codigo in codigos.iterator(chunk_size=2000):
+                partes = codigo.split('-')
+                if len(partes) != 3 or partes[0] != prefijo:
+                    continue
+                try:
+                    anio, numero = int(partes[1]), int(partes[2])
+                except ValueError:
+                    continue
+                maximos[anio] = max(maximos[anio], numero)
+
+            for anio, maximo in sorted(maximos.items()):
+                with transaction.atomic():
+                    secuencia, _ = Secuencia.objects.select_for_update().get_or_create(
+                        prefijo=prefijo, anio=anio
+                    )
+                    # Nunca retroceder un contador ya en uso
+                    if maximo > secuencia.ultimo_numero:
+                        secuencia.ultimo_numero = maximo
+                        secuencia.save(update_fields=['ultimo_numero'])
+                self.stdout.write(f"  ✅ {prefijo}-{anio}: {secuencia.ultimo_numero}")
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Secuencias sembradas correctamente'))
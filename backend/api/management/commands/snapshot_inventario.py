@@ -0,0 +1,23 @@
+"""
+Management command to take a periodic inventory snapshot (kardex base)
+Usage: python manage.py snapshot_inventario [--sucursal ID]
+Programar con cron (p. ej. diario a medianoche).
+"""
+from django.core.management.base import BaseCommand
+
+from api.stock import generar_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Guarda un snapshot de la cantidad actual de cada registro de inventario'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sucursal',
+            type=int,
+            help='ID de la sucursal (por defecto todas)',
+        )
+
+    def handle(self, *args, **options):
+        total = generar_snapshots(sucursal_id=options['sucursal'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} snapshots de inventario generados'))
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_detalleventa_costo_unitario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id_secuencia', models.AutoField(primary_key=True, serialize=False)),
+                ('prefijo', models.CharField(max_length=10)),
+                ('anio', models.IntegerField()),
+                ('ultimo_numero', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'secuencias',
+                'managed': True,
+                'unique_together': {('prefijo', 'anio')},
+            },
+        ),
+    ]
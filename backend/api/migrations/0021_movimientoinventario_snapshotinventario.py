@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_secuencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id_movimiento', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('Venta', 'Venta'), ('Anulación', 'Anulación'), ('Ajuste', 'Ajuste')], max_length=20)),
+                ('cantidad', models.IntegerField()),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('id_producto', models.ForeignKey(db_column='id_producto', on_delete=django.db.models.deletion.CASCADE, to='api.producto')),
+                ('id_sucursal', models.ForeignKey(db_column='id_sucursal', on_delete=django.db.models.deletion.CASCADE, to='api.sucursal')),
+                ('id_usuario', models.ForeignKey(blank=True, db_column='id_usuario', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('id_venta', models.ForeignKey(blank=True, db_column='id_venta', null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.venta')),
+            ],
+            options={
+                'db_table': 'movimientos_inventario',
+                'managed': True,
+                'indexes': [models.Index(fields=['id_producto', 'id_sucursal', 'fecha'], name='mov_inv_prod_suc_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id_snapshot', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha_corte', models.DateTimeField()),
+                ('cantidad', models.IntegerField()),
+                ('id_producto', models.ForeignKey(db_column='id_producto', on_delete=django.db.models.deletion.CASCADE, to='api.producto')),
+                ('id_sucursal', models.ForeignKey(db_column='id_sucursal', on_delete=django.db.models.deletion.CASCADE, to='api.sucursal')),
+            ],
+            options={
+                'db_table': 'snapshots_inventario',
+                'managed': True,
+                'indexes': [models.Index(fields=['id_producto', 'id_sucursal', 'fecha_corte'], name='snap_inv_prod_suc_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_movimientoinventario_snapshotinventario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientoinventario',
+            name='tipo',
+            field=models.CharField(choices=[('Venta', 'Venta'), ('Anulación', 'Anulación'), ('Ajuste', 'Ajuste'), ('Transferencia', 'Transferencia')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Transferencia',
+            fields=[
+                ('id_transferencia', models.AutoField(primary_key=True, serialize=False)),
+                ('observacion', models.TextField(blank=True, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('id_sucursal_destino', models.ForeignKey(db_column='id_sucursal_destino', on_delete=django.db.models.deletion.RESTRICT, related_name='transferencias_entrada', to='api.sucursal')),
+                ('id_sucursal_origen', models.ForeignKey(db_column='id_sucursal_origen', on_delete=django.db.models.deletion.RESTRICT, related_name='transferencias_salida', to='api.sucursal')),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.RESTRICT, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'transferencias',
+                'managed': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleTransferencia',
+            fields=[
+                ('id_detalle_transferencia', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+                ('id_producto', models.ForeignKey(db_column='id_producto', on_delete=django.db.models.deletion.RESTRICT, to='api.producto')),
+                ('id_transferencia', models.ForeignKey(db_column='id_transferencia', on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='api.transferencia')),
+            ],
+            options={
+                'db_table': 'detalle_transferencia',
+                'managed': True,
+            },
+        ),
+        migrations.AddField(
+            model_name='movimientoinventario',
+            name='id_transferencia',
+            field=models.ForeignKey(blank=True, db_column='id_transferencia', null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.transferencia'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_transferencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id_clave', models.AutoField(primary_key=True, serialize=False)),
+                ('clave', models.CharField(max_length=100)),
+                ('ruta', models.CharField(max_length=255)),
+                ('status_code', models.PositiveSmallIntegerField(null=True)),
+                ('respuesta', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'claves_idempotencia',
+                'managed': True,
+                'unique_together': {('id_usuario', 'clave')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_claveidempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorVersion',
+            fields=[
+                ('clave', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'contadores_version',
+                'managed': True,
+            },
+        ),
+    ]
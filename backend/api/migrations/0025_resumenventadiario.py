@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def llenar_resumen(apps, schema_editor):
+    # Sin esto el dashboard muestra cero ventas en todo el histórico hasta correr
+    # reconstruir_resumen_ventas. Mismo cálculo, con los modelos históricos.
+    from api.resumen_ventas import reconstruir
+    reconstruir(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_contadorversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentaDiario',
+            fields=[
+                ('id_resumen', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('tipo_pago', models.CharField(max_length=20)),
+                ('estado', models.CharField(max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('id_sucursal', models.ForeignKey(db_column='id_sucursal', on_delete=django.db.models.deletion.CASCADE, to='api.sucursal')),
+            ],
+            options={
+                'db_table': 'resumen_ventas_diario',
+                'managed': True,
+                'indexes': [models.Index(fields=['fecha', 'id_sucursal'], name='resumen_vta_fecha_suc_idx')],
+                'unique_together': {('id_sucursal', 'fecha', 'tipo_pago', 'estado')},
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
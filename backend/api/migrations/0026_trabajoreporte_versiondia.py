@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_resumenventadiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id_trabajo', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('ventas_pdf', 'Ventas PDF'), ('ventas_excel', 'Ventas Excel'), ('servicios_pdf', 'Servicios PDF'), ('servicios_excel', 'Servicios Excel')], max_length=20)),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('En Proceso', 'En Proceso'), ('Completado', 'Completado'), ('Error', 'Error')], default='Pendiente', max_length=20)),
+                ('archivo', models.CharField(blank=True, max_length=255, null=True)),
+                ('desde_cache', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('id_sucursal', models.ForeignKey(blank=True, db_column='id_sucursal', null=True, on_delete=django.db.models.deletion.CASCADE, to='api.sucursal')),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'trabajos_reporte',
+                'managed': True,
+                'indexes': [models.Index(fields=['estado', 'id_trabajo'], name='trabajo_rep_estado_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VersionDia',
+            fields=[
+                ('id_version_dia', models.AutoField(primary_key=True, serialize=False)),
+                ('ambito', models.CharField(choices=[('ventas', 'Ventas'), ('servicios', 'Servicios')], max_length=20)),
+                ('fecha', models.DateField()),
+                ('version', models.BigIntegerField(default=0)),
+                ('id_sucursal', models.ForeignKey(db_column='id_sucursal', on_delete=django.db.models.deletion.CASCADE, to='api.sucursal')),
+            ],
+            options={
+                'db_table': 'versiones_dia',
+                'managed': True,
+                'indexes': [models.Index(fields=['ambito', 'fecha'], name='version_dia_ambito_fecha_idx')],
+                'unique_together': {('ambito', 'id_sucursal', 'fecha')},
+            },
+        ),
+    ]
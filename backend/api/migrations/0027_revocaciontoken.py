@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_trabajoreporte_versiondia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevocacionToken',
+            fields=[
+                ('id_revocacion', models.AutoField(primary_key=True, serialize=False)),
+                ('motivo', models.CharField(choices=[('Desactivado', 'Desactivado'), ('Cambio de Permisos', 'Cambio de Permisos')], max_length=20)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'revocaciones_token',
+                'managed': True,
+                'indexes': [models.Index(fields=['fecha'], name='revocacion_token_fecha_idx')],
+            },
+        ),
+    ]
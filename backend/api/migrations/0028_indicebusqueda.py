@@ -0,0 +1,84 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+# MySQL: índice FULLTEXT con el parser ngram (coincide por fragmentos, como icontains).
+# Sin stopwords: la lista por defecto de InnoDB incluye 'a', 'i', 'de', 'la', 'en'... y el
+# parser ngram descarta todo fragmento que contenga una, es decir casi todos los bigramas
+# del español ('ma', 'ar', 'ri', 'ia': "maria" no se encontraría nunca). La lista se fija
+# al crear el índice, así que basta con desactivarla en la sesión de la migración.
+MYSQL_SIN_STOPWORDS = 'SET SESSION innodb_ft_enable_stopword = OFF'
+MYSQL_CREAR = 'ALTER TABLE indice_busqueda ADD FULLTEXT INDEX indice_busqueda_texto_ft (texto) WITH PARSER ngram'
+MYSQL_RESTAURAR = 'SET SESSION innodb_ft_enable_stopword = DEFAULT'
+MYSQL_BORRAR = 'ALTER TABLE indice_busqueda DROP INDEX indice_busqueda_texto_ft'
+
+# SQLite: tabla FTS5 de contenido externo (trigramas) sincronizada por triggers
+SQLITE_CREAR = [
+    "CREATE VIRTUAL TABLE indice_busqueda_fts USING fts5("
+    "texto, content='indice_busqueda', content_rowid='id_indice', tokenize='trigram')",
+    "CREATE TRIGGER indice_busqueda_ai AFTER INSERT ON indice_busqueda BEGIN "
+    "INSERT INTO indice_busqueda_fts(rowid, texto) VALUES (new.id_indice, new.texto); END",
+    "CREATE TRIGGER indice_busqueda_ad AFTER DELETE ON indice_busqueda BEGIN "
+    "INSERT INTO indice_busqueda_fts(indice_busqueda_fts, rowid, texto) VALUES ('delete', old.id_indice, old.texto); END",
+    "CREATE TRIGGER indice_busqueda_au AFTER UPDATE ON indice_busqueda BEGIN "
+    "INSERT INTO indice_busqueda_fts(indice_busqueda_fts, rowid, texto) VALUES ('delete', old.id_indice, old.texto); "
+    "INSERT INTO indice_busqueda_fts(rowid, texto) VALUES (new.id_indice, new.texto); END",
+]
+SQLITE_BORRAR = [
+    'DROP TRIGGER IF EXISTS indice_busqueda_ai',
+    'DROP TRIGGER IF EXISTS indice_busqueda_ad',
+    'DROP TRIGGER IF EXISTS indice_busqueda_au',
+    'DROP TABLE IF EXISTS indice_busqueda_fts',
+]
+
+
+def crear_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(MYSQL_SIN_STOPWORDS)
+        schema_editor.execute(MYSQL_CREAR)
+        schema_editor.execute(MYSQL_RESTAURAR)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_CREAR:
+            schema_editor.execute(sql)
+
+
+def borrar_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(MYSQL_BORRAR)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_BORRAR:
+            schema_editor.execute(sql)
+
+
+def llenar_indice(apps, schema_editor):
+    # Sin filas en el índice, ?search= no encontraría ningún registro existente
+    from api.busqueda import reconstruir
+    reconstruir(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_revocaciontoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceBusqueda',
+            fields=[
+                ('id_indice', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('cliente', 'Cliente'), ('producto', 'Producto'), ('servicio', 'Servicio Técnico')], max_length=20)),
+                ('objeto_id', models.IntegerField()),
+                ('texto', models.TextField()),
+            ],
+            options={
+                'db_table': 'indice_busqueda',
+                'managed': True,
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, borrar_indice_texto),
+        migrations.RunPython(llenar_indice, migrations.RunPython.noop),
+    ]
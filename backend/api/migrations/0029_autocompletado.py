@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_indicebusqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['updated_at'], name='cliente_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['updated_at'], name='producto_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_autocompletado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 
@@ -155,10 +157,15 @@ class Cliente(models.Model):
     direccion = models.TextField(blank=True, null=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     activo = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'clientes'
         managed = True
+        indexes = [
+            # Sincronización incremental del autocompletado (api/autocompletado.py)
+            models.Index(fields=['updated_at'], name='cliente_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.nombre_apellido
@@ -186,6 +193,10 @@ class Producto(models.Model):
     class Meta:
         db_table = 'productos'
         managed = True
+        indexes = [
+            # Sincronización incremental del autocompletado (api/autocompletado.py)
+            models.Index(fields=['updated_at'], name='producto_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.nombre_producto
@@ -234,20 +245,7 @@ class Venta(models.Model):
     def save(self, *args, **kwargs):
         """Auto-genera numero_boleta con formato VTA-YYYY-XXXXX"""
         if not self.numero_boleta:
-            año_actual = timezone.localdate().year
-            
-            ultimo = Venta.objects.filter(
-                numero_boleta__startswith=f'VTA-{año_actual}-'
-            ).order_by('-numero_boleta').first()
-            
-            if ultimo:
-                try:
-                    num = int(ultimo.numero_boleta.split('-')[2])
-                except (IndexError, ValueError):
-                    num = 0
-                self.numero_boleta = f"VTA-{año_actual}-{num + 1:05d}"
-            else:
-                self.numero_boleta = f"VTA-{año_actual}-00001"
+            self.numero_boleta = Secuencia.objects.siguiente_codigo('VTA')
         
         super().save(*args, **kwargs)
 
@@ -325,21 +323,291 @@ class ServicioTecnico(models.Model):
     def save(self, *args, **kwargs):
         """Auto-genera numero_servicio con formato ST-YYYY-XXXXX"""
         if not self.numero_servicio:
-            año_actual = timezone.localdate().year
-            
-            # Buscar último servicio del año actual
-            ultimo = ServicioTecnico.objects.filter(
-                numero_servicio__startswith=f'ST-{año_actual}-'
-            ).order_by('-numero_servicio').first()
-            
-            if ultimo:
-                try:
-                    num = int(ultimo.numero_servicio.split('-')[2])
-                except (IndexError, ValueError):
-                    num = 0
-                self.numero_servicio = f"ST-{año_actual}-{num + 1:05d}"
-            else:
-                # Primer servicio del año
-                self.numero_servicio = f"ST-{año_actual}-00001"
+            self.numero_servicio = Secuencia.objects.siguiente_codigo('ST')
         
         super().save(*args, **kwargs)
+
+
+# Manager para Secuencia
+class SecuenciaManager(models.Manager):
+    # Prefijo -> (modelo, campo) que usa la numeración, para sembrar contadores
+    ORIGENES = {
+        'VTA': ('Venta', 'numero_boleta'),
+        'ST': ('ServicioTecnico', 'numero_servicio'),
+    }
+
+    def siguiente_numero(self, prefijo, anio=None):
+        """
+        Reserva y devuelve el siguiente número del contador (prefijo, año).
+
+        Un único UPDATE ... SET ultimo_numero = ultimo_numero + 1 bloquea la fila
+        del contador hasta que termine la transacción, así dos workers nunca
+        obtienen el mismo número y no hace falta reintentar.
+        """
+        if anio is None:
+            anio = timezone.localdate().year
+
+        with transaction.atomic(using=self.db):
+            contador = self.filter(prefijo=prefijo, anio=anio)
+            if not contador.update(ultimo_numero=F('ultimo_numero') + 1):
+                # Primer número del año: crear el contador sembrado con lo existente
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(prefijo=prefijo, anio=anio,
+                                    ultimo_numero=self.maximo_existente(prefijo, anio))
+                except IntegrityError:
+                    pass  # Otro worker lo creó primero
+                contador.update(ultimo_numero=F('ultimo_numero') + 1)
+            return contador.values_list('ultimo_numero', flat=True).get()
+
+    def siguiente_codigo(self, prefijo, anio=None):
+        """Devuelve el siguiente código con formato PREFIJO-YYYY-XXXXX"""
+        if anio is None:
+            anio = timezone.localdate().year
+        return f"{prefijo}-{anio}-{self.siguiente_numero(prefijo, anio):05d}"
+
+    def maximo_existente(self, prefijo, anio):
+        """Último número ya usado en la tabla de origen para (prefijo, año)"""
+        nombre_modelo, campo = self.ORIGENES[prefijo]
+        modelo = self.model._meta.apps.get_model('api', nombre_modelo)
+        ultimo = modelo.objects.filter(
+            **{f'{campo}__startswith': f'{prefijo}-{anio}-'}
+        ).order_by(f'-{campo}').values_list(campo, flat=True).first()
+        if not ultimo:
+            return 0
+        try:
+            return int(ultimo.split('-')[2])
+        except (IndexError, ValueError):
+            return 0
+
+
+# 11. Tabla de Secuencias (numeración de boletas y servicios)
+class Secuencia(models.Model):
+    id_secuencia = models.AutoField(primary_key=True)
+    prefijo = models.CharField(max_length=10)  # 'VTA' o 'ST'
+    anio = models.IntegerField()
+    ultimo_numero = models.IntegerField(default=0)
+
+    objects = SecuenciaManager()
+
+    class Meta:
+        db_table = 'secuencias'
+        unique_together = (('prefijo', 'anio'),)
+        managed = True
+
+    def __str__(self):
+        return f"{self.prefijo}-{self.anio}: {self.ultimo_numero}"
+
+
+# 12. Tabla de Movimientos de Inventario (kardex, solo inserción)
+class MovimientoInventario(models.Model):
+    TIPO_CHOICES = [
+        ('Venta', 'Venta'),
+        ('Anulación', 'Anulación'),
+        ('Ajuste', 'Ajuste'),
+        ('Transferencia', 'Transferencia'),
+    ]
+    id_movimiento = models.AutoField(primary_key=True)
+    id_producto = models.ForeignKey(Producto, on_delete=models.CASCADE, db_column='id_producto')
+    id_sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, db_column='id_sucursal')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    # Positivo = entrada, negativo = salida
+    cantidad = models.IntegerField()
+    id_venta = models.ForeignKey(Venta, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_venta')
+    id_transferencia = models.ForeignKey(
+        'Transferencia', on_delete=models.SET_NULL, null=True, blank=True, db_column='id_transferencia'
+    )
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_usuario')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'movimientos_inventario'
+        managed = True
+        indexes = [
+            models.Index(fields=['id_producto', 'id_sucursal', 'fecha'], name='mov_inv_prod_suc_fecha_idx'),
+        ]
+
+# 13. Tabla de Snapshots de Inventario (corte periódico por sucursal)
+class SnapshotInventario(models.Model):
+    id_snapshot = models.AutoField(primary_key=True)
+    id_producto = models.ForeignKey(Producto, on_delete=models.CASCADE, db_column='id_producto')
+    id_sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, db_column='id_sucursal')
+    fecha_corte = models.DateTimeField()
+    cantidad = models.IntegerField()
+
+    class Meta:
+        db_table = 'snapshots_inventario'
+        managed = True
+        indexes = [
+            models.Index(fields=['id_producto', 'id_sucursal', 'fecha_corte'], name='snap_inv_prod_suc_fecha_idx'),
+        ]
+
+
+# 14. Tabla de Transferencias entre sucursales
+class Transferencia(models.Model):
+    id_transferencia = models.AutoField(primary_key=True)
+    id_sucursal_origen = models.ForeignKey(
+        Sucursal, on_delete=models.RESTRICT, db_column='id_sucursal_origen', related_name='transferencias_salida'
+    )
+    id_sucursal_destino = models.ForeignKey(
+        Sucursal, on_delete=models.RESTRICT, db_column='id_sucursal_destino', related_name='transferencias_entrada'
+    )
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.RESTRICT, db_column='id_usuario')
+    observacion = models.TextField(blank=True, null=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'transferencias'
+        managed = True
+
+# 15. Tabla de Detalle de Transferencias
+class DetalleTransferencia(models.Model):
+    id_detalle_transferencia = models.AutoField(primary_key=True)
+    id_transferencia = models.ForeignKey(
+        Transferencia, on_delete=models.CASCADE, db_column='id_transferencia', related_name='detalles'
+    )
+    id_producto = models.ForeignKey(Producto, on_delete=models.RESTRICT, db_column='id_producto')
+    cantidad = models.IntegerField()
+
+    class Meta:
+        db_table = 'detalle_transferencia'
+        managed = True
+
+# 16. Tabla de Claves de Idempotencia (reintentos del POS)
+class ClaveIdempotencia(models.Model):
+    id_clave = models.AutoField(primary_key=True)
+    clave = models.CharField(max_length=100)
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_column='id_usuario')
+    ruta = models.CharField(max_length=255)
+    # Nulo mientras la petición original sigue en curso
+    status_code = models.PositiveSmallIntegerField(null=True)
+    respuesta = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'claves_idempotencia'
+        managed = True
+        unique_together = ('id_usuario', 'clave')
+
+# 17. Tabla de Contadores de Versión (invalidación de cachés por proceso)
+class ContadorVersion(models.Model):
+    clave = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'contadores_version'
+        managed = True
+
+# 18. Tabla de Resumen Diario de Ventas (rollup para el dashboard)
+class ResumenVentaDiario(models.Model):
+    id_resumen = models.AutoField(primary_key=True)
+    id_sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, db_column='id_sucursal')
+    fecha = models.DateField()  # Día local (America/La_Paz)
+    tipo_pago = models.CharField(max_length=20)
+    estado = models.CharField(max_length=20)
+    cantidad = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'resumen_ventas_diario'
+        managed = True
+        unique_together = ('id_sucursal', 'fecha', 'tipo_pago', 'estado')
+        indexes = [
+            models.Index(fields=['fecha', 'id_sucursal'], name='resumen_vta_fecha_suc_idx'),
+        ]
+
+# 19. Tabla de Versiones de Datos por Sucursal y Día (invalidación de reportes)
+class VersionDia(models.Model):
+    AMBITO_CHOICES = [
+        ('ventas', 'Ventas'),
+        ('servicios', 'Servicios'),
+    ]
+    id_version_dia = models.AutoField(primary_key=True)
+    ambito = models.CharField(max_length=20, choices=AMBITO_CHOICES)
+    id_sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, db_column='id_sucursal')
+    fecha = models.DateField()  # Día local (America/La_Paz)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'versiones_dia'
+        managed = True
+        unique_together = ('ambito', 'id_sucursal', 'fecha')
+        indexes = [
+            models.Index(fields=['ambito', 'fecha'], name='version_dia_ambito_fecha_idx'),
+        ]
+
+# 20. Tabla de Trabajos de Reporte (cola de generación en segundo plano)
+class TrabajoReporte(models.Model):
+    TIPO_CHOICES = [
+        ('ventas_pdf', 'Ventas PDF'),
+        ('ventas_excel', 'Ventas Excel'),
+        ('servicios_pdf', 'Servicios PDF'),
+        ('servicios_excel', 'Servicios Excel'),
+    ]
+    ESTADO_CHOICES = [
+        ('Pendiente', 'Pendiente'),
+        ('En Proceso', 'En Proceso'),
+        ('Completado', 'Completado'),
+        ('Error', 'Error'),
+    ]
+    id_trabajo = models.AutoField(primary_key=True)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    id_sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, null=True, blank=True, db_column='id_sucursal')
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_column='id_usuario')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Pendiente')
+    archivo = models.CharField(max_length=255, blank=True, null=True)  # Relativo a REPORTES_DIR
+    desde_cache = models.BooleanField(default=False)
+    error = models.TextField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    latido = models.DateTimeField(blank=True, null=True)  # Lo renueva el worker mientras genera
+
+    class Meta:
+        db_table = 'trabajos_reporte'
+        managed = True
+        indexes = [
+            models.Index(fields=['estado', 'id_trabajo'], name='trabajo_rep_estado_idx'),
+        ]
+
+# 21. Tabla de Revocaciones de Token (desactivación o cambio de rol/sucursal)
+class RevocacionToken(models.Model):
+    MOTIVO_CHOICES = [
+        ('Desactivado', 'Desactivado'),
+        ('Cambio de Permisos', 'Cambio de Permisos'),
+    ]
+    id_revocacion = models.AutoField(primary_key=True)
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_column='id_usuario')
+    motivo = models.CharField(max_length=20, choices=MOTIVO_CHOICES)
+    # Se rechazan los tokens del usuario emitidos hasta este momento
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'revocaciones_token'
+        managed = True
+        indexes = [
+            models.Index(fields=['fecha'], name='revocacion_token_fecha_idx'),
+        ]
+
+# 22. Tabla de Índice de Búsqueda (texto completo de clientes, productos y servicios)
+class IndiceBusqueda(models.Model):
+    TIPO_CHOICES = [
+        ('cliente', 'Cliente'),
+        ('producto', 'Producto'),
+        ('servicio', 'Servicio Técnico'),
+    ]
+    id_indice = models.AutoField(primary_key=True)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    objeto_id = models.IntegerField()
+    # Campos buscables del objeto normalizados (minúsculas, sin tildes). El índice
+    # FULLTEXT (MySQL) o la tabla FTS5 (SQLite) se crean en la migración
+    texto = models.TextField()
+
+    class Meta:
+        db_table = 'indice_busqueda'
+        managed = True
+        unique_together = ('tipo', 'objeto_id')
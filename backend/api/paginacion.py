@@ -0,0 +1,75 @@
+"""
+Paginación por número de página (por defecto) o por cursor (opt-in con ?cursor=).
+
+Con ?page=N cada página cuesta un COUNT(*) sobre todo el filtro más un OFFSET que
+recorre y descarta todas las filas anteriores: la página 5000 es mucho más lenta
+que la 1. Con ?cursor= (vacío para la primera página, luego el de `next`/`previous`)
+la consulta busca sobre la clave ordenada e indexada (WHERE pk < último ORDER BY pk
+DESC LIMIT n+1): el costo no depende de la profundidad y no hay COUNT.
+
+El total es opcional en modo cursor (?total=1): un COUNT exacto cacheado
+PAGINACION_TOTAL_TTL segundos por consulta (mismo filtro = misma clave), para
+mostrar "Página X de Y" sin contar en cada página.
+
+Solo el listado (list) de las vistas que declaran `orden_cursor` acepta el modo cursor.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+PARAMETRO_CURSOR = 'cursor'
+PARAMETRO_TOTAL = 'total'
+
+
+def total_cacheado(queryset):
+    """COUNT(*) del queryset cacheado por su SQL. Devuelve (total, desde_cache)"""
+    sql, params = queryset.order_by().query.sql_with_params()
+    clave = 'conteo:' + hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    total = cache.get(clave)
+    if total is not None:
+        return total, True
+    total = queryset.order_by().count()
+    cache.set(clave, total, settings.PAGINACION_TOTAL_TTL)
+    return total, False
+
+
+class PaginacionCursor(CursorPagination):
+    """Keyset sobre la clave primaria; el orden lo fija la vista (orden_cursor)"""
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.total = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(PARAMETRO_TOTAL) in ('1', 'true'):
+            self.total = total_cacheado(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        respuesta = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.total is not None:
+            respuesta['count'], respuesta['count_cacheado'] = self.total
+        respuesta['results'] = data
+        return Response(respuesta)
+
+
+class PaginacionHibrida(PageNumberPagination):
+    """PageNumberPagination de siempre, o PaginacionCursor si la petición trae ?cursor="""
+
+    def __init__(self):
+        self.cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        orden = getattr(view, 'orden_cursor', None)
+        if orden and getattr(view, 'action', None) == 'list' and PARAMETRO_CURSOR in request.query_params:
+            self.cursor = PaginacionCursor(orden)
+            return self.cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
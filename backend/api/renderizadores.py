@@ -0,0 +1,63 @@
+"""
+Formato compacto para listados (?format=compact).
+
+En JSON normal cada fila repite los nombres de todos sus campos. El formato
+compacto los envía una sola vez:
+
+    {"count": 120, "next": ..., "previous": ..., "columnas": ["id_venta", ...], "filas": [[1, ...], ...]}
+
+Las respuestas que no son listados (un objeto, un error) se devuelven como JSON
+normal. Se codifica con orjson si está instalado (varias veces más rápido que
+json); si no, con json de la biblioteca estándar y separadores mínimos.
+"""
+import json
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _a_tabla(filas):
+    """(columnas, filas como listas) de una lista de dicts con las mismas claves"""
+    if not filas or not all(isinstance(fila, dict) for fila in filas):
+        return None
+    columnas = list(filas[0])
+    return columnas, [[fila.get(columna) for columna in columnas] for fila in filas]
+
+
+def compactar(data):
+    if isinstance(data, list):
+        tabla = _a_tabla(data)
+        if tabla is not None:
+            return {'columnas': tabla[0], 'filas': tabla[1]}
+    elif isinstance(data, dict) and isinstance(data.get('results'), list):
+        tabla = _a_tabla(data['results'])
+        if tabla is not None:
+            compacto = {clave: valor for clave, valor in data.items() if clave != 'results'}
+            compacto['columnas'], compacto['filas'] = tabla
+            return compacto
+    return data
+
+
+def codificar(data):
+    if orjson is not None:
+        # Decimal, lazy strings, etc.: el mismo encoder que usa DRF
+        return orjson.dumps(data, default=_encoder.default)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class RenderizadorCompacto(renderers.BaseRenderer):
+    media_type = 'application/json'
+    format = 'compact'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return codificar(compactar(data))
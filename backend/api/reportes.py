@@ -0,0 +1,360 @@
+"""
+Generación de los archivos de reporte (PDF y Excel) de ventas y servicios.
+
+Las funciones reciben el rango (datetimes aware), la sucursal (None = todas) y
+un archivo binario de destino, de modo que las usan tanto las vistas síncronas
+como el worker de la cola de reportes (procesar_reportes).
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, Sum, F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
+
+from .consultas_reportes import COSTO_DETALLE, MONTO_DETALLE, ConsultaVentas
+from .importacion import exportar_xlsx
+from .models import Venta, ServicioTecnico, Sucursal
+
+COLUMNAS_EXCEL_VENTAS = ['#', 'Fecha', 'Boleta', 'Cliente', 'Vendedor', 'Sucursal',
+                         'Tipo Pago', 'Estado', 'Motivo Anulacion',
+                         'Precio Compra', 'Precio Venta', 'Ganancia']
+
+def por_lotes(queryset, campo_fecha, campo_pk, campos, tamano_lote=2000):
+    """
+    Recorre queryset (más reciente primero) en lotes por keyset (fecha, pk).
+    Cada lote es una consulta LIMIT independiente: la memoria queda acotada también
+    en MySQL, donde el driver carga el resultado completo de cada consulta.
+    Cada fila llega como tupla (fecha, pk, *campos).
+    """
+    queryset = queryset.order_by(f'-{campo_fecha}', f'-{campo_pk}')
+    lote = queryset.values_list(campo_fecha, campo_pk, *campos)
+    while True:
+        filas = list(lote[:tamano_lote])
+        yield from filas
+        if len(filas) < tamano_lote:
+            return
+        fecha, pk = filas[-1][0], filas[-1][1]
+        lote = queryset.filter(
+            Q(**{f'{campo_fecha}__lt': fecha}) | Q(**{campo_fecha: fecha, f'{campo_pk}__lt': pk})
+        ).values_list(campo_fecha, campo_pk, *campos)
+
+def filas_excel_ventas(queryset, tamano_lote=2000):
+    """
+    Filas del Excel de ventas en streaming: los totales de cada venta (solo Completadas)
+    se suman en SQL por lote y los nombres llegan por JOIN, sin instanciar modelos.
+    """
+    solo_completadas = Q(estado='Completada')
+    queryset = queryset.values('id_venta').annotate(
+        compra=Sum(F('detalleventa__costo_unitario') * F('detalleventa__cantidad'), filter=solo_completadas),
+        venta=Sum(F('detalleventa__precio_venta') * F('detalleventa__cantidad'), filter=solo_completadas),
+    )
+    campos = ['numero_boleta', 'id_cliente__nombre_apellido', 'id_usuario__nombre_apellido',
+              'id_sucursal__nombre', 'tipo_pago', 'estado', 'motivo_anulacion', 'compra', 'venta']
+    yield COLUMNAS_EXCEL_VENTAS
+    for idx, (fecha, _, boleta, cliente, vendedor, sucursal, tipo_pago, estado, motivo, compra, venta) in enumerate(
+        por_lotes(queryset, 'fecha_venta', 'id_venta', campos, tamano_lote), start=1
+    ):
+        compra = compra or 0
+        venta = venta or 0
+        yield [
+            idx,
+            timezone.localtime(fecha).strftime('%d/%m/%Y %H:%M'),
+            boleta,
+            cliente or '',
+            vendedor or '',
+            sucursal or '',
+            tipo_pago,
+            estado,
+            motivo or '',
+            float(compra),
+            float(venta),
+            float(venta - compra)
+        ]
+
+COLUMNAS_EXCEL_SERVICIOS = ['#', 'Nro Servicio', 'Fecha Recepción', 'Fecha Entrega', 'Cliente', 'Dispositivo',
+                            'Problema', 'Estado', 'Tec. asignado', 'Costo']
+
+def filas_excel_servicios(queryset, tamano_lote=2000):
+    """Filas del Excel de servicios en streaming (cliente y técnico por JOIN, sin N+1)"""
+    campos = ['numero_servicio', 'fecha_entrega', 'id_cliente__nombre_apellido', 'marca_dispositivo',
+              'modelo_dispositivo', 'descripcion_problema', 'estado', 'id_tecnico_asignado__nombre_apellido',
+              'costo_estimado']
+    yield COLUMNAS_EXCEL_SERVICIOS
+    for idx, (inicio, _, numero, entrega, cliente, marca, modelo, problema, estado, tecnico, costo) in enumerate(
+        por_lotes(queryset, 'fecha_inicio', 'id_servicio', campos, tamano_lote), start=1
+    ):
+        yield [
+            idx,
+            numero,
+            timezone.localtime(inicio).strftime('%d/%m/%Y %H:%M') if inicio else '',
+            timezone.localtime(entrega).strftime('%d/%m/%Y %H:%M') if entrega else '',
+            cliente or '',
+            f"{marca} {modelo}",
+            problema,
+            estado,
+            tecnico or '',
+            float(costo or 0)
+        ]
+
+def _ventas(fecha_desde, fecha_hasta, sucursal_id):
+    queryset = Venta.objects.filter(fecha_venta__range=(fecha_desde, fecha_hasta))
+    if sucursal_id:
+        queryset = queryset.filter(id_sucursal_id=sucursal_id)
+    return queryset
+
+def _servicios(fecha_desde, fecha_hasta, sucursal_id):
+    queryset = ServicioTecnico.objects.filter(fecha_inicio__range=(fecha_desde, fecha_hasta))
+    if sucursal_id:
+        queryset = queryset.filter(id_sucursal_id=sucursal_id)
+    return queryset
+
+# --- PDF ---
+# Estilos precalculados una vez por proceso: cada tabla por partes los reutiliza.
+ESTILOS = getSampleStyleSheet()
+
+# Geometría de página (SimpleDocTemplate carta, márgenes de 1 pulgada, padding del frame 6+6).
+# Las tablas usan alturas de fila fijas: ReportLab no mide cada celda y se sabe de antemano
+# cuántas filas entran en una página, así cada parte es una Table de exactamente una
+# página con su encabezado y nunca se mide ni divide una tabla de miles de filas
+# (costo superlineal en tiempo y memoria).
+ALTO_UTIL = letter[1] - 2 * inch - 12
+ANCHO_UTIL = letter[0] - 2 * inch
+ALTO_FILA = 18
+
+COLUMNAS_PDF_VENTAS = ['#', 'Fecha', 'Boleta', 'Cliente', 'Vendedor', 'Estado',
+                       'P. Compra', 'P. Venta', 'Ganancia']
+ANCHOS_PDF_VENTAS = [30, 85, 70, 80, 80, 65, 60, 60, 60]
+ALTO_ENCABEZADO_VENTAS = 27  # BOTTOMPADDING 12
+ESTILO_TABLA_VENTAS = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+ESTILO_RESUMEN_VENTAS = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'), # Negrita para fila de Ganancia
+    ('TEXTCOLOR', (0, 2), (-1, 2), colors.green),
+])
+
+COLUMNAS_PDF_SERVICIOS = ['#', 'Recepción', 'Entrega', 'Ticket', 'Cliente', 'Dispositivo', 'Estado',
+                          'Tec. asignado', 'Costo']
+ANCHOS_PDF_SERVICIOS = [25, 50, 50, 70, 80, 85, 60, 75, 45]
+ALTO_FILA_SERVICIOS = 14  # FONTSIZE 8
+ESTILO_TABLA_SERVICIOS = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+])
+
+
+class FlujoPorPartes(list):
+    """
+    Lista de flowables que doc.build consume desde un generador: se rellena de a
+    uno cuando queda vacía, así las filas pendientes nunca están en memoria; solo la
+    tabla que se está dibujando y las páginas ya emitidas. (build solo usa len(), [0], del [0] e inserciones al frente al dividir.)
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._pendientes = iter(flowables)
+
+    def _llenar(self):
+        if not list.__len__(self):
+            siguiente = next(self._pendientes, None)
+            if siguiente is not None:
+                self.append(siguiente)
+
+    def __len__(self):
+        self._llenar()
+        return list.__len__(self)
+
+    def __getitem__(self, indice):
+        self._llenar()
+        return list.__getitem__(self, indice)
+
+
+def alto_flowables(flowables):
+    """Alto que ocupan `flowables` al inicio de una página (para descontarlo de la primera parte)"""
+    return sum(
+        f.wrap(ANCHO_UTIL, ALTO_UTIL)[1] + f.getSpaceBefore() + f.getSpaceAfter() for f in flowables
+    )
+
+
+def tablas_por_partes(encabezado, filas, anchos, estilo, pie=None, alto_fila=ALTO_FILA,
+                      alto_encabezado=ALTO_FILA, alto_previo=0):
+    """
+    Parte `filas` (iterable, se consume de a una) en tablas de una página con el
+    encabezado repetido, separadas por saltos de página. `alto_previo` es lo que ya
+    ocupa la primera página (títulos). Se deja una fila de margen por página.
+    `pie` es una función que devuelve la fila de totales; se llama al final, cuando
+    ya se consumieron las filas, y se agrega a la última tabla.
+    """
+    por_pagina = max(int((ALTO_UTIL - alto_encabezado) // alto_fila) - 1, 1)
+    capacidad = max(int((ALTO_UTIL - alto_previo - alto_encabezado) // alto_fila) - 1, 1)
+
+    def tabla(bloque):
+        return Table(
+            [encabezado, *bloque], colWidths=anchos, rowHeights=[alto_encabezado] + [alto_fila] * len(bloque),
+            repeatRows=1, style=estilo
+        )
+
+    bloque = []
+    emitidas = 0
+    for fila in filas:
+        if len(bloque) == capacidad:
+            yield tabla(bloque)
+            yield PageBreak()
+            emitidas += 1
+            bloque = []
+            capacidad = por_pagina
+        bloque.append(fila)
+    if pie is not None:
+        bloque.append(pie())
+    if bloque or not emitidas:
+        yield tabla(bloque)
+
+
+def construir_pdf(destino, flowables):
+    """Arma el PDF carta en `destino` consumiendo `flowables` (iterable) de forma perezosa"""
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    doc.build(FlujoPorPartes(flowables))
+    return destino
+
+def _filas_pdf_ventas(queryset, tamano_lote=2000):
+    solo_completadas = Q(estado='Completada')
+    queryset = queryset.values('id_venta').annotate(
+        compra=Sum(F('detalleventa__costo_unitario') * F('detalleventa__cantidad'), filter=solo_completadas),
+        venta=Sum(F('detalleventa__precio_venta') * F('detalleventa__cantidad'), filter=solo_completadas),
+    )
+    campos = ['numero_boleta', 'id_cliente__nombre_apellido', 'id_usuario__nombre_apellido',
+              'estado', 'total_venta', 'compra', 'venta']
+    for idx, (fecha, _, boleta, cliente, vendedor, estado, total_venta, compra, venta) in enumerate(
+        por_lotes(queryset, 'fecha_venta', 'id_venta', campos, tamano_lote), start=1
+    ):
+        if estado == 'Completada':
+            compra = compra or 0
+            venta = venta or 0
+            importes = [f"{compra:.2f}", f"{venta:.2f}", f"{venta - compra:.2f}"]
+        else:
+            importes = ["0.00", f"({total_venta or 0:.2f})", "0.00"]
+        yield [
+            idx,
+            timezone.localtime(fecha).strftime('%d/%m/%Y %H:%M'),
+            boleta,
+            cliente or 'S/N',
+            vendedor or 'S/N',
+            "Anulado" if estado == 'Anulada' else "Completado",
+            *importes
+        ]
+
+def generar_pdf_ventas(fecha_desde, fecha_hasta, sucursal_id, destino):
+    """PDF de ventas del rango escrito en `destino` (archivo binario)"""
+    consulta = ConsultaVentas(fecha_desde, fecha_hasta, sucursal_id)
+    totales = {}
+
+    def fila_total():
+        # Totales en SQL (una consulta), no acumulados recorriendo las filas
+        totales.update(consulta.detalles(estado='Completada').aggregate(
+            costo=Coalesce(Sum(COSTO_DETALLE), Decimal('0'), output_field=DecimalField()),
+            monto=Coalesce(Sum(MONTO_DETALLE), Decimal('0'), output_field=DecimalField()),
+        ))
+        return ['', '', '', '', '', 'TOTAL:', f"{totales['costo']:.2f}", f"{totales['monto']:.2f}",
+                f"{totales['monto'] - totales['costo']:.2f}"]
+
+    def flowables():
+        titulo = "Reporte de Ventas"
+        if sucursal_id:
+            titulo += f" - {Sucursal.objects.get(pk=sucursal_id).nombre}"
+        else:
+            titulo += " - Todas las Sucursales"
+        encabezados = [
+            Paragraph(titulo, ESTILOS['Title']),
+            Paragraph(f"Desde: {fecha_desde.strftime('%d/%m/%Y')} Hasta: {fecha_hasta.strftime('%d/%m/%Y')}", ESTILOS['Normal']),
+            Spacer(1, 20),
+        ]
+        yield from encabezados
+        yield from tablas_por_partes(
+            COLUMNAS_PDF_VENTAS, _filas_pdf_ventas(consulta.ventas()), ANCHOS_PDF_VENTAS, ESTILO_TABLA_VENTAS,
+            pie=fila_total, alto_encabezado=ALTO_ENCABEZADO_VENTAS, alto_previo=alto_flowables(encabezados)
+        )
+
+        # --- RESUMEN FINANCIERO ---
+        yield Spacer(1, 20)
+        yield Paragraph("Resumen Financiero", ESTILOS['Heading2'])
+        yield Table([
+            ['Total Ventas (Ingresos)', f"{totales['monto']:.2f} Bs"],
+            ['Costo (Productos)', f"{totales['costo']:.2f} Bs"],
+            ['Ganancia (Utilidad)', f"{totales['monto'] - totales['costo']:.2f} Bs"]
+        ], colWidths=[200, 100], style=ESTILO_RESUMEN_VENTAS)
+
+    return construir_pdf(destino, flowables())
+
+def _filas_pdf_servicios(queryset, tamano_lote=2000):
+    campos = ['numero_servicio', 'fecha_entrega', 'id_cliente__nombre_apellido', 'marca_dispositivo',
+              'modelo_dispositivo', 'estado', 'id_tecnico_asignado__nombre_apellido', 'costo_estimado']
+    for idx, (inicio, _, numero, entrega, cliente, marca, modelo, estado, tecnico, costo) in enumerate(
+        por_lotes(queryset, 'fecha_inicio', 'id_servicio', campos, tamano_lote), start=1
+    ):
+        yield [
+            idx,
+            timezone.localtime(inicio).strftime('%d/%m/%Y'),
+            timezone.localtime(entrega).strftime('%d/%m/%Y') if entrega else '-',
+            numero,
+            cliente or '-',
+            f"{marca} {modelo}",
+            estado,
+            tecnico or '-',
+            f"{costo:.2f}"
+        ]
+
+def generar_pdf_servicios(fecha_desde, fecha_hasta, sucursal_id, destino):
+    """PDF de servicios técnicos del rango escrito en `destino` (archivo binario)"""
+    queryset = _servicios(fecha_desde, fecha_hasta, sucursal_id)
+
+    def fila_total():
+        total = queryset.exclude(estado='Anulado').aggregate(
+            total=Coalesce(Sum('costo_estimado'), Decimal('0'), output_field=DecimalField())
+        )['total']
+        return ['', '', '', '', '', '', '', 'TOTAL:', f"{total:.2f}"]
+
+    def flowables():
+        encabezados = [
+            Paragraph("Reporte de Servicios Técnicos", ESTILOS['Title']),
+            Paragraph(f"Periodo: {fecha_desde.strftime('%d/%m/%Y')} - {fecha_hasta.strftime('%d/%m/%Y')}", ESTILOS['Normal']),
+            Spacer(1, 20),
+        ]
+        yield from encabezados
+        yield from tablas_por_partes(
+            COLUMNAS_PDF_SERVICIOS, _filas_pdf_servicios(queryset), ANCHOS_PDF_SERVICIOS, ESTILO_TABLA_SERVICIOS,
+            pie=fila_total, alto_fila=ALTO_FILA_SERVICIOS, alto_encabezado=ALTO_FILA_SERVICIOS,
+            alto_previo=alto_flowables(encabezados)
+        )
+
+    return construir_pdf(destino, flowables())
+
+def generar_excel_ventas(fecha_desde, fecha_hasta, sucursal_id, destino):
+    """Excel de ventas del rango escrito en `destino` (archivo binario)"""
+    return exportar_xlsx(filas_excel_ventas(_ventas(fecha_desde, fecha_hasta, sucursal_id)), 'Reporte Ventas', destino)
+
+def generar_excel_servicios(fecha_desde, fecha_hasta, sucursal_id, destino):
+    """Excel de servicios técnicos del rango escrito en `destino` (archivo binario)"""
+    return exportar_xlsx(filas_excel_servicios(_servicios(fecha_desde, fecha_hasta, sucursal_id)), 'Servicios', destino)
+
+# tipo -> (función generadora, ámbito de datos para la versión, extensión)
+GENERADORES = {
+    'ventas_pdf': (generar_pdf_ventas, 'ventas', 'pdf'),
+    'ventas_excel': (generar_excel_ventas, 'ventas', 'xlsx'),
+    'servicios_pdf': (generar_pdf_servicios, 'servicios', 'pdf'),
+    'servicios_excel': (generar_excel_servicios, 'servicios', 'xlsx'),
+}
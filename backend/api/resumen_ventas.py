@@ -0,0 +1,155 @@
+"""
+Rollup diario de ventas (tabla resumen_ventas_diario).
+
+Cada fila acumula cantidad, total y costo de las ventas de una sucursal en un día
+local (America/La_Paz) para un tipo de pago y estado. Se mantiene en la misma
+transacción que la escritura de la venta: quien modifica una venta toma su
+"huella" antes y después del cambio y llama a aplicar(antes, despues), que resta
+una y suma la otra con un upsert atómico (INSERT ... ON DUPLICATE KEY UPDATE
+cantidad = cantidad + n en MySQL/MariaDB, ON CONFLICT en SQLite).
+
+El dashboard lee unas pocas filas por día en lugar de todas las ventas del rango.
+Para el histórico (o si se sospecha un desvío): python manage.py reconstruir_resumen_ventas
+"""
+from collections import namedtuple
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import versiones
+from .consultas_reportes import COSTO_DETALLE, ConsultaVentas
+from .models import DetalleVenta, ResumenVentaDiario
+
+Huella = namedtuple('Huella', ['sucursal_id', 'fecha', 'tipo_pago', 'estado', 'total', 'costo'])
+
+# Crea la fila del día o suma sobre ella en una sola sentencia. Un UPDATE que no
+# encuentra la fila toma en InnoDB (REPEATABLE READ) un bloqueo de hueco: dos
+# primeras ventas del mismo día/tipo/estado se bloqueaban mutuamente en el INSERT
+# siguiente (deadlock 1213, un checkout fallaba). El upsert bloquea solo la fila.
+_INSERTAR = (
+    'INSERT INTO resumen_ventas_diario (id_sucursal, fecha, tipo_pago, estado, cantidad, total, costo) '
+    'VALUES (%s, %s, %s, %s, %s, %s, %s) '
+)
+SQL_ACUMULAR = {
+    # VALUES(col) en vez de alias: MariaDB no admite "AS nuevo"
+    'mysql': _INSERTAR + (
+        'ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad), '
+        'total = total + VALUES(total), costo = costo + VALUES(costo)'
+    ),
+    'sqlite': _INSERTAR + (
+        'ON CONFLICT (id_sucursal, fecha, tipo_pago, estado) DO UPDATE SET '
+        'cantidad = cantidad + excluded.cantidad, total = total + excluded.total, costo = costo + excluded.costo'
+    ),
+}
+
+def costo_venta(venta_id):
+    """Costo de una venta a partir del snapshot de sus detalles (una consulta)"""
+    return DetalleVenta.objects.filter(id_venta_id=venta_id).aggregate(
+        costo=Coalesce(Sum(COSTO_DETALLE), Decimal('0'), output_field=DecimalField())
+    )['costo']
+
+
+def huella(venta, costo=None):
+    """Contribución de una venta al rollup. Si no se pasa costo se calcula desde los detalles."""
+    if costo is None:
+        costo = costo_venta(venta.pk)
+    return Huella(
+        venta.id_sucursal_id,
+        timezone.localtime(venta.fecha_venta).date(),
+        venta.tipo_pago,
+        venta.estado,
+        venta.total_venta or Decimal('0'),
+        costo,
+    )
+
+
+def _acumular(huella, cantidad, total, costo):
+    sql = SQL_ACUMULAR.get(connection.vendor)
+    if sql is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                huella.sucursal_id, huella.fecha, huella.tipo_pago, huella.estado, cantidad, total, costo
+            ])
+        return
+
+    # Otros motores: UPDATE y, si no había fila, INSERT
+    filtro = {
+        'id_sucursal_id': huella.sucursal_id, 'fecha': huella.fecha,
+        'tipo_pago': huella.tipo_pago, 'estado': huella.estado,
+    }
+    cambios = {'cantidad': F('cantidad') + cantidad, 'total': F('total') + total, 'costo': F('costo') + costo}
+    if ResumenVentaDiario.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenVentaDiario.objects.create(**filtro, cantidad=cantidad, total=total, costo=costo)
+    except IntegrityError:
+        # Otra transacción creó la fila en paralelo
+        ResumenVentaDiario.objects.filter(**filtro).update(**cambios)
+
+
+def aplicar(antes=None, despues=None):
+    """
+    Resta la huella anterior y suma la nueva (cualquiera puede ser None).
+    Marca además los días afectados como modificados para los reportes cacheados
+    (aunque la huella no cambie: p. ej. se editó el cliente de la venta).
+    """
+    for h in {antes, despues} - {None}:
+        versiones.incrementar_dia('ventas', h.sucursal_id, h.fecha)
+    if antes == despues:
+        return
+    if antes is not None and despues is not None and antes[:4] == despues[:4]:
+        # Misma fila del rollup: un solo UPDATE con la diferencia
+        _acumular(despues, 0, despues.total - antes.total, despues.costo - antes.costo)
+        return
+    if antes is not None:
+        _acumular(antes, -1, -antes.total, -antes.costo)
+    if despues is not None:
+        _acumular(despues, 1, despues.total, despues.costo)
+
+
+def sumar_costo(venta, costo):
+    """Ajusta solo el costo del día de una venta (alta/edición/baja de un detalle suelto)"""
+    h = huella(venta, costo=Decimal('0'))
+    versiones.incrementar_dia('ventas', h.sucursal_id, h.fecha)
+    if costo:
+        _acumular(h, 0, Decimal('0'), costo)
+
+
+def reconstruir(desde=None, hasta=None, sucursal_id=None, tamano_lote=2000, apps=None):
+    """
+    Recalcula el rollup desde las ventas para los días locales [desde, hasta].
+    La agrupación por día local y el costo se resuelven en SQL (ConsultaVentas).
+    Desde una migración se pasa `apps` para usar los modelos históricos.
+    Devuelve la cantidad de filas de resumen escritas.
+    """
+    consulta = ConsultaVentas(
+        timezone.make_aware(datetime.combine(desde, time.min)) if desde else None,
+        timezone.make_aware(datetime.combine(hasta, time.max)) if hasta else None,
+        sucursal_id,
+        apps=apps,
+    )
+    resumen = apps.get_model('api', 'ResumenVentaDiario') if apps else ResumenVentaDiario
+    resumenes = resumen.objects.all()
+    if desde:
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        resumenes = resumenes.filter(fecha__lte=hasta)
+    if sucursal_id:
+        resumenes = resumenes.filter(id_sucursal_id=sucursal_id)
+
+    filas = [
+        resumen(
+            id_sucursal_id=id_sucursal, fecha=fecha, tipo_pago=tipo_pago, estado=estado,
+            cantidad=cantidad, total=total, costo=costo
+        )
+        for id_sucursal, fecha, tipo_pago, estado, cantidad, total, costo in consulta.totales_por_dia()
+    ]
+    with transaction.atomic():
+        resumenes.delete()
+        resumen.objects.bulk_create(filas, batch_size=tamano_lote)
+    return len(filas)
@@ -0,0 +1,152 @@
+"""
+select_related / prefetch_related / only() derivados del serializer.
+
+Los serializers leen atributos de modelos relacionados con `source='id_x.campo'`.
+Sin select_related cada fila del listado dispara una consulta por relación
+(1 + filas × relaciones). plan_consulta recorre los campos del serializer una sola
+vez por clase y arma:
+
+- select_related para cada FK/OneToOne recorrida desde el modelo raíz
+- prefetch_related para relaciones inversas o M2M (serializers anidados many=True)
+  y las FK que se recorren dentro de ellas
+- only() con las columnas que el serializer realmente lee (raíz y relaciones
+  unidas por JOIN). Si algún campo lee algo que no es una columna (propiedad,
+  método, source='*'), no se restringe: no hay forma de saber qué columnas usa.
+
+Con ?fields=a,b (solo esos) u ?omit=c,d (todos menos esos) en un GET, el
+serializer (CamposDinamicosMixin) quita los demás campos y el plan se calcula
+sobre los que quedan: un listado que pide 5 columnas no une ni lee el resto.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+PARAMETRO_CAMPOS = 'fields'
+PARAMETRO_OMITIR = 'omit'
+
+
+def _lista(valor):
+    return frozenset(nombre.strip() for nombre in valor.split(',') if nombre.strip()) if valor else None
+
+
+def campos_pedidos(request):
+    """(incluir, omitir) según ?fields= y ?omit= de un GET, o None si no se pidió recorte"""
+    if request is None or request.method != 'GET':
+        return None
+    incluir = _lista(request.query_params.get(PARAMETRO_CAMPOS))
+    omitir = _lista(request.query_params.get(PARAMETRO_OMITIR))
+    if incluir is None and omitir is None:
+        return None
+    return incluir, omitir or frozenset()
+
+
+def recortar_campos(serializer, pedido):
+    """Quita del serializer los campos no pedidos (los nombres desconocidos se ignoran)"""
+    if pedido is None:
+        return
+    incluir, omitir = pedido
+    for nombre in list(serializer.fields):
+        if (incluir is not None and nombre not in incluir) or nombre in omitir:
+            serializer.fields.pop(nombre)
+
+
+class CamposDinamicosMixin:
+    """
+    Serializer que respeta ?fields= / ?omit= del request de su contexto. Solo el
+    serializer raíz (o el hijo de many=True) recibe el contexto al construirse:
+    los anidados conservan todos sus campos.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        recortar_campos(self, campos_pedidos(self.context.get('request')))
+
+
+def _es_directa(campo_modelo):
+    """FK u OneToOne declarada en el modelo (se puede unir con select_related)"""
+    return campo_modelo.concrete and (campo_modelo.many_to_one or campo_modelo.one_to_one)
+
+
+def _recorrer(serializer, modelo, prefijo, plan, en_prefetch):
+    for campo in serializer.fields.values():
+        if campo.write_only:
+            continue
+        if campo.source == '*':
+            plan['restringir'] = plan['restringir'] and en_prefetch
+            continue
+
+        anidado = campo.child if isinstance(campo, serializers.ListSerializer) else campo
+        es_serializer = isinstance(anidado, serializers.BaseSerializer)
+        actual, ruta, prefetch = modelo, prefijo, en_prefetch
+        atributos = campo.source_attrs
+        for i, atributo in enumerate(atributos):
+            try:
+                campo_modelo = actual._meta.get_field(atributo)
+            except FieldDoesNotExist:
+                # Propiedad o método: no se conocen sus columnas
+                plan['restringir'] = plan['restringir'] and prefetch
+                break
+            lookup = f'{ruta}{atributo}'
+            ultimo = i == len(atributos) - 1
+
+            if not campo_modelo.is_relation:
+                if not prefetch:
+                    plan['only'].add(lookup)
+                break
+            if ultimo and not es_serializer:
+                # PrimaryKeyRelatedField: basta la columna id_x, sin JOIN
+                if not prefetch:
+                    plan['only'].add(lookup)
+                break
+
+            if _es_directa(campo_modelo) and not prefetch:
+                plan['select'].add(lookup)
+                plan['only'].add(lookup)
+            else:
+                plan['prefetch'].add(lookup)
+                prefetch = True
+            actual, ruta = campo_modelo.related_model, f'{lookup}__'
+
+            if ultimo:
+                _recorrer(anidado, actual, ruta, plan, prefetch)
+
+
+@lru_cache(maxsize=512)
+def plan_consulta(serializer_class, pedido=None):
+    """(select_related, prefetch_related, only o None) para un serializer de modelo"""
+    serializer = serializer_class()
+    recortar_campos(serializer, pedido)
+    plan = {'select': set(), 'prefetch': set(), 'only': set(), 'restringir': True}
+    _recorrer(serializer, serializer.Meta.model, '', plan, False)
+    return (
+        sorted(plan['select']),
+        sorted(plan['prefetch']),
+        sorted(plan['only']) if plan['restringir'] else None,
+    )
+
+
+def optimizar_queryset(queryset, serializer_class, pedido=None):
+    select, prefetch, only = plan_consulta(serializer_class, pedido)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+class SeleccionAutomaticaMixin:
+    """
+    Aplica el plan del serializer al queryset de list y retrieve (los únicos que solo
+    serializan). En escrituras y acciones custom no se difieren columnas: el código
+    de la vista puede leer campos que el serializer no expone.
+    """
+    acciones_optimizadas = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.acciones_optimizadas:
+            queryset = optimizar_queryset(queryset, self.get_serializer_class(), campos_pedidos(self.request))
+        return queryset
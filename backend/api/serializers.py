@@ -1,15 +1,28 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .autenticacion import claims_usuario, revocado
+from .seleccion import CamposDinamicosMixin
 from .models import (
     Rol, Sucursal, Categoria, Usuario, Cliente, Producto, 
-    Inventario, Venta, DetalleVenta, ServicioTecnico
+    Inventario, Venta, DetalleVenta, ServicioTecnico, MovimientoInventario,
+    Transferencia, DetalleTransferencia, TrabajoReporte
 )
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Custom JWT serializer that validates user is active before issuing token.
+    El token lleva rol, sucursal y estado (ver api/autenticacion.py).
     """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, valor in claims_usuario(user).items():
+            token[claim] = valor
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         
@@ -21,22 +34,40 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         return data
 
-class RolSerializer(serializers.ModelSerializer):
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Renovación con verificación en la base de datos: rechaza usuarios desactivados
+    o con la sesión revocada, y emite el access token con los claims actuales.
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        usuario = Usuario.objects.select_related('id_rol').filter(
+            pk=refresh.get(api_settings.USER_ID_CLAIM)
+        ).first()
+        if usuario is None or not usuario.activo or revocado(usuario.pk, refresh):
+            raise AuthenticationFailed('La sesión ya no es válida. Inicie sesión nuevamente.', code='no_active_account')
+
+        access = refresh.access_token
+        for claim, valor in claims_usuario(usuario).items():
+            access[claim] = valor
+        return {'access': str(access)}
+
+class RolSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Rol
         fields = '__all__'
 
-class SucursalSerializer(serializers.ModelSerializer):
+class SucursalSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Sucursal
         fields = '__all__'
 
-class CategoriaSerializer(serializers.ModelSerializer):
+class CategoriaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Categoria
         fields = '__all__'
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     numero_rol = serializers.IntegerField(source='id_rol.numero_rol', read_only=True)
 
@@ -62,12 +93,12 @@ class UsuarioSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Cliente
         fields = '__all__'
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombre_categoria = serializers.CharField(source='id_categoria.nombre_categoria', read_only=True)
     activo = serializers.BooleanField(default=True, required=False)
     
@@ -81,7 +112,7 @@ class ProductoSerializer(serializers.ModelSerializer):
         fields = ['id_producto', 'nombre_producto', 'descripcion', 'codigo_barras', 
                   'id_categoria', 'nombre_categoria', 'precio', 'precio_compra', 'foto_producto', 'activo']
 
-class InventarioSerializer(serializers.ModelSerializer):
+class InventarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombre_producto = serializers.CharField(source='id_producto.nombre_producto', read_only=True)
     nombre_sucursal = serializers.CharField(source='id_sucursal.nombre', read_only=True)
 
@@ -89,7 +120,41 @@ class InventarioSerializer(serializers.ModelSerializer):
         model = Inventario
         fields = ['id_inventario', 'id_producto', 'nombre_producto', 'id_sucursal', 'nombre_sucursal', 'cantidad']
 
-class VentaSerializer(serializers.ModelSerializer):
+class MovimientoInventarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    numero_boleta = serializers.CharField(source='id_venta.numero_boleta', read_only=True)
+    nombre_usuario = serializers.CharField(source='id_usuario.nombre_apellido', read_only=True)
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id_movimiento', 'id_producto', 'id_sucursal', 'tipo', 'cantidad',
+                  'id_venta', 'numero_boleta', 'id_usuario', 'nombre_usuario', 'fecha']
+
+class DetalleTransferenciaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # IntegerField en lugar de PrimaryKeyRelatedField: los productos se validan
+    # en bloque al bloquear el inventario (evita una consulta por renglón)
+    id_producto = serializers.IntegerField(source='id_producto_id', min_value=1)
+    nombre_producto = serializers.CharField(source='id_producto.nombre_producto', read_only=True)
+    cantidad = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = DetalleTransferencia
+        fields = ['id_detalle_transferencia', 'id_producto', 'nombre_producto', 'cantidad']
+
+class TransferenciaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    nombre_sucursal_origen = serializers.CharField(source='id_sucursal_origen.nombre', read_only=True)
+    nombre_sucursal_destino = serializers.CharField(source='id_sucursal_destino.nombre', read_only=True)
+    nombre_usuario = serializers.CharField(source='id_usuario.nombre_apellido', read_only=True)
+    detalles = DetalleTransferenciaSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Transferencia
+        fields = ['id_transferencia', 'id_sucursal_origen', 'nombre_sucursal_origen',
+                  'id_sucursal_destino', 'nombre_sucursal_destino', 'id_usuario', 'nombre_usuario',
+                  'observacion', 'fecha', 'detalles']
+        read_only_fields = ['id_usuario', 'fecha']
+        extra_kwargs = {'id_sucursal_origen': {'required': False}}
+
+class VentaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombre_cliente = serializers.CharField(source='id_cliente.nombre_apellido', read_only=True)
     nombre_usuario = serializers.CharField(source='id_usuario.nombre_apellido', read_only=True)
     nombre_sucursal = serializers.CharField(source='id_sucursal.nombre', read_only=True)
@@ -107,7 +172,23 @@ class VentaSerializer(serializers.ModelSerializer):
         read_only_fields = ['numero_boleta', 'id_usuario', 'id_sucursal',
                            'estado', 'motivo_anulacion', 'fecha_anulacion']
 
-class DetalleVentaSerializer(serializers.ModelSerializer):
+class ItemCheckoutSerializer(serializers.Serializer):
+    """Renglón del carrito enviado a /ventas/checkout/"""
+    id_producto = serializers.IntegerField(min_value=1)
+    cantidad = serializers.IntegerField(min_value=1)
+    precio_venta = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+
+class CheckoutVentaSerializer(serializers.Serializer):
+    """
+    Carrito completo de una venta (cabecera + renglones) para el checkout atómico.
+    Los productos se resuelven en bloque en la vista, no aquí, para evitar N consultas.
+    """
+    id_cliente = serializers.PrimaryKeyRelatedField(queryset=Cliente.objects.all(), allow_null=True, required=False)
+    id_sucursal = serializers.PrimaryKeyRelatedField(queryset=Sucursal.objects.all(), required=False)
+    tipo_pago = serializers.ChoiceField(choices=Venta.METODO_PAGO_CHOICES, default='Efectivo')
+    items = ItemCheckoutSerializer(many=True, allow_empty=False)
+
+class DetalleVentaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombre_producto = serializers.CharField(source='id_producto.nombre_producto', read_only=True)
     
     class Meta:
@@ -116,7 +197,7 @@ class DetalleVentaSerializer(serializers.ModelSerializer):
                   'cantidad', 'precio_venta', 'costo_unitario']
         read_only_fields = ['costo_unitario']
 
-class ServicioTecnicoSerializer(serializers.ModelSerializer):
+class ServicioTecnicoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Campos enriquecidos (read-only)
     nombre_cliente = serializers.CharField(source='id_cliente.nombre_apellido', read_only=True)
     celular_cliente = serializers.CharField(source='id_cliente.celular', read_only=True)
@@ -146,7 +227,22 @@ class ServicioTecnicoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['numero_servicio', 'id_usuario', 'id_sucursal', 'fecha_entrega', 'fecha_anulacion', 'created_at', 'updated_at', 'saldo']
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class TrabajoReporteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    nombre_sucursal = serializers.CharField(source='id_sucursal.nombre', read_only=True)
+
+    class Meta:
+        model = TrabajoReporte
+        fields = ['id_trabajo', 'tipo', 'id_sucursal', 'nombre_sucursal', 'fecha_desde', 'fecha_hasta',
+                  'estado', 'desde_cache', 'error', 'fecha_creacion', 'fecha_inicio', 'fecha_fin']
+        read_only_fields = ['estado', 'desde_cache', 'error', 'fecha_creacion', 'fecha_inicio', 'fecha_fin']
+        extra_kwargs = {'id_sucursal': {'required': False}}
+
+    def validate(self, data):
+        if data['fecha_desde'] > data['fecha_hasta']:
+            raise serializers.ValidationError({'fecha_hasta': 'La fecha hasta debe ser posterior a la fecha desde.'})
+        return data
+
+class UserProfileSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False, allow_blank=True)
     confirm_password = serializers.CharField(write_only=True, required=False, allow_blank=True)
     
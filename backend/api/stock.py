@@ -0,0 +1,312 @@
+"""
+Servicio central de stock.
+
+Toda modificación de Inventario.cantidad pasa por aquí. Las operaciones son
+sentencias UPDATE condicionales y por conjunto (una sola sentencia para todos
+los renglones), de modo que ventas concurrentes del mismo producto no pierden
+actualizaciones y una anulación grande no hace un SELECT + UPDATE por renglón.
+
+Cada operación deja además su rastro en el kardex (MovimientoInventario), que
+junto con los snapshots periódicos permite consultar el stock a una fecha.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from . import versiones
+from .models import Inventario, MovimientoInventario, SnapshotInventario
+
+
+class StockInsuficienteError(Exception):
+    """
+    Uno o más renglones no tienen stock suficiente (o no existen en el inventario).
+    `fallidos` es una lista de dicts: {id_producto, solicitado, disponible}
+    donde disponible es None si el producto no está en el inventario de la sucursal.
+    """
+
+    def __init__(self, fallidos):
+        self.fallidos = fallidos
+        super().__init__(f'Stock insuficiente en {len(fallidos)} renglón(es)')
+
+
+class _ActualizacionParcial(Exception):
+    pass
+
+
+def _delta_por_producto(cantidades):
+    """CASE id_producto WHEN p THEN n ... END para aplicar todas las cantidades en un UPDATE"""
+    return Case(
+        *[When(id_producto_id=id_producto, then=Value(cantidad)) for id_producto, cantidad in cantidades.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _registrar_movimientos(sucursal_id, deltas, tipo, venta=None, usuario=None, transferencia=None):
+    """
+    Inserta en bloque los movimientos del kardex ({id_producto: cantidad con signo}).
+    Toda operación de stock pasa por aquí, así que también invalida (al confirmar)
+    el stock en memoria de la sucursal que guarda cada worker.
+    """
+    versiones.incrementar(versiones.clave_inventario(sucursal_id))
+    ahora = timezone.now()
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(
+            id_producto_id=id_producto,
+            id_sucursal_id=sucursal_id,
+            tipo=tipo,
+            cantidad=delta,
+            id_venta=venta,
+            id_transferencia=transferencia,
+            id_usuario=usuario,
+            fecha=ahora,
+        )
+        for id_producto, delta in deltas.items() if delta
+    ])
+
+
+def descontar_stock(sucursal_id, cantidades, venta=None, usuario=None, tipo='Venta'):
+    """
+    Descuenta {id_producto: cantidad} del inventario de una sucursal.
+
+    Ejecuta un único UPDATE ... SET cantidad = cantidad - n WHERE cantidad >= n
+    para todos los renglones. Si alguno no cumple la condición no se aplica
+    ninguno y se lanza StockInsuficienteError indicando exactamente cuáles fallaron.
+    """
+    cantidades = {id_producto: cantidad for id_producto, cantidad in cantidades.items() if cantidad}
+    if not cantidades:
+        return
+
+    condicion = Q()
+    for id_producto, cantidad in cantidades.items():
+        condicion |= Q(id_producto_id=id_producto, cantidad__gte=cantidad)
+
+    try:
+        with transaction.atomic():
+            actualizadas = Inventario.objects.filter(id_sucursal_id=sucursal_id).filter(condicion).update(
+                cantidad=F('cantidad') - _delta_por_producto(cantidades),
+                updated_at=timezone.now(),
+            )
+            if actualizadas != len(cantidades):
+                raise _ActualizacionParcial()
+            _registrar_movimientos(
+                sucursal_id, {id_producto: -cantidad for id_producto, cantidad in cantidades.items()},
+                tipo, venta, usuario
+            )
+    except _ActualizacionParcial:
+        raise StockInsuficienteError(_renglones_fallidos(sucursal_id, cantidades))
+
+
+def _renglones_fallidos(sucursal_id, cantidades):
+    disponibles = dict(
+        Inventario.objects.filter(id_sucursal_id=sucursal_id, id_producto_id__in=cantidades.keys())
+        .values_list('id_producto_id', 'cantidad')
+    )
+    return [
+        {'id_producto': id_producto, 'solicitado': cantidad, 'disponible': disponibles.get(id_producto)}
+        for id_producto, cantidad in cantidades.items()
+        if disponibles.get(id_producto) is None or disponibles[id_producto] < cantidad
+    ]
+
+
+def restaurar_stock(sucursal_id, cantidades, venta=None, usuario=None, tipo='Anulación'):
+    """
+    Devuelve {id_producto: cantidad} al inventario de una sucursal en un único
+    UPDATE por conjunto (p. ej. todos los renglones de una venta anulada).
+    Los productos sin registro de inventario en la sucursal se ignoran.
+    """
+    cantidades = {id_producto: cantidad for id_producto, cantidad in cantidades.items() if cantidad}
+    if not cantidades:
+        return 0
+
+    with transaction.atomic():
+        existentes = set(
+            Inventario.objects.filter(id_sucursal_id=sucursal_id, id_producto_id__in=cantidades.keys())
+            .values_list('id_producto_id', flat=True)
+        )
+        actualizadas = Inventario.objects.filter(
+            id_sucursal_id=sucursal_id, id_producto_id__in=existentes
+        ).update(
+            cantidad=F('cantidad') + _delta_por_producto(cantidades),
+            updated_at=timezone.now(),
+        )
+        _registrar_movimientos(
+            sucursal_id, {id_producto: cantidades[id_producto] for id_producto in existentes},
+            tipo, venta, usuario
+        )
+    return actualizadas
+
+
+def fijar_stock(id_inventario, cantidad, usuario=None):
+    """
+    Ajuste manual: fija la cantidad de un registro de inventario (conteo físico).
+    Bloquea la fila para que el ajuste no pise una venta en curso.
+    Devuelve la diferencia aplicada (nueva - anterior).
+    """
+    with transaction.atomic():
+        id_producto, sucursal_id, anterior = Inventario.objects.select_for_update().values_list(
+            'id_producto_id', 'id_sucursal_id', 'cantidad'
+        ).get(pk=id_inventario)
+        Inventario.objects.filter(pk=id_inventario).update(cantidad=cantidad, updated_at=timezone.now())
+        _registrar_movimientos(sucursal_id, {id_producto: cantidad - anterior}, 'Ajuste', usuario=usuario)
+    return cantidad - anterior
+
+
+def fijar_stock_lote(sucursal_id, cantidades, usuario=None, dry_run=False):
+    """
+    Conteo físico en bloque: fija {id_producto: cantidad} en una sucursal.
+
+    Bloquea las filas existentes con una sola consulta, crea las que faltan con
+    bulk_create y actualiza las que cambian con bulk_update; las diferencias
+    quedan en el kardex como 'Ajuste'. Con dry_run solo calcula el diff.
+    Devuelve una lista de (id_producto, cantidad_anterior, cantidad_nueva) con
+    los renglones que cambian (anterior es None si el registro no existía).
+    """
+    if not cantidades:
+        return []
+
+    with transaction.atomic():
+        queryset = Inventario.objects.filter(
+            id_sucursal_id=sucursal_id, id_producto_id__in=cantidades.keys()
+        ).only('id_inventario', 'id_producto', 'cantidad').order_by('pk')
+        if not dry_run:
+            queryset = queryset.select_for_update()
+        existentes = {inv.id_producto_id: inv for inv in queryset}
+
+        ahora = timezone.now()
+        diferencias, nuevos, cambiados = [], [], []
+        for id_producto, cantidad in cantidades.items():
+            inventario = existentes.get(id_producto)
+            if inventario is None:
+                diferencias.append((id_producto, None, cantidad))
+                nuevos.append(Inventario(id_producto_id=id_producto, id_sucursal_id=sucursal_id, cantidad=cantidad))
+            elif inventario.cantidad != cantidad:
+                diferencias.append((id_producto, inventario.cantidad, cantidad))
+                inventario.cantidad = cantidad
+                inventario.updated_at = ahora
+                cambiados.append(inventario)
+
+        if not dry_run:
+            Inventario.objects.bulk_create(nuevos)
+            Inventario.objects.bulk_update(cambiados, ['cantidad', 'updated_at'])
+            _registrar_movimientos(
+                sucursal_id,
+                {id_producto: nueva - (anterior or 0) for id_producto, anterior, nueva in diferencias},
+                'Ajuste', usuario=usuario
+            )
+    return diferencias
+
+
+def transferir_stock(origen_id, destino_id, cantidades, transferencia=None, usuario=None):
+    """
+    Mueve {id_producto: cantidad} de la sucursal origen a la destino.
+
+    Bloquea todas las filas existentes de origen y destino con un único
+    select_for_update ordenado por (id_sucursal, id_producto), crea en bloque
+    los registros de destino que falten y aplica los deltas con dos UPDATE por
+    conjunto. Lanza StockInsuficienteError si algún renglón no alcanza.
+
+    Dos transferencias entre las mismas sucursales (en cualquier sentido) toman
+    las filas en ese mismo orden, así que no forman ciclos de espera. Las filas
+    de destino que se crean aquí no existían, nadie más puede tenerlas tomadas.
+    El checkout bloquea con su UPDATE solo filas de una sucursal, en el orden
+    del índice que elija el motor: frente a él este orden no está garantizado y
+    un interbloqueo, si ocurre, lo resuelve el motor abortando una transacción.
+    """
+    cantidades = {id_producto: cantidad for id_producto, cantidad in cantidades.items() if cantidad}
+    if not cantidades:
+        return
+
+    with transaction.atomic():
+        filas = Inventario.objects.select_for_update().filter(
+            id_sucursal_id__in=[origen_id, destino_id], id_producto_id__in=cantidades.keys()
+        ).order_by('id_sucursal_id', 'id_producto_id').values_list(
+            'id_producto_id', 'id_sucursal_id', 'cantidad'
+        )
+        disponibles, en_destino = {}, set()
+        for id_producto, id_sucursal, cantidad in filas:
+            if id_sucursal == origen_id:
+                disponibles[id_producto] = cantidad
+            else:
+                en_destino.add(id_producto)
+
+        fallidos = [
+            {'id_producto': id_producto, 'solicitado': cantidad, 'disponible': disponibles.get(id_producto)}
+            for id_producto, cantidad in cantidades.items()
+            if disponibles.get(id_producto) is None or disponibles[id_producto] < cantidad
+        ]
+        if fallidos:
+            raise StockInsuficienteError(fallidos)
+
+        Inventario.objects.bulk_create([
+            Inventario(id_producto_id=id_producto, id_sucursal_id=destino_id, cantidad=0)
+            for id_producto in cantidades if id_producto not in en_destino
+        ], ignore_conflicts=True)
+
+        ahora = timezone.now()
+        Inventario.objects.filter(id_sucursal_id=origen_id, id_producto_id__in=cantidades.keys()).update(
+            cantidad=F('cantidad') - _delta_por_producto(cantidades), updated_at=ahora
+        )
+        Inventario.objects.filter(id_sucursal_id=destino_id, id_producto_id__in=cantidades.keys()).update(
+            cantidad=F('cantidad') + _delta_por_producto(cantidades), updated_at=ahora
+        )
+        _registrar_movimientos(
+            origen_id, {id_producto: -cantidad for id_producto, cantidad in cantidades.items()},
+            'Transferencia', usuario=usuario, transferencia=transferencia
+        )
+        _registrar_movimientos(destino_id, cantidades, 'Transferencia', usuario=usuario, transferencia=transferencia)
+
+
+def stock_a_fecha(inventario, fecha):
+    """
+    Stock de un registro de inventario en el instante `fecha`.
+
+    Parte del snapshot más cercano (anterior o, si no hay, posterior) y aplica
+    solo los movimientos entre el snapshot y la fecha: una lectura de snapshot
+    más un rango acotado del índice (producto, sucursal, fecha). Sin snapshots
+    retrocede desde la cantidad actual.
+    """
+    movimientos = MovimientoInventario.objects.filter(
+        id_producto_id=inventario.id_producto_id, id_sucursal_id=inventario.id_sucursal_id
+    )
+    snapshots = SnapshotInventario.objects.filter(
+        id_producto_id=inventario.id_producto_id, id_sucursal_id=inventario.id_sucursal_id
+    )
+
+    anterior = snapshots.filter(fecha_corte__lte=fecha).order_by('-fecha_corte').first()
+    if anterior:
+        delta = movimientos.filter(fecha__gt=anterior.fecha_corte, fecha__lte=fecha).aggregate(t=Sum('cantidad'))['t']
+        return anterior.cantidad + (delta or 0)
+
+    posterior = snapshots.filter(fecha_corte__gt=fecha).order_by('fecha_corte').first()
+    if posterior:
+        base, hasta = posterior.cantidad, posterior.fecha_corte
+        delta = movimientos.filter(fecha__gt=fecha, fecha__lte=hasta).aggregate(t=Sum('cantidad'))['t']
+    else:
+        base = Inventario.objects.values_list('cantidad', flat=True).get(pk=inventario.pk)
+        delta = movimientos.filter(fecha__gt=fecha).aggregate(t=Sum('cantidad'))['t']
+    return base - (delta or 0)
+
+
+def generar_snapshots(sucursal_id=None, fecha_corte=None):
+    """Inserta un snapshot por registro de inventario (de una sucursal o de todas)"""
+    fecha_corte = fecha_corte or timezone.now()
+    inventarios = Inventario.objects.all()
+    if sucursal_id:
+        inventarios = inventarios.filter(id_sucursal_id=sucursal_id)
+
+    total = 0
+    lote = []
+    for id_producto, id_sucursal, cantidad in inventarios.values_list(
+        'id_producto_id', 'id_sucursal_id', 'cantidad'
+    ).iterator(chunk_size=2000):
+        lote.append(SnapshotInventario(
+            id_producto_id=id_producto, id_sucursal_id=id_sucursal,
+            fecha_corte=fecha_corte, cantidad=cantidad
+        ))
+        if len(lote) >= 2000:
+            SnapshotInventario.objects.bulk_create(lote)
+            total += len(lote)
+            lote = []
+    SnapshotInventario.objects.bulk_create(lote)
+    return total + len(lote)
@@ -1,13 +1,53 @@
-from datetime import date, timedelta
+import base64
+import importlib
+import io
+import multiprocessing
+import re
+import tempfile
+import time
+import unittest
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from unittest import mock
 
+import openpyxl
+from reportlab.platypus import Table
 from django.conf import settings
-from django.test import SimpleTestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
+from .models import (
+    Categoria, ClaveIdempotencia, Cliente, DetalleVenta, IndiceBusqueda, Inventario, MovimientoInventario, Producto,
+    ResumenVentaDiario, RevocacionToken, Rol, Secuencia, ServicioTecnico, Sucursal, TrabajoReporte, Usuario, Venta
+)
+from . import busqueda
+from .autenticacion import JWTClaimsAuthentication
+from .autocompletado import INDICES
+from .catalogo import indice_catalogo
+from .consultas_reportes import ConsultaServicios
+from .idempotencia import purgar_vencidas
+from .importacion import importar_inventario, leer_filas
+from .resumen_ventas import Huella, aplicar, reconstruir
+from .stock import (
+    StockInsuficienteError, descontar_stock, generar_snapshots, restaurar_stock, stock_a_fecha, transferir_stock
+)
+from .reportes import ALTO_UTIL, ESTILO_TABLA_VENTAS, filas_excel_ventas, tablas_por_partes
+from .trabajos import latido, reencolar_colgados
 from .views_reports import ReporteBaseView
 
 
+CACHE_LOCAL = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
 class _DummyRequest:
     query_params = {}
 
@@ -28,3 +68,1393 @@ class TimezoneBoliviaTests(SimpleTestCase):
         self.assertTrue(timezone.is_aware(fecha_hasta))
         self.assertEqual(fecha_desde.date(), date(2026, 1, 27))
         self.assertEqual(fecha_hasta.date(), date(2026, 1, 27))
+
+
+def _sentencias(ctx, prefijo=""):
+    """Consultas capturadas que empiezan por `prefijo`, sin contar SAVEPOINT/RELEASE"""
+    return sum(
+        1 for q in ctx.captured_queries
+        if "SAVEPOINT" not in q["sql"] and q["sql"].startswith(prefijo)
+    )
+
+
+class _DatosBaseMixin:
+    """Datos mínimos (sucursal, cajero, cliente, productos con stock) para tests de API."""
+
+    def crear_datos_base(self):
+        self.rol_super = Rol.objects.get(numero_rol=1)
+        self.rol_cajero = Rol.objects.get(numero_rol=4)
+        self.sucursal = Sucursal.objects.create(nombre="Sucursal Test")
+        self.usuario = Usuario.objects.create_user(
+            correo_electronico="cajero@test.com",
+            nombre_apellido="Cajero Test",
+            id_rol=self.rol_cajero,
+            id_sucursal=self.sucursal,
+            password="test1234",
+        )
+        self.cliente = Cliente.objects.create(nombre_apellido="Cliente Test")
+        categoria = Categoria.objects.create(nombre_categoria="Accesorios", tipo="producto")
+        self.productos = [
+            Producto.objects.create(
+                nombre_producto=f"Producto {i}",
+                codigo_barras=f"77000{i}",
+                id_categoria=categoria,
+                precio=Decimal("10.00") * i,
+                precio_compra=Decimal("6.00") * i,
+            )
+            for i in range(1, 4)
+        ]
+        for producto in self.productos:
+            Inventario.objects.create(id_producto=producto, id_sucursal=self.sucursal, cantidad=5)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+
+class CheckoutVentaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+
+    def test_checkout_crea_venta_detalles_y_descuenta_stock(self):
+        p1, p2, _ = self.productos
+        response = self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk,
+            "tipo_pago": "QR",
+            "items": [
+                {"id_producto": p1.pk, "cantidad": 2, "precio_venta": "10.00"},
+                {"id_producto": p2.pk, "cantidad": 1},
+            ],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["total_venta"], "40.00")
+        self.assertTrue(response.data["numero_boleta"].startswith("VTA-"))
+        detalles = DetalleVenta.objects.filter(id_venta=response.data["id_venta"]).order_by("pk")
+        self.assertEqual([d.costo_unitario for d in detalles], [p1.precio_compra, p2.precio_compra])
+        self.assertEqual(Inventario.objects.get(id_producto=p1).cantidad, 3)
+        self.assertEqual(Inventario.objects.get(id_producto=p2).cantidad, 4)
+
+    def test_checkout_sin_stock_no_deja_venta_huerfana(self):
+        p1, p2, _ = self.productos
+        response = self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk,
+            "items": [
+                {"id_producto": p1.pk, "cantidad": 1},
+                {"id_producto": p2.pk, "cantidad": 99},
+            ],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["items"]), 1)
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(Inventario.objects.get(id_producto=p1).cantidad, 5)
+
+
+class SecuenciaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+
+    def test_contador_nuevo_continua_numeracion_existente(self):
+        anio = timezone.localdate().year
+        Venta.objects.create(numero_boleta=f"VTA-{anio}-00041", id_usuario=self.usuario,
+                             id_sucursal=self.sucursal, total_venta=1)
+
+        venta = Venta.objects.create(id_usuario=self.usuario, id_sucursal=self.sucursal, total_venta=1)
+
+        self.assertEqual(venta.numero_boleta, f"VTA-{anio}-00042")
+        self.assertEqual(Secuencia.objects.get(prefijo="VTA", anio=anio).ultimo_numero, 42)
+
+    def test_sembrar_secuencias_no_retrocede_contador(self):
+        Venta.objects.create(numero_boleta="VTA-2025-00007", id_usuario=self.usuario,
+                             id_sucursal=self.sucursal, total_venta=1)
+        Secuencia.objects.create(prefijo="ST", anio=2025, ultimo_numero=30)
+
+        call_command("sembrar_secuencias", stdout=mock.MagicMock())
+
+        self.assertEqual(Secuencia.objects.get(prefijo="VTA", anio=2025).ultimo_numero, 7)
+        self.assertEqual(Secuencia.objects.get(prefijo="ST", anio=2025).ultimo_numero, 30)
+
+
+def _reservar_numeros(cantidad, cola):
+    connections.close_all()
+    cola.put([Secuencia.objects.siguiente_numero("VTA", 2030) for _ in range(cantidad)])
+
+
+class SecuenciaConcurrenciaTests(TransactionTestCase):
+    PROCESOS = 4
+    POR_PROCESO = 25
+
+    def test_varios_procesos_no_repiten_numeros(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise unittest.SkipTest("Requiere una base de datos compartida entre procesos")
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise unittest.SkipTest("Requiere multiprocessing con fork")
+
+        Secuencia.objects.create(prefijo="VTA", anio=2030)
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        cola = contexto.Queue()
+        procesos = [
+            contexto.Process(target=_reservar_numeros, args=(self.POR_PROCESO, cola))
+            for _ in range(self.PROCESOS)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        numeros = []
+        for _ in procesos:
+            numeros.extend(cola.get(timeout=60))
+        for proceso in procesos:
+            proceso.join()
+
+        total = self.PROCESOS * self.POR_PROCESO
+        self.assertEqual(sorted(numeros), list(range(1, total + 1)))
+        self.assertEqual(Secuencia.objects.get(prefijo="VTA", anio=2030).ultimo_numero, total)
+
+
+class StockServiceTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+
+    def _stock(self):
+        return list(
+            Inventario.objects.filter(id_sucursal=self.sucursal).order_by("id_producto")
+            .values_list("cantidad", flat=True)
+        )
+
+    def test_descontar_reporta_renglones_fallidos_sin_aplicar_ninguno(self):
+        p1, p2, p3 = self.productos
+        p3_otro = Producto.objects.create(nombre_producto="Sin inventario", precio=1)
+
+        with self.assertRaises(StockInsuficienteError) as ctx:
+            descontar_stock(self.sucursal.pk, {p1.pk: 2, p2.pk: 6, p3_otro.pk: 1})
+
+        self.assertEqual(ctx.exception.fallidos, [
+            {"id_producto": p2.pk, "solicitado": 6, "disponible": 5},
+            {"id_producto": p3_otro.pk, "solicitado": 1, "disponible": None},
+        ])
+        self.assertEqual(self._stock(), [5, 5, 5])
+
+    def test_descontar_y_restaurar_en_bloque(self):
+        p1, p2, p3 = self.productos
+
+        with CaptureQueriesContext(connection) as ctx:
+            descontar_stock(self.sucursal.pk, {p1.pk: 5, p2.pk: 1, p3.pk: 2})
+        self.assertEqual(_sentencias(ctx, 'UPDATE "inventario"'), 1)
+        self.assertEqual(self._stock(), [0, 4, 3])
+
+        with CaptureQueriesContext(connection) as ctx:
+            restaurar_stock(self.sucursal.pk, {p1.pk: 5, p2.pk: 1, p3.pk: 2})
+        self.assertEqual(_sentencias(ctx, 'UPDATE "inventario"'), 1)
+        self.assertEqual(self._stock(), [5, 5, 5])
+
+    def test_anular_venta_restaura_stock_una_sola_vez(self):
+        p1, p2, _ = self.productos
+        venta = self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk,
+            "items": [{"id_producto": p1.pk, "cantidad": 3}, {"id_producto": p2.pk, "cantidad": 1}],
+        }, format="json").data
+
+        response = self.client.patch(f"/api/ventas/{venta['id_venta']}/anular/",
+                                     {"motivo_anulacion": "Devolución"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["estado"], "Anulada")
+        self.assertEqual(self._stock(), [5, 5, 5])
+
+        response = self.client.patch(f"/api/ventas/{venta['id_venta']}/anular/",
+                                     {"motivo_anulacion": "Otra vez"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._stock(), [5, 5, 5])
+
+
+class KardexTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        self.inventario = Inventario.objects.get(id_producto=self.productos[0], id_sucursal=self.sucursal)
+
+    def test_movimientos_y_stock_a_fecha(self):
+        p1 = self.productos[0]
+        ayer = timezone.now() - timedelta(days=1)
+        MovimientoInventario.objects.create(id_producto=p1, id_sucursal=self.sucursal,
+                                            tipo="Ajuste", cantidad=5, fecha=ayer - timedelta(hours=1))
+        generar_snapshots(fecha_corte=ayer)
+        self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk, "items": [{"id_producto": p1.pk, "cantidad": 2}],
+        }, format="json")
+        self.client.patch(f"/api/inventario/{self.inventario.pk}/", {"cantidad": 10}, format="json")
+
+        self.assertEqual(stock_a_fecha(self.inventario, ayer), 5)
+        self.assertEqual(stock_a_fecha(self.inventario, timezone.now()), 10)
+
+        response = self.client.get(f"/api/inventario/{self.inventario.pk}/movimientos/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["tipo"] for m in response.data["results"]], ["Ajuste", "Venta", "Ajuste"])
+        self.assertEqual([m["cantidad"] for m in response.data["results"]], [7, -2, 5])
+        self.assertEqual(response.data["stock_a_fecha"], 10)
+
+        fecha = timezone.localtime(ayer).date().isoformat()
+        response = self.client.get(f"/api/inventario/{self.inventario.pk}/movimientos/?fecha={fecha}")
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["stock_a_fecha"], 5)
+
+
+class ImportarInventarioTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+
+    def _archivo_csv(self, contenido, nombre="conteo.csv"):
+        return SimpleUploadedFile(nombre, contenido.encode("utf-8"), content_type="text/csv")
+
+    def test_dry_run_muestra_diff_sin_guardar(self):
+        p1, p2, _ = self.productos
+        csv_texto = f"codigo_barras,cantidad\n{p1.codigo_barras},8\n{p2.codigo_barras},5\nNOEXISTE,1\n"
+
+        response = self.client.post("/api/inventario/importar/",
+                                    {"archivo": self._archivo_csv(csv_texto), "dry_run": "true"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["actualizados"], 1)
+        self.assertEqual(response.data["sin_cambios"], 1)
+        self.assertEqual(response.data["diferencias"], [
+            {"codigo_barras": p1.codigo_barras, "cantidad_anterior": 5, "cantidad_nueva": 8}
+        ])
+        self.assertEqual(response.data["errores"][0]["fila"], 4)
+        self.assertEqual(Inventario.objects.get(id_producto=p1).cantidad, 5)
+
+    def test_importa_xlsx_por_lotes_creando_registros_faltantes(self):
+        nuevo = Producto.objects.create(nombre_producto="Nuevo", codigo_barras="123", precio=1)
+        libro = openpyxl.Workbook()
+        libro.active.append(["Codigo Barras", "Cantidad"])
+        libro.active.append([self.productos[0].codigo_barras, 2])
+        libro.active.append([123, 7])  # Excel guarda el código como número
+        buffer = io.BytesIO()
+        libro.save(buffer)
+        buffer.seek(0)
+
+        resumen = importar_inventario(leer_filas(buffer, "conteo.xlsx"), self.sucursal.pk, tamano_lote=1)
+
+        self.assertEqual((resumen["creados"], resumen["actualizados"]), (1, 1))
+        self.assertEqual(Inventario.objects.get(id_producto=nuevo, id_sucursal=self.sucursal).cantidad, 7)
+        self.assertEqual(Inventario.objects.get(id_producto=self.productos[0]).cantidad, 2)
+        self.assertEqual(
+            list(MovimientoInventario.objects.filter(tipo="Ajuste").order_by("pk").values_list("cantidad", flat=True)),
+            [-3, 7],
+        )
+
+    def test_cantidades_no_enteras_o_fuera_de_rango_son_error_por_fila(self):
+        p1 = self.productos[0]
+        filas = [(numero, {"codigo_barras": p1.codigo_barras, "cantidad": valor})
+                 for numero, valor in enumerate(["inf", "1e400", "2.7", "abc", "9" * 12, "4.0"], start=2)]
+
+        resumen = importar_inventario(iter(filas), self.sucursal.pk)
+
+        self.assertEqual([e["fila"] for e in resumen["errores"]], [2, 3, 4, 5, 6])
+        self.assertTrue(all(e["error"] == "Cantidad inválida" for e in resumen["errores"]))
+        self.assertEqual(Inventario.objects.get(id_producto=p1, id_sucursal=self.sucursal).cantidad, 4)
+
+
+class CatalogoProductosTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        self.usuario.id_rol = Rol.objects.get(numero_rol=2)
+        self.usuario.save()
+
+    def test_exportar_csv_en_streaming(self):
+        response = self.client.get("/api/productos/exportar/?formato=csv")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lineas = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lineas[0], "codigo_barras,nombre_producto,descripcion,categoria,precio,precio_compra,activo")
+        self.assertEqual(len(lineas), 4)
+
+    def test_importar_upsert_y_crea_categorias_faltantes(self):
+        existente = self.productos[0]
+        csv_texto = (
+            "codigo_barras,nombre_producto,precio,categoria\n"
+            f"{existente.codigo_barras},Renombrado,15.50,Accesorios\n"
+            "999,Cable USB,3,Cables\n"
+            "998,Sin precio,,Cables\n"
+        )
+
+        response = self.client.post("/api/productos/importar/", {
+            "archivo": SimpleUploadedFile("catalogo.csv", csv_texto.encode("utf-8"), content_type="text/csv"),
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data["creados"], response.data["actualizados"]), (1, 1))
+        self.assertEqual(response.data["categorias_creadas"], 1)
+        self.assertEqual(response.data["errores"], [{"fila": 4, "codigo_barras": "998", "error": "Precio inválido"}])
+        existente.refresh_from_db()
+        self.assertEqual((existente.nombre_producto, existente.precio), ("Renombrado", Decimal("15.50")))
+        self.assertEqual(existente.precio_compra, Decimal("6.00"))  # columna ausente: no se toca
+        nuevo = Producto.objects.get(codigo_barras="999")
+        self.assertEqual(nuevo.id_categoria.nombre_categoria, "Cables")
+
+    def test_importar_rechaza_por_fila_precios_y_codigos_fuera_de_rango(self):
+        csv_texto = (
+            "codigo_barras,nombre_producto,precio,precio_compra\n"
+            "901,Nan,nan,1\n"
+            "902,Inf,inf,1\n"
+            "903,Grande,123456789012,1\n"
+            "904,Compra nan,10,nan\n"
+            f"{'9' * 101},Código largo,10,1\n"
+            "905,Valido,99999999.99,1\n"
+        )
+
+        response = self.client.post("/api/productos/importar/", {
+            "archivo": SimpleUploadedFile("catalogo.csv", csv_texto.encode("utf-8"), content_type="text/csv"),
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([(e["fila"], e["error"]) for e in response.data["errores"]], [
+            (2, "Precio inválido"), (3, "Precio inválido"), (4, "Precio inválido"), (5, "Precio inválido"),
+            (6, "codigo_barras demasiado largo"),
+        ])
+        self.assertEqual(response.data["creados"], 1)
+        self.assertEqual(Producto.objects.get(codigo_barras="905").precio, Decimal("99999999.99"))
+
+
+class TransferenciaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        self.destino = Sucursal.objects.create(nombre="Sucursal Destino")
+        p1 = self.productos[0]
+        Inventario.objects.create(id_producto=p1, id_sucursal=self.destino, cantidad=1)
+
+    def _stock(self, sucursal):
+        return dict(Inventario.objects.filter(id_sucursal=sucursal).values_list("id_producto", "cantidad"))
+
+    def test_transferencia_mueve_stock_y_crea_destinos_faltantes(self):
+        p1, p2, _ = self.productos
+
+        response = self.client.post("/api/transferencias/", {
+            "id_sucursal_destino": self.destino.pk,
+            "detalles": [{"id_producto": p1.pk, "cantidad": 2}, {"id_producto": p2.pk, "cantidad": 5}],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["id_sucursal_origen"], self.sucursal.pk)
+        self.assertEqual(len(response.data["detalles"]), 2)
+        self.assertEqual(self._stock(self.sucursal)[p1.pk], 3)
+        self.assertEqual(self._stock(self.sucursal)[p2.pk], 0)
+        self.assertEqual(self._stock(self.destino), {p1.pk: 3, p2.pk: 5})
+        self.assertEqual(
+            MovimientoInventario.objects.filter(id_transferencia=response.data["id_transferencia"]).count(), 4
+        )
+
+    def test_transferencia_sin_stock_no_modifica_nada(self):
+        p1, p2, _ = self.productos
+
+        response = self.client.post("/api/transferencias/", {
+            "id_sucursal_destino": self.destino.pk,
+            "detalles": [{"id_producto": p1.pk, "cantidad": 1}, {"id_producto": p2.pk, "cantidad": 50}],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["detalles"][0]["id_producto"], str(p2.pk))
+        self.assertEqual(self._stock(self.destino), {p1.pk: 1})
+        self.assertEqual(self._stock(self.sucursal)[p1.pk], 5)
+
+    def test_bloquea_origen_y_destino_en_una_consulta_ordenada(self):
+        p1, p2, _ = self.productos
+
+        with CaptureQueriesContext(connection) as consultas:
+            transferir_stock(self.sucursal.pk, self.destino.pk, {p2.pk: 1, p1.pk: 1})
+
+        bloqueo = next(q["sql"] for q in consultas.captured_queries if q["sql"].startswith("SELECT"))
+        # Columnas 2 y 1 del SELECT: id_sucursal, id_producto
+        self.assertTrue(bloqueo.endswith("ORDER BY 2 ASC, 1 ASC"), bloqueo)
+
+
+class IdempotenciaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+
+    def _checkout(self, clave, cantidad=2):
+        return self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk,
+            "items": [{"id_producto": self.productos[0].pk, "cantidad": cantidad}],
+        }, format="json", HTTP_IDEMPOTENCY_KEY=clave)
+
+    def test_reintento_devuelve_la_misma_venta_sin_descontar_de_nuevo(self):
+        primera = self._checkout("clave-1")
+        reintento = self._checkout("clave-1")
+
+        self.assertEqual(primera.status_code, 201, primera.data)
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual(reintento["Idempotent-Replayed"], "true")
+        self.assertEqual(reintento.json()["numero_boleta"], primera.data["numero_boleta"])
+        self.assertEqual(Venta.objects.count(), 1)
+        self.assertEqual(Inventario.objects.get(id_producto=self.productos[0]).cantidad, 3)
+
+        # Misma clave en otro endpoint: no se reutiliza
+        otra = self.client.post("/api/servicios_tecnicos/", {}, format="json", HTTP_IDEMPOTENCY_KEY="clave-1")
+        self.assertEqual(otra.status_code, 422)
+
+    def test_escritura_fallida_libera_la_clave(self):
+        self.assertEqual(self._checkout("clave-2", cantidad=99).status_code, 400)
+        self.assertFalse(ClaveIdempotencia.objects.exists())
+
+        self.assertEqual(self._checkout("clave-2").status_code, 201)
+
+    def test_purga_claves_vencidas_en_lotes(self):
+        vencida = timezone.now() - timedelta(minutes=1)
+        ClaveIdempotencia.objects.bulk_create([
+            ClaveIdempotencia(clave=f"v{i}", id_usuario=self.usuario, ruta="POST /api/ventas/",
+                              status_code=201, expira=vencida)
+            for i in range(5)
+        ])
+        self._checkout("vigente")
+
+        self.assertEqual(purgar_vencidas(tamano_lote=2), 5)
+        self.assertEqual(list(ClaveIdempotencia.objects.values_list("clave", flat=True)), ["vigente"])
+
+
+class BarcodeCatalogoTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        # El índice es global al proceso: descartar lo que haya quedado de otros tests
+        indice_catalogo.version = None
+        indice_catalogo.stock.clear()
+
+    def test_escaneo_devuelve_precio_y_stock_desde_el_indice(self):
+        p1 = self.productos[0]
+        response = self.client.get(f"/api/productos/barcode/{p1.codigo_barras}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["precio"], "10.00")
+        self.assertEqual(response.data["cantidad"], 5)
+
+        # Índice caliente: solo se consulta la versión
+        with self.assertNumQueries(1):
+            self.client.get(f"/api/productos/barcode/{p1.codigo_barras}/")
+
+        self.assertEqual(self.client.get("/api/productos/barcode/no-existe/").status_code, 404)
+
+    def test_cambios_de_stock_y_catalogo_invalidan_el_indice(self):
+        p1 = self.productos[0]
+        url = f"/api/productos/barcode/{p1.codigo_barras}/"
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            descontar_stock(self.sucursal.pk, {p1.pk: 2})
+        self.assertEqual(self.client.get(url).data["cantidad"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/productos/{p1.pk}/", {"precio": "12.50"}, format="json")
+        self.assertEqual(self.client.get(url).data["precio"], "12.50")
+
+        Inventario.objects.filter(id_producto=self.productos[1]).update(cantidad=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/productos/{self.productos[1].pk}/")
+        self.assertEqual(self.client.get(f"/api/productos/barcode/{self.productos[1].codigo_barras}/").status_code, 404)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ResumenVentasTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+
+    def _resumen(self):
+        return sorted(ResumenVentaDiario.objects.values_list("tipo_pago", "estado", "cantidad", "total", "costo"))
+
+    def test_resumen_incremental_coincide_con_reconstruccion(self):
+        p1, p2, p3 = self.productos
+        self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk, "tipo_pago": "QR",
+            "items": [{"id_producto": p1.pk, "cantidad": 2}, {"id_producto": p2.pk, "cantidad": 1}],
+        }, format="json")
+        anulada = self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk, "items": [{"id_producto": p3.pk, "cantidad": 1}],
+        }, format="json").data
+        self.client.patch(f"/api/ventas/{anulada['id_venta']}/anular/", {"motivo_anulacion": "error"}, format="json")
+
+        # Flujo clásico: cabecera y luego renglones sueltos
+        venta = self.client.post("/api/ventas/", {"id_cliente": self.cliente.pk, "total_venta": "10.00"}, format="json").data
+        self.client.post("/api/detalle_ventas/", {
+            "id_venta": venta["id_venta"], "id_producto": p1.pk, "cantidad": 1, "precio_venta": "10.00"
+        }, format="json")
+        self.client.patch(f"/api/ventas/{venta['id_venta']}/", {"total_venta": "15.00"}, format="json")
+
+        incremental = self._resumen()
+        self.assertIn(("QR", "Completada", 1, Decimal("40.00"), Decimal("24.00")), incremental)
+        self.assertIn(("Efectivo", "Anulada", 1, Decimal("30.00"), Decimal("18.00")), incremental)
+
+        reconstruir()
+        self.assertEqual(
+            [fila for fila in self._resumen() if fila[2]],
+            [fila for fila in incremental if fila[2]]
+        )
+
+    def test_dashboard_lee_kpis_del_resumen(self):
+        self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk, "items": [{"id_producto": self.productos[0].pk, "cantidad": 3}],
+        }, format="json")
+
+        response = self.client.get("/api/reportes/ventas/dashboard/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["kpis"]["total_monto"], Decimal("30.00"))
+        self.assertEqual(response.data["kpis"]["total_transacciones"], 1)
+        self.assertEqual(response.data["kpis"]["total_ganancia"], Decimal("12.00"))
+        self.assertEqual(response.data["grafico_dias"]["datasets"][0]["data"], [30.0])
+
+    def test_acumular_es_un_upsert_sin_update_previo(self):
+        dia = Huella(self.sucursal.pk, date(2026, 3, 10), "QR", "Completada", Decimal("10.00"), Decimal("4.00"))
+
+        with CaptureQueriesContext(connection) as consultas:
+            aplicar(despues=dia)  # Crea la fila
+            aplicar(despues=dia)  # Suma sobre ella
+        escrituras = [q["sql"] for q in consultas.captured_queries if "resumen_ventas_diario" in q["sql"]]
+
+        # Una sentencia INSERT ... ON CONFLICT por acumulación: ningún UPDATE sin filas
+        # (en InnoDB toma un bloqueo de hueco y dos primeras ventas del día se interbloqueaban)
+        self.assertEqual(len(escrituras), 2)
+        self.assertTrue(all(sql.startswith("INSERT") for sql in escrituras))
+        self.assertEqual(self._resumen(), [("QR", "Completada", 2, Decimal("20.00"), Decimal("8.00"))])
+
+    def test_migracion_llena_el_resumen_historico(self):
+        self.client.post("/api/ventas/checkout/", {
+            "id_cliente": self.cliente.pk, "items": [{"id_producto": self.productos[0].pk, "cantidad": 3}],
+        }, format="json")
+        esperado = self._resumen()
+        ResumenVentaDiario.objects.all().delete()
+
+        estado = MigrationExecutor(connection).loader.project_state(("api", "0025_resumenventadiario"))
+        importlib.import_module("api.migrations.0025_resumenventadiario").llenar_resumen(estado.apps, None)
+
+        self.assertEqual(self._resumen(), esperado)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class DashboardVentasConsultasTests(_DatosBaseMixin, TestCase):
+    """Dashboard sobre un conjunto sembrado: consultas constantes y agrupación por hora local."""
+
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+        local = timezone.get_current_timezone()
+        # 23:30 hora de Bolivia = 03:30 UTC del día siguiente: debe caer en la hora 23 del día local
+        self.fecha = timezone.make_aware(datetime(2026, 3, 10, 23, 30), local)
+        ventas = []
+        for i in range(120):
+            venta = Venta.objects.create(
+                id_usuario=self.usuario, id_sucursal=self.sucursal, id_cliente=self.cliente,
+                total_venta=Decimal("20.00"), tipo_pago="QR" if i % 3 else "Efectivo",
+                estado="Anulada" if i % 10 == 0 else "Completada",
+            )
+            ventas.append(venta)
+        Venta.objects.update(fecha_venta=self.fecha)
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(id_venta=venta, id_producto=self.productos[i % 3], cantidad=2,
+                         precio_venta=Decimal("10.00"), costo_unitario=Decimal("4.00"))
+            for i, venta in enumerate(ventas)
+        ])
+        reconstruir()
+
+    def test_dashboard_consultas_constantes_y_hora_local(self):
+        url = "/api/reportes/ventas/dashboard/?fecha_desde=2026-03-10&fecha_hasta=2026-03-10"
+        inicio = time.perf_counter()
+        # 4 del dashboard + 2 de la clave de caché (versión del rango y del catálogo)
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        duracion = time.perf_counter() - inicio
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(duracion, 1.0)
+        kpis = response.data["kpis"]
+        self.assertEqual(kpis["total_transacciones"], 108)
+        self.assertEqual(kpis["total_monto"], Decimal("2160.00"))
+        self.assertEqual(kpis["total_ganancia"], Decimal("2160.00") - 108 * Decimal("8.00"))
+        self.assertEqual(response.data["grafico_dias"]["labels"], ["10/03/2026"])
+        self.assertEqual(response.data["grafico_hora"]["data"][23], 108)
+        self.assertEqual(response.data["grafico_estados"], {"labels": ["Completada", "Anulada"], "data": [108, 12]})
+        self.assertEqual(sum(response.data["grafico_productos"]["data"]), 216)
+        self.assertEqual(response.data["grafico_vendedores"]["data"], [108])
+
+    def test_excel_por_lotes_recorre_todas_las_ventas_una_vez(self):
+        filas = list(filas_excel_ventas(Venta.objects.all(), tamano_lote=7))
+
+        self.assertEqual(len(filas), 121)
+        self.assertEqual(sorted(fila[2] for fila in filas[1:]), sorted(Venta.objects.values_list("numero_boleta", flat=True)))
+        anulada = next(fila for fila in filas[1:] if fila[7] == "Anulada")
+        self.assertEqual(anulada[9:], [0.0, 0.0, 0.0])
+
+        response = self.client.get("/api/reportes/ventas/excel/?fecha_desde=2026-03-10&fecha_hasta=2026-03-10")
+        self.assertEqual(response.status_code, 200)
+        libro = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+        self.assertEqual(sum(1 for _ in libro.active.iter_rows()), 121)
+
+    def test_pdf_por_partes_con_encabezado_y_totales_sql(self):
+        partes = list(tablas_por_partes(
+            ["#"], ([i] for i in range(80)), None, ESTILO_TABLA_VENTAS, pie=lambda: ["TOTAL"],
+            alto_fila=ALTO_UTIL / 31, alto_encabezado=ALTO_UTIL / 31,
+        ))
+        tablas = [parte for parte in partes if isinstance(parte, Table)]
+        # 31 filas por página: encabezado + 29 de datos + 1 de margen
+        self.assertEqual([len(tabla._cellvalues) for tabla in tablas], [30, 30, 24])
+        self.assertEqual(len(partes), 5)  # con salto de página entre partes
+        self.assertTrue(all(tabla.repeatRows == 1 for tabla in tablas))
+        self.assertEqual(tablas[-1]._cellvalues[-1], ["TOTAL"])
+
+        response = self.client.get("/api/reportes/ventas/pdf/?fecha_desde=2026-03-10&fecha_hasta=2026-03-10")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"%PDF"))
+        # Contenido de cada página (ASCII85 + Flate)
+        paginas = [
+            zlib.decompress(base64.a85decode(flujo.strip()[:-2]))
+            for flujo in re.findall(rb"stream\n(.*?)endstream", response.content, re.S)
+        ]
+        con_tabla = [pagina for pagina in paginas if b"(P. Compra)" in pagina]
+        self.assertGreaterEqual(len(con_tabla), 4)  # 121 filas: al menos 4 páginas de ~33
+        # Una parte por página: el encabezado aparece exactamente una vez en cada una
+        self.assertTrue(all(pagina.count(b"(P. Compra)") == 1 for pagina in con_tabla))
+        texto = b"".join(paginas)
+        self.assertIn(b"(2160.00)", texto)
+        self.assertIn(b"(1296.00 Bs)", texto)
+
+
+class TrabajoReporteTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(REPORTES_DIR=directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        hoy = timezone.localdate().isoformat()
+        self.pedido = {"tipo": "ventas_excel", "fecha_desde": hoy, "fecha_hasta": hoy}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/ventas/checkout/", {
+                "id_cliente": self.cliente.pk, "items": [{"id_producto": self.productos[0].pk, "cantidad": 2}],
+            }, format="json")
+
+    def _procesar(self):
+        call_command("procesar_reportes", procesos=0, una_vez=True, stdout=io.StringIO())
+
+    def test_trabajo_se_genera_y_reutiliza_cache_hasta_que_cambian_los_datos(self):
+        response = self.client.post("/api/reportes/jobs/", self.pedido, format="json")
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response.data["estado"], "Pendiente")
+        id_trabajo = response.data["id_trabajo"]
+
+        self._procesar()
+
+        trabajo = self.client.get(f"/api/reportes/jobs/{id_trabajo}/").data
+        self.assertEqual(trabajo["estado"], "Completado")
+        self.assertFalse(trabajo["desde_cache"])
+        descarga = self.client.get(f"/api/reportes/jobs/{id_trabajo}/descargar/")
+        self.assertEqual(descarga.status_code, 200)
+        libro = openpyxl.load_workbook(io.BytesIO(b"".join(descarga.streaming_content)), read_only=True)
+        self.assertEqual(sum(1 for _ in libro.active.iter_rows()), 2)
+
+        # Mismo pedido sin cambios en el rango: resuelto al encolar
+        repetido = self.client.post("/api/reportes/jobs/", self.pedido, format="json")
+        self.assertEqual(repetido.status_code, 201)
+        self.assertTrue(repetido.data["desde_cache"])
+
+        # Una venta nueva en el rango cambia la versión: hay que regenerar
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/ventas/checkout/", {
+                "id_cliente": self.cliente.pk, "items": [{"id_producto": self.productos[1].pk, "cantidad": 1}],
+            }, format="json")
+        nuevo = self.client.post("/api/reportes/jobs/", self.pedido, format="json")
+        self.assertEqual(nuevo.data["estado"], "Pendiente")
+
+    def test_trabajo_forzado_a_la_sucursal_y_privado_del_usuario(self):
+        otra = Sucursal.objects.create(nombre="Otra")
+        response = self.client.post("/api/reportes/jobs/", {**self.pedido, "id_sucursal": otra.pk}, format="json")
+        self.assertEqual(response.data["id_sucursal"], self.sucursal.pk)
+
+        otro = Usuario.objects.create_user(
+            correo_electronico="otro@test.com", nombre_apellido="Otro", id_rol=self.rol_cajero,
+            id_sucursal=self.sucursal, password="test1234",
+        )
+        cliente = APIClient()
+        cliente.force_authenticate(otro)
+        self.assertEqual(cliente.get(f"/api/reportes/jobs/{response.data['id_trabajo']}/").status_code, 404)
+        self.assertEqual(
+            self.client.get(f"/api/reportes/jobs/{response.data['id_trabajo']}/descargar/").status_code, 409
+        )
+
+    def test_solo_se_reencolan_trabajos_con_latido_vencido(self):
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        comun = {"tipo": "ventas_excel", "fecha_desde": date.today(), "fecha_hasta": date.today(),
+                 "id_usuario": self.usuario, "estado": "En Proceso", "fecha_inicio": hace_una_hora}
+        # Reporte largo: empezó hace una hora pero su worker sigue latiendo
+        vivo = TrabajoReporte.objects.create(**comun, latido=timezone.now())
+        muerto = TrabajoReporte.objects.create(**comun, latido=hace_una_hora)
+
+        self.assertEqual(reencolar_colgados(), 1)
+
+        self.assertEqual(TrabajoReporte.objects.get(pk=vivo.pk).estado, "En Proceso")
+        self.assertEqual(TrabajoReporte.objects.get(pk=muerto.pk).estado, "Pendiente")
+
+    @override_settings(REPORTES_LATIDO_SEGUNDOS=0.01)
+    def test_latido_se_renueva_mientras_genera(self):
+        # El hilo del latido usa su propia conexión: en las pruebas no ve la transacción
+        # del TestCase, así que se verifica que renueve sin tocar la base
+        with mock.patch("api.trabajos.TrabajoReporte") as modelo, mock.patch("api.trabajos.connection"):
+            with latido(7):
+                time.sleep(0.1)
+            renovaciones = modelo.objects.filter.call_count
+
+        self.assertGreater(renovaciones, 1)
+        modelo.objects.filter.assert_called_with(pk=7, estado="En Proceso")
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class DashboardCacheTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+
+    def _checkout(self, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/ventas/checkout/", {
+                "id_cliente": self.cliente.pk, "items": [{"id_producto": self.productos[0].pk, "cantidad": cantidad}],
+            }, format="json").data
+
+    def test_dashboard_ventas_cacheado_hasta_que_se_escribe_en_el_rango(self):
+        self._checkout(1)
+        primera = self.client.get("/api/reportes/ventas/dashboard/")
+        self.assertFalse(primera.data["cache"]["hit"])
+        self.assertEqual(primera["X-Cache"], "MISS")
+
+        with self.assertNumQueries(2):  # solo las versiones
+            segunda = self.client.get("/api/reportes/ventas/dashboard/")
+        self.assertTrue(segunda.data["cache"]["hit"])
+        self.assertEqual(segunda.data["kpis"], primera.data["kpis"])
+
+        venta = self._checkout(2)
+        tercera = self.client.get("/api/reportes/ventas/dashboard/")
+        self.assertFalse(tercera.data["cache"]["hit"])
+        self.assertEqual(tercera.data["kpis"]["total_transacciones"], 2)
+
+        # Una anulación también invalida
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/ventas/{venta['id_venta']}/anular/", {"motivo_anulacion": "error"}, format="json")
+        cuarta = self.client.get("/api/reportes/ventas/dashboard/")
+        self.assertFalse(cuarta.data["cache"]["hit"])
+        self.assertEqual(cuarta.data["kpis"]["total_transacciones"], 1)
+
+    def test_dashboard_servicios_por_sucursal_e_invalidado_al_crear_servicio(self):
+        url = "/api/reportes/servicios/dashboard/"
+        self.assertFalse(self.client.get(url).data["cache"]["hit"])
+        self.assertTrue(self.client.get(url).data["cache"]["hit"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/servicios_tecnicos/", {
+                "id_cliente": self.cliente.pk, "marca_dispositivo": "Samsung", "modelo_dispositivo": "A10",
+                "descripcion_problema": "Pantalla", "costo_estimado": "100.00",
+            }, format="json")
+        response = self.client.get(url)
+        self.assertFalse(response.data["cache"]["hit"])
+        self.assertEqual(response.data["kpis"]["transacciones_en_reparacion"], 1)
+
+        # Otra sucursal: otra clave
+        otra = Sucursal.objects.create(nombre="Otra")
+        admin = Usuario.objects.create_user(
+            correo_electronico="super@test.com", nombre_apellido="Super", id_rol=self.rol_super,
+            id_sucursal=self.sucursal, password="test1234",
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.get(f"{url}?id_sucursal={otra.pk}")
+        self.assertFalse(response.data["cache"]["hit"])
+        self.assertEqual(response.data["kpis"]["transacciones_en_reparacion"], 0)
+
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class DashboardResumenTests(_DatosBaseMixin, TestCase):
+    url = "/api/dashboard/resumen/"
+
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+
+    def test_resumen_en_consultas_fijas_y_cacheado(self):
+        for cantidad, tipo_pago in ((1, "Efectivo"), (2, "QR")):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post("/api/ventas/checkout/", {
+                    "id_cliente": self.cliente.pk, "tipo_pago": tipo_pago,
+                    "items": [{"id_producto": self.productos[0].pk, "cantidad": cantidad}],
+                }, format="json")
+
+        with self.assertNumQueries(9):  # 2 de versiones + 7 de ConsultaInicio
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["conteos"]["productos"], 3)
+        self.assertEqual(response.data["conteos"]["clientes"], 1)
+        self.assertEqual(response.data["ventas"]["hoy"], {"cantidad": 2, "total": Decimal("30.00")})
+        dias = response.data["ventas"]["dias"]
+        self.assertEqual(len(dias["fechas"]), 7)
+        self.assertEqual(dias["fechas"][-1], timezone.localdate().isoformat())
+        self.assertEqual((dias["efectivo"][-1], dias["qr"][-1]), (Decimal("10.00"), Decimal("20.00")))
+        self.assertEqual(len(response.data["ventas"]["meses"]["fechas"]), 12)
+        self.assertEqual(len(response.data["ultimas_ventas"]), 2)
+
+        with self.assertNumQueries(2):
+            self.assertTrue(self.client.get(self.url).data["cache"]["hit"])
+
+        # Un cliente nuevo cambia los conteos: otra clave
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/clientes/", {"nombre_apellido": "Cliente Nuevo"}, format="json")
+        response = self.client.get(self.url)
+        self.assertFalse(response.data["cache"]["hit"])
+        self.assertEqual(response.data["conteos"]["clientes"], 2)
+
+    def test_servicios_por_estado_sin_anulados(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                self.client.post("/api/servicios_tecnicos/", {
+                    "id_cliente": self.cliente.pk, "descripcion_problema": "Pantalla", "costo_estimado": "100.00",
+                }, format="json")
+        ServicioTecnico.objects.filter(pk=ServicioTecnico.objects.order_by("pk").first().pk).update(estado="Anulado")
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["servicios"]["hoy"], {"recibidos": 1})
+        self.assertEqual(response.data["servicios"]["dias"]["en_reparacion"][-1], 1)
+        self.assertEqual(response.data["conteos"]["servicios"], 2)
+        self.assertEqual(response.data["conteos"]["servicios_en_reparacion"], 1)
+
+    def test_cambio_de_estado_de_servicio_antiguo_invalida_los_conteos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            servicio = self.client.post("/api/servicios_tecnicos/", {
+                "id_cliente": self.cliente.pk, "descripcion_problema": "Pantalla", "costo_estimado": "100.00",
+            }, format="json").data
+        # Recibido hace dos años: fuera de los 12 meses de versiones por día
+        ServicioTecnico.objects.filter(pk=servicio["id_servicio"]).update(
+            fecha_inicio=timezone.now() - timedelta(days=730)
+        )
+        self.assertEqual(self.client.get(self.url).data["conteos"]["servicios_en_reparacion"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/servicios_tecnicos/{servicio['id_servicio']}/", {"estado": "Para Retirar"},
+                              format="json")
+
+        response = self.client.get(self.url)
+        self.assertFalse(response.data["cache"]["hit"])
+        self.assertEqual(response.data["conteos"]["servicios_para_retirar"], 1)
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ServiciosAnaliticaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+        self.tecnico = Usuario.objects.create_user(
+            correo_electronico="tecnico@test.com", nombre_apellido="Técnico Uno", id_rol=Rol.objects.get(numero_rol=3),
+            id_sucursal=self.sucursal, password="test1234",
+        )
+        self.pantallas = Categoria.objects.create(nombre_categoria="Pantallas", tipo="servicio")
+        ahora = timezone.now()
+        # Entregados con demoras de 1..10 horas (técnico asignado, categoría Pantallas)
+        for horas in range(1, 11):
+            self._servicio(ahora - timedelta(hours=horas + 1), "Entregado", entrega=ahora - timedelta(hours=1),
+                           tecnico=self.tecnico, categoria=self.pantallas, costo="50.00")
+        # Abiertos: 1 día, 5 días y 40 días de antigüedad
+        self._servicio(ahora - timedelta(days=1), "En Reparación", costo="80.00", adelanto="30.00")
+        self._servicio(ahora - timedelta(days=5), "Para Retirar", costo="100.00")
+        self._servicio(ahora - timedelta(days=40), "En Reparación", costo="20.00")
+        self._servicio(ahora - timedelta(days=2), "Anulado", costo="70.00")
+
+    def _servicio(self, inicio, estado, entrega=None, tecnico=None, categoria=None, costo="0", adelanto="0"):
+        servicio = ServicioTecnico.objects.create(
+            id_cliente=self.cliente, id_usuario=self.usuario, id_sucursal=self.sucursal, estado=estado,
+            id_tecnico_asignado=tecnico, id_categoria=categoria, costo_estimado=Decimal(costo),
+            adelanto=Decimal(adelanto), saldo=Decimal(costo) - Decimal(adelanto), fecha_entrega=entrega,
+        )
+        ServicioTecnico.objects.filter(pk=servicio.pk).update(fecha_inicio=inicio)
+
+    def test_kpis_en_una_consulta(self):
+        consulta = ConsultaServicios(sucursal_id=self.sucursal.pk)
+        with self.assertNumQueries(1):
+            kpis = consulta.kpis()
+        self.assertEqual(kpis["transacciones_entregado"], 10)
+        self.assertEqual(kpis["monto_entregado"], Decimal("500.00"))
+        self.assertEqual(kpis["transacciones_en_reparacion"], 2)
+        self.assertEqual(kpis["transacciones_anulado"], 1)
+        self.assertEqual(kpis["saldo_pendiente"], Decimal("170.00"))  # 50 + 100 + 20
+        self.assertEqual(kpis["demora_promedio_horas"], 5.5)
+
+    def test_analitica_demoras_y_antiguedad(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                f"/api/reportes/servicios/analitica/?fecha_desde={(timezone.localdate() - timedelta(days=60)).isoformat()}"
+            )
+        self.assertEqual(response.status_code, 200)
+        tecnico = response.data["demoras"]["por_tecnico"][0]
+        self.assertEqual(
+            (tecnico["nombre"], tecnico["cantidad"], tecnico["p50_horas"], tecnico["p90_horas"], tecnico["max_horas"]),
+            ("Técnico Uno", 10, 5.0, 9.0, 10.0)
+        )
+        self.assertEqual(response.data["demoras"]["por_categoria"][0]["nombre"], "Pantallas")
+
+        antiguedad = response.data["antiguedad"]
+        self.assertEqual(antiguedad["labels"][0], "0-2 días")
+        self.assertEqual(antiguedad["en_reparacion"], [1, 0, 0, 0, 1])
+        self.assertEqual(antiguedad["para_retirar"], [0, 1, 0, 0, 0])
+        self.assertEqual(antiguedad["saldo"][1], Decimal("100.00"))
+
+
+class ConsultasConstantesTests(_DatosBaseMixin, TestCase):
+    """Listados y detalles con relaciones en el serializer: las consultas no crecen con las filas."""
+
+    def setUp(self):
+        self.crear_datos_base()
+        self.categoria_servicio = Categoria.objects.create(nombre_categoria="Pantallas", tipo="servicio")
+
+    def _poblar(self, cantidad):
+        for i in range(cantidad):
+            venta = Venta.objects.create(
+                id_cliente=self.cliente, id_usuario=self.usuario, id_sucursal=self.sucursal, total_venta=Decimal("10.00")
+            )
+            DetalleVenta.objects.create(
+                id_venta=venta, id_producto=self.productos[i % 3], cantidad=1, precio_venta=Decimal("10.00")
+            )
+            ServicioTecnico.objects.create(
+                id_cliente=self.cliente, id_usuario=self.usuario, id_sucursal=self.sucursal,
+                id_categoria=self.categoria_servicio, id_tecnico_asignado=self.usuario,
+            )
+            producto = Producto.objects.create(
+                nombre_producto=f"Extra {Producto.objects.count()}", id_categoria=self.productos[0].id_categoria,
+                precio=Decimal("5.00"),
+            )
+            Inventario.objects.create(id_producto=producto, id_sucursal=self.sucursal, cantidad=1)
+            Usuario.objects.create_user(
+                correo_electronico=f"extra{Usuario.objects.count()}@test.com", nombre_apellido="Extra",
+                id_rol=self.rol_cajero, id_sucursal=self.sucursal, password="test1234",
+            )
+
+    def _consultas(self, url):
+        self.client.get(url)  # Calienta user.id_rol (cacheado en el usuario autenticado)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas), response.data
+
+    def test_listados_con_consultas_constantes(self):
+        urls = ["/api/ventas/", "/api/detalle_ventas/", "/api/servicios_tecnicos/",
+                "/api/inventario/", "/api/productos/", "/api/usuarios/"]
+        self._poblar(1)
+        pocas = {url: self._consultas(url) for url in urls}
+        self._poblar(9)
+        for url in urls:
+            with self.subTest(url=url):
+                consultas, datos = self._consultas(url)
+                self.assertGreater(len(datos["results"]), len(pocas[url][1]["results"]))
+                self.assertEqual(consultas, pocas[url][0])
+                # COUNT + página (+ versiones para el ETag de productos)
+                self.assertEqual(consultas, 3 if url == "/api/productos/" else 2)
+
+    def test_detalles_en_una_consulta(self):
+        self._poblar(1)
+        urls = [
+            f"/api/ventas/{Venta.objects.get().pk}/",
+            f"/api/detalle_ventas/{DetalleVenta.objects.get().pk}/",
+            f"/api/servicios_tecnicos/{ServicioTecnico.objects.get().pk}/",
+            f"/api/inventario/{Inventario.objects.order_by('-pk').first().pk}/",
+            f"/api/productos/{self.productos[0].pk}/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                consultas, datos = self._consultas(url)
+                self.assertEqual(consultas, 2 if url.startswith("/api/productos/") else 1)
+
+        datos = self._consultas(urls[2])[1]
+        self.assertEqual(
+            (datos["nombre_cliente"], datos["nombre_categoria"], datos["nombre_tecnico_asignado"]),
+            ("Cliente Test", "Pantallas", "Cajero Test")
+        )
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class AutenticacionClaimsTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+        self.admin = APIClient()
+        self.admin.force_authenticate(Usuario.objects.create_user(
+            correo_electronico="super@test.com", nombre_apellido="Super", id_rol=self.rol_super,
+            id_sucursal=self.sucursal, password="test1234",
+        ))
+        # Emitidos un par de segundos antes: la revocación compara en segundos enteros
+        with mock.patch("rest_framework_simplejwt.tokens.aware_utcnow",
+                        return_value=timezone.now() - timedelta(seconds=2)):
+            tokens = APIClient().post(
+                "/api/token/", {"correo_electronico": "cajero@test.com", "password": "test1234"}, format="json"
+            ).data
+        self.refresh = tokens["refresh"]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def test_token_lleva_rol_y_sucursal_y_lecturas_sin_consultas_de_auth(self):
+        claims = AccessToken(self.client._credentials["HTTP_AUTHORIZATION"].split()[1])
+        self.assertEqual((claims["numero_rol"], claims["id_sucursal"], claims["activo"]), (4, self.sucursal.pk, True))
+
+        Venta.objects.create(id_usuario=self.usuario, id_sucursal=self.sucursal, total_venta=Decimal("10.00"))
+        self.client.get("/api/ventas/")  # Carga la lista de revocaciones en la caché
+        with self.assertNumQueries(2):  # COUNT + página: ni Usuario, ni Rol, ni Sucursal
+            response = self.client.get("/api/ventas/")
+        self.assertEqual(response.status_code, 200)
+
+        perfil = self.client.get("/api/perfil/")
+        self.assertEqual((perfil.data["numero_rol"], perfil.data["nombre_sucursal"]), (4, "Sucursal Test"))
+
+    def test_desactivar_revoca_tokens_y_refresh(self):
+        self.assertEqual(self.client.get("/api/ventas/").status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin.delete(f"/api/usuarios/{self.usuario.pk}/")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get("/api/ventas/").status_code, 401)
+        self.assertEqual(APIClient().post("/api/token/refresh/", {"refresh": self.refresh}, format="json").status_code, 401)
+
+    def test_cambio_de_rol_revoca_y_refresh_emite_claims_actuales(self):
+        response = APIClient().post("/api/token/refresh/", {"refresh": self.refresh}, format="json")
+        self.assertEqual(AccessToken(response.data["access"])["numero_rol"], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.patch(f"/api/usuarios/{self.usuario.pk}/", {"id_rol": self.rol_super.pk}, format="json")
+        self.assertEqual(self.client.get("/api/ventas/").status_code, 401)
+
+        # Un cambio de nombre no afecta la sesión
+        RevocacionToken.objects.all().delete()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.patch(f"/api/usuarios/{self.usuario.pk}/", {"nombre_apellido": "Otro Nombre"}, format="json")
+        self.assertEqual(self.client.get("/api/ventas/").status_code, 200)
+
+    def test_login_en_el_mismo_segundo_de_la_revocacion_es_valido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.patch(f"/api/usuarios/{self.usuario.pk}/", {"id_rol": self.rol_super.pk}, format="json")
+
+        tokens = APIClient().post(
+            "/api/token/", {"correo_electronico": "cajero@test.com", "password": "test1234"}, format="json"
+        ).data
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        self.assertEqual(self.client.get("/api/ventas/").status_code, 401)
+        self.assertEqual(cliente.get("/api/ventas/").status_code, 200)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class PaginacionCursorTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+        self.ventas = [
+            Venta.objects.create(id_usuario=self.usuario, id_sucursal=self.sucursal, total_venta=Decimal("10.00")).pk
+            for _ in range(25)
+        ]
+
+    def test_recorre_todas_las_ventas_sin_count_ni_offset(self):
+        self.client.get("/api/ventas/?cursor=")  # Calienta user.id_rol
+        vistos, url = [], "/api/ventas/?cursor="
+        while url:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(url)
+            self.assertEqual(len(consultas), 1)
+            sql = consultas[0]["sql"].upper()
+            self.assertNotIn("COUNT(", sql)
+            self.assertNotIn("OFFSET", sql)
+            self.assertNotIn("count", response.data)
+            vistos += [venta["id_venta"] for venta in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(vistos, sorted(self.ventas, reverse=True))
+
+        # previous vuelve a la página anterior
+        segunda = self.client.get(self.client.get("/api/ventas/?cursor=").data["next"])
+        primera = self.client.get(segunda.data["previous"])
+        self.assertEqual([v["id_venta"] for v in primera.data["results"]], vistos[:10])
+
+    def test_total_opcional_cacheado_y_page_sigue_igual(self):
+        response = self.client.get("/api/ventas/?cursor=&total=1")
+        self.assertEqual((response.data["count"], response.data["count_cacheado"]), (25, False))
+        response = self.client.get(self.client.get("/api/ventas/?cursor=").data["next"] + "&total=1")
+        self.assertEqual((response.data["count"], response.data["count_cacheado"]), (25, True))
+
+        # Sin ?cursor= la paginación por número no cambia
+        response = self.client.get("/api/ventas/?page=3")
+        self.assertEqual((response.data["count"], len(response.data["results"])), (25, 5))
+        # Las vistas sin orden_cursor ignoran el parámetro
+        self.assertIn("count", self.client.get("/api/productos/?cursor=").data)
+
+
+class BusquedaIndexadaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        busqueda.reconstruir()
+        self.jose = self.client.post(
+            "/api/clientes/", {"nombre_apellido": "José Pérez", "celular": "77123456"}, format="json"
+        ).data["id_cliente"]
+        self.pedro = self.client.post("/api/clientes/", {"nombre_apellido": "Pedro Perales"}, format="json").data[
+            "id_cliente"
+        ]
+
+    def ids(self, url, campo):
+        return [fila[campo] for fila in self.client.get(url).data["results"]]
+
+    def test_subcadenas_sin_tildes_todos_los_terminos_y_sin_like(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.ids("/api/clientes/?search=PEREZ", "id_cliente"), [self.jose])
+        self.assertFalse(any("LIKE" in c["sql"].upper() for c in consultas))
+
+        # Ordenado por relevancia: "Pedro Perales" contiene "per" dos veces
+        self.assertEqual(self.ids("/api/clientes/?search=per", "id_cliente"), [self.pedro, self.jose])
+        self.assertEqual(self.ids("/api/clientes/?search=ped per", "id_cliente"), [self.pedro])
+        self.assertEqual(self.ids("/api/clientes/?search=23456", "id_cliente"), [self.jose])
+
+        # Editar reindexa
+        self.client.patch(f"/api/clientes/{self.pedro}/", {"nombre_apellido": "Pedro Rojas"}, format="json")
+        self.assertEqual(self.ids("/api/clientes/?search=perales", "id_cliente"), [])
+        self.assertEqual(self.ids("/api/clientes/?search=rojas", "id_cliente"), [self.pedro])
+
+    def test_relacionados_prefijo_y_respaldo_search_filter(self):
+        venta = Venta.objects.create(
+            id_usuario=self.usuario, id_sucursal=self.sucursal, id_cliente_id=self.jose,
+            total_venta=Decimal("10.00"), numero_boleta="B-0042",
+        )
+        servicio = self.client.post("/api/servicios_tecnicos/", {
+            "id_cliente": self.pedro, "marca_dispositivo": "Samsung", "modelo_dispositivo": "A54",
+            "descripcion_problema": "Pantalla rota", "costo_estimado": "100.00",
+        }, format="json").data["id_servicio"]
+
+        self.assertEqual(self.ids("/api/ventas/?search=jose", "id_venta"), [venta.pk])
+        self.assertEqual(self.ids("/api/ventas/?search=B-00", "id_venta"), [venta.pk])
+        self.assertEqual(self.ids("/api/servicios_tecnicos/?search=pantalla", "id_servicio"), [servicio])
+        self.assertEqual(self.ids("/api/servicios_tecnicos/?search=perales", "id_servicio"), [servicio])
+        self.assertEqual(self.ids("/api/inventario/?search=producto 2", "id_inventario"), [
+            Inventario.objects.get(id_producto=self.productos[1]).pk
+        ])
+
+        # Términos más cortos que un trigrama: icontains de SearchFilter
+        self.assertEqual(self.ids("/api/servicios_tecnicos/?search=a5", "id_servicio"), [servicio])
+
+    def test_comando_reconstruye(self):
+        IndiceBusqueda.objects.all().delete()
+        call_command("reconstruir_indice_busqueda", "--tipo", "producto", stdout=io.StringIO())
+        self.assertEqual(IndiceBusqueda.objects.filter(tipo="producto").count(), 3)
+        self.assertEqual(self.ids("/api/productos/?search=77000", "id_producto"), [p.pk for p in self.productos])
+
+    def test_migracion_llena_el_indice_con_modelos_historicos(self):
+        IndiceBusqueda.objects.all().delete()
+        estado = MigrationExecutor(connection).loader.project_state(("api", "0028_indicebusqueda"))
+
+        importlib.import_module("api.migrations.0028_indicebusqueda").llenar_indice(estado.apps, None)
+
+        self.assertEqual(IndiceBusqueda.objects.filter(tipo="cliente").count(), Cliente.objects.count())
+        self.assertEqual(self.ids("/api/clientes/?search=perales", "id_cliente"), [self.pedro])
+
+    def test_consulta_mysql_frases_obligatorias(self):
+        conexion = mock.MagicMock(vendor="mysql")
+        cursor = conexion.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [(7, 1.5)]
+
+        with mock.patch.object(busqueda, "connection", conexion):
+            self.assertEqual(busqueda.buscar("cliente", ["María", "ro"], limite=50), [(7, 1.5)])
+
+        sql, parametros = cursor.execute.call_args.args
+        self.assertEqual(sql, busqueda.SQL_MYSQL)
+        self.assertEqual(parametros, ['+"maria" +"ro"', "cliente", '+"maria" +"ro"', 51])
+
+    @override_settings(BUSQUEDA_MAX_RESULTADOS=1)
+    def test_termino_amplio_no_recorta_el_listado(self):
+        otro = self.client.post("/api/clientes/", {"nombre_apellido": "Pedro Suárez"}, format="json").data
+        self.assertIsNone(busqueda.buscar("cliente", ["pedro"]))
+
+        response = self.client.get("/api/clientes/?search=pedro")
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual({fila["id_cliente"] for fila in response.data["results"]}, {self.pedro, otro["id_cliente"]})
+
+    def test_servicio_por_nombre_del_cliente_y_dispositivo(self):
+        servicio = self.client.post("/api/servicios_tecnicos/", {
+            "id_cliente": self.pedro, "marca_dispositivo": "Samsung", "descripcion_problema": "Pantalla",
+            "costo_estimado": "100.00",
+        }, format="json").data["id_servicio"]
+        self.assertEqual(self.ids("/api/servicios_tecnicos/?search=perales samsung", "id_servicio"), [servicio])
+
+        # Renombrar al cliente reindexa sus servicios
+        self.client.patch(f"/api/clientes/{self.pedro}/", {"nombre_apellido": "Pedro Rojas"}, format="json")
+        self.assertEqual(self.ids("/api/servicios_tecnicos/?search=rojas samsung", "id_servicio"), [servicio])
+        self.assertEqual(self.ids("/api/servicios_tecnicos/?search=perales samsung", "id_servicio"), [])
+
+
+class AutocompletadoTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        for indice in INDICES.values():
+            indice.version = None
+        self.jose = Cliente.objects.create(nombre_apellido="José Pérez", cedula_identidad="1234567", celular="70011122")
+        self.pedro = Cliente.objects.create(nombre_apellido="Pedro Perales")
+
+    def buscar(self, tipo, termino):
+        return self.client.get(f"/api/autocomplete/{tipo}/", {"search": termino}).json()
+
+    def test_prefijos_y_tuplas_con_una_consulta(self):
+        self.assertEqual(self.buscar("clientes", "PER"), [
+            [self.pedro.pk, "Pedro Perales", None, None],
+            [self.jose.pk, "José Pérez", "1234567", "70011122"],
+        ])
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual([c[0] for c in self.buscar("clientes", "jo pe")], [self.jose.pk])
+        self.assertEqual(len(consultas), 1)  # Solo el contador de versión
+        self.assertEqual([c[0] for c in self.buscar("clientes", "1234")], [self.jose.pk])
+        self.assertEqual(self.buscar("clientes", "osé"), [])  # Prefijos, no subcadenas
+
+        self.assertEqual(self.buscar("productos", "producto 2"), [
+            [self.productos[1].pk, "Producto 2", "770002", "20.00"]
+        ])
+        self.assertEqual(self.client.get("/api/autocomplete/ventas/").status_code, 404)
+
+    def test_cambios_incrementales_por_version(self):
+        self.buscar("clientes", "pe")
+        with mock.patch.object(INDICES["clientes"], "_reconstruir") as reconstruir_indice:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(f"/api/clientes/{self.pedro.pk}/", {"nombre_apellido": "Pedro Rojas"}, format="json")
+            self.assertEqual([c[1] for c in self.buscar("clientes", "pe")], ["Pedro Rojas", "José Pérez"])
+            self.assertEqual(self.buscar("clientes", "perales"), [])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f"/api/clientes/{self.jose.pk}/")
+            self.assertEqual([c[0] for c in self.buscar("clientes", "pe")], [self.pedro.pk])
+        reconstruir_indice.assert_not_called()
+
+
+class CamposYFormatoCompactoTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        for _ in range(10):
+            Venta.objects.create(
+                id_usuario=self.usuario, id_sucursal=self.sucursal, id_cliente=self.cliente, total_venta=Decimal("10.00")
+            )
+
+    def test_fields_y_omit_recortan_respuesta_y_columnas(self):
+        self.client.get("/api/ventas/")  # Calienta user.id_rol
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get("/api/ventas/?fields=id_venta,nombre_cliente,total_venta")
+        self.assertEqual(list(response.data["results"][0]), ["id_venta", "nombre_cliente", "total_venta"])
+        sql = consultas[-1]["sql"]
+        self.assertIn("nombre_apellido", sql)
+        self.assertNotIn("direccion", sql)  # Sin JOIN a sucursales
+        self.assertNotIn("motivo_anulacion", sql)
+
+        response = self.client.get("/api/ventas/?omit=direccion_sucursal,cel1_sucursal,cel2_sucursal")
+        campos = set(response.data["results"][0])
+        self.assertIn("nombre_sucursal", campos)
+        self.assertFalse(campos & {"direccion_sucursal", "cel1_sucursal", "cel2_sucursal"})
+
+        # Las escrituras no se recortan
+        response = self.client.post("/api/clientes/?fields=id_cliente", {"nombre_apellido": "Nuevo"}, format="json")
+        self.assertIn("nombre_apellido", response.data)
+
+    def test_formato_compacto(self):
+        completo = self.client.get("/api/ventas/")
+        response = self.client.get("/api/ventas/?format=compact&fields=id_venta,total_venta,estado")
+        datos = response.json()
+        self.assertEqual(datos["count"], 10)
+        self.assertEqual(datos["columnas"], ["id_venta", "total_venta", "estado"])
+        self.assertEqual(datos["filas"][0][1:], ["10.00", "Completada"])
+        self.assertNotIn("results", datos)
+        self.assertLess(len(response.content) * 5, len(completo.content))
+
+        # Un objeto suelto (o un error) sale como JSON normal
+        detalle = self.client.get(f"/api/ventas/{datos['filas'][0][0]}/?format=compact").json()
+        self.assertEqual(detalle["estado"], "Completada")
+
+
+class ETagReferenciaTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+
+    def test_304_sin_listado_y_nueva_version_al_escribir(self):
+        response = self.client.get("/api/categorias/")
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get("/api/categorias/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(consultas), 1)  # Solo las versiones
+        self.assertEqual(response["ETag"], etag)
+
+        # Otra URL (filtros, página) es otro ETag
+        self.assertNotEqual(self.client.get("/api/categorias/?tipo=producto")["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/categorias/", {"nombre_categoria": "Repuestos", "tipo": "producto"}, format="json")
+        response = self.client.get("/api/categorias/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_productos_dependen_de_categorias(self):
+        etag = self.client.get("/api/productos/")["ETag"]
+        categoria = self.productos[0].id_categoria
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/categorias/{categoria.pk}/", {"nombre_categoria": "Otro"}, format="json")
+        self.assertEqual(self.client.get("/api/productos/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_por_ambito_de_usuario(self):
+        etag = self.client.get("/api/sucursales/")["ETag"]
+        admin = Usuario.objects.create_user(
+            correo_electronico="super@test.com", nombre_apellido="Super", id_rol=self.rol_super,
+            id_sucursal=self.sucursal, password="test1234",
+        )
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get("/api/sucursales/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BatchTests(_DatosBaseMixin, TestCase):
+    def setUp(self):
+        self.crear_datos_base()
+        cache.clear()
+        tokens = APIClient().post(
+            "/api/token/", {"correo_electronico": "cajero@test.com", "password": "test1234"}, format="json"
+        ).data
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def batch(self, *rutas):
+        return self.client.post(
+            "/api/batch/", {"peticiones": [{"id": id_peticion, "ruta": ruta} for id_peticion, ruta in rutas]},
+            format="json",
+        )
+
+    def test_varias_lecturas_con_un_solo_token_validado(self):
+        with mock.patch(
+            "api.autenticacion.JWTClaimsAuthentication.get_validated_token",
+            autospec=True, side_effect=JWTClaimsAuthentication.get_validated_token,
+        ) as validar:
+            response = self.batch(
+                ("roles", "/roles/"), ("sucursales", "/sucursales/"), ("perfil", "/perfil/"),
+                ("inventario", "/inventario/?page=1&fields=id_inventario,cantidad"), ("nada", "/no-existe/"),
+            )
+        self.assertEqual(validar.call_count, 1)
+        respuestas = response.data["respuestas"]
+        self.assertEqual({k: v["status"] for k, v in respuestas.items()}, {
+            "roles": 200, "sucursales": 200, "perfil": 200, "inventario": 200, "nada": 404,
+        })
+        # Mismos filtros por sucursal y parámetros que una petición directa
+        self.assertEqual([s["id_sucursal"] for s in respuestas["sucursales"]["data"]["results"]], [self.sucursal.pk])
+        self.assertEqual(respuestas["perfil"]["data"]["correo_electronico"], "cajero@test.com")
+        self.assertEqual(respuestas["inventario"]["data"]["count"], 3)
+        self.assertEqual(list(respuestas["inventario"]["data"]["results"][0]), ["id_inventario", "cantidad"])
+
+    def test_validaciones(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch(("a", "/roles/"), ("a", "/sucursales/")).status_code, 400)
+        anidado = self.batch(("b", "/batch/")).data["respuestas"]["b"]
+        self.assertEqual(anidado["status"], 400)
+        with override_settings(BATCH_MAX_PETICIONES=1):
+            self.assertEqual(self.batch(("a", "/roles/"), ("b", "/sucursales/")).status_code, 400)
+        self.assertEqual(APIClient().post("/api/batch/", {"peticiones": []}, format="json").status_code, 401)
+
+    def test_descargas_se_rechazan_sin_ejecutar_la_vista(self):
+        with mock.patch("api.views_reports.ReporteVentasExcelView.get") as excel, \
+                mock.patch("api.views.ProductoViewSet.exportar") as exportar:
+            response = self.batch(("excel", "/reportes/ventas/excel/"), ("csv", "/productos/exportar/?formato=csv"))
+
+        self.assertEqual({k: v["status"] for k, v in response.data["respuestas"].items()}, {"excel": 400, "csv": 400})
+        excel.assert_not_called()
+        exportar.assert_not_called()
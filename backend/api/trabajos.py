@@ -0,0 +1,186 @@
+"""
+Cola de reportes en segundo plano (tabla trabajos_reporte).
+
+La API solo encola (encolar) y devuelve el id del trabajo; el cliente consulta
+/api/reportes/jobs/{id}/ hasta que esté Completado y descarga el archivo. Los
+archivos los genera el worker `python manage.py procesar_reportes`, fuera de los
+workers de Gunicorn.
+
+Caché en disco: el nombre del archivo incluye tipo, sucursal, rango y la versión
+de datos del rango (versiones.version_rango). Si nada se escribió en esos días el
+nombre coincide y el trabajo se resuelve al encolar, sin pasar por el worker; una
+venta o servicio nuevo en el rango cambia la versión y obliga a regenerar.
+
+Mientras genera, el worker renueva el latido del trabajo cada
+REPORTES_LATIDO_SEGUNDOS. Solo vuelven a la cola los trabajos En Proceso sin
+latido hace más de REPORTES_VENCIMIENTO_SEGUNDOS (su worker murió): un reporte
+largo con el worker vivo no se genera dos veces.
+"""
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import versiones
+from .models import TrabajoReporte
+from .reportes import GENERADORES
+
+logger = logging.getLogger(__name__)
+
+
+def nombre_archivo(tipo, sucursal_id, fecha_desde, fecha_hasta):
+    """Nombre del archivo en caché para la versión actual de los datos del rango"""
+    _, ambito, extension = GENERADORES[tipo]
+    version = versiones.version_rango(ambito, fecha_desde, fecha_hasta, sucursal_id)
+    return (
+        f'{tipo}_{sucursal_id or "todas"}_{fecha_desde:%Y%m%d}_{fecha_hasta:%Y%m%d}'
+        f'_v{version}.{extension}'
+    )
+
+
+def ruta_archivo(nombre):
+    return os.path.join(settings.REPORTES_DIR, nombre)
+
+
+def encolar(tipo, fecha_desde, fecha_hasta, sucursal_id, usuario):
+    """
+    Crea el trabajo. Si el archivo de esa versión ya existe queda Completado
+    (desde_cache) en el acto; si no, queda Pendiente para el worker.
+    """
+    datos = {
+        'tipo': tipo, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta,
+        'id_sucursal_id': sucursal_id, 'id_usuario': usuario,
+    }
+    nombre = nombre_archivo(tipo, sucursal_id, fecha_desde, fecha_hasta)
+    if os.path.exists(ruta_archivo(nombre)):
+        ahora = timezone.now()
+        return TrabajoReporte.objects.create(
+            **datos, estado='Completado', archivo=nombre, desde_cache=True,
+            fecha_inicio=ahora, fecha_fin=ahora
+        )
+    return TrabajoReporte.objects.create(**datos)
+
+
+def tomar_pendientes(limite):
+    """
+    Marca En Proceso hasta `limite` trabajos Pendientes y devuelve sus ids.
+    SKIP LOCKED: varios workers pueden tomar de la cola sin bloquearse ni repetir trabajos.
+    """
+    with transaction.atomic():
+        ids = list(
+            TrabajoReporte.objects.select_for_update(skip_locked=True)
+            .filter(estado='Pendiente').order_by('id_trabajo')
+            .values_list('id_trabajo', flat=True)[:limite]
+        )
+        if ids:
+            ahora = timezone.now()
+            TrabajoReporte.objects.filter(pk__in=ids).update(estado='En Proceso', fecha_inicio=ahora, latido=ahora)
+    return ids
+
+
+def reencolar_colgados(segundos=None):
+    """Devuelve a Pendiente los trabajos En Proceso cuyo latido venció (el worker murió a mitad de camino)"""
+    limite = timezone.now() - timedelta(seconds=segundos or settings.REPORTES_VENCIMIENTO_SEGUNDOS)
+    return TrabajoReporte.objects.filter(
+        Q(latido__lt=limite) | Q(latido__isnull=True, fecha_inicio__lt=limite), estado='En Proceso'
+    ).update(estado='Pendiente', fecha_inicio=None, latido=None)
+
+
+@contextmanager
+def latido(id_trabajo):
+    """Renueva el latido del trabajo en un hilo aparte mientras dura el bloque"""
+    detener = threading.Event()
+
+    def latir():
+        try:
+            while not detener.wait(settings.REPORTES_LATIDO_SEGUNDOS):
+                TrabajoReporte.objects.filter(pk=id_trabajo, estado='En Proceso').update(latido=timezone.now())
+        except Exception:
+            logger.exception('Error renovando el latido del trabajo %s', id_trabajo)
+        finally:
+            connection.close()  # La conexión propia de este hilo
+
+    hilo = threading.Thread(target=latir, daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def procesar_trabajo(id_trabajo):
+    """
+    Genera el archivo de un trabajo (o reutiliza el de la caché) y lo marca Completado.
+    Se escribe en un temporal de la misma carpeta y se renombra con os.replace: una
+    descarga concurrente nunca ve un archivo a medias. Ante un error queda en Error.
+    """
+    trabajo = TrabajoReporte.objects.get(pk=id_trabajo)
+    generar = GENERADORES[trabajo.tipo][0]
+    try:
+        # La versión se lee antes de generar: si entra una venta mientras tanto, el
+        # próximo pedido verá otra versión y regenerará.
+        nombre = nombre_archivo(trabajo.tipo, trabajo.id_sucursal_id, trabajo.fecha_desde, trabajo.fecha_hasta)
+        ruta = ruta_archivo(nombre)
+        desde_cache = os.path.exists(ruta)
+        if not desde_cache:
+            os.makedirs(settings.REPORTES_DIR, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=settings.REPORTES_DIR, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as destino, latido(id_trabajo):
+                    generar(
+                        timezone.make_aware(datetime.combine(trabajo.fecha_desde, time.min)),
+                        timezone.make_aware(datetime.combine(trabajo.fecha_hasta, time.max)),
+                        trabajo.id_sucursal_id,
+                        destino,
+                    )
+                # mkstemp crea el archivo 0600: el worker puede correr con otro usuario que Gunicorn
+                os.chmod(temporal, 0o644)
+                os.replace(temporal, ruta)
+            except BaseException:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                raise
+    except Exception as e:
+        logger.exception('Error generando el reporte %s', id_trabajo)
+        TrabajoReporte.objects.filter(pk=id_trabajo).update(
+            estado='Error', error=str(e), fecha_fin=timezone.now()
+        )
+        return False
+
+    TrabajoReporte.objects.filter(pk=id_trabajo).update(
+        estado='Completado', archivo=nombre, desde_cache=desde_cache, fecha_fin=timezone.now()
+    )
+    return True
+
+
+def procesar_en_hijo(id_trabajo):
+    """procesar_trabajo dentro de un proceso del pool: descarta conexiones vencidas (wait_timeout de MySQL)"""
+    close_old_connections()
+    return procesar_trabajo(id_trabajo)
+
+
+def limpiar(dias):
+    """
+    Borra los archivos de la caché sin usar hace más de `dias` días y los trabajos
+    terminados de la misma antigüedad. Devuelve (archivos, trabajos) eliminados.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    archivos = 0
+    if os.path.isdir(settings.REPORTES_DIR):
+        for entrada in os.scandir(settings.REPORTES_DIR):
+            # Cada descarga actualiza el mtime (ver descargar), así que cuenta como uso
+            if entrada.is_file() and entrada.stat().st_mtime < limite.timestamp():
+                os.remove(entrada.path)
+                archivos += 1
+    trabajos, _ = TrabajoReporte.objects.filter(
+        estado__in=['Completado', 'Error'], fecha_creacion__lt=limite
+    ).delete()
+    return archivos, trabajos
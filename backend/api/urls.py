@@ -4,13 +4,16 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import (
     RolViewSet, SucursalViewSet, CategoriaViewSet, 
     UsuarioViewSet, ClienteViewSet, ProductoViewSet, InventarioViewSet, 
-    VentaViewSet, DetalleVentaViewSet, ServicioTecnicoViewSet, UserProfileView
+    VentaViewSet, DetalleVentaViewSet, ServicioTecnicoViewSet, UserProfileView,
+    TransferenciaViewSet, AutocompletadoView, BatchView
 )
 from .views_reports import (
     ReporteVentasDashboardView, ReporteVentasPDFView, ReporteVentasExcelView,
-    ReporteServiciosDashboardView, ReporteServiciosPDFView, ReporteServiciosExcelView
+    ReporteServiciosDashboardView, ReporteServiciosPDFView, ReporteServiciosExcelView,
+    ReporteServiciosAnaliticaView, DashboardResumenView,
+    TrabajoReporteViewSet
 )
-from .serializers import CustomTokenObtainPairSerializer
+from .serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer
 
 router = DefaultRouter()
 router.register(r'roles', RolViewSet)
@@ -23,6 +26,8 @@ router.register(r'inventario', InventarioViewSet)
 router.register(r'ventas', VentaViewSet)
 router.register(r'detalle_ventas', DetalleVentaViewSet)
 router.register(r'servicios_tecnicos', ServicioTecnicoViewSet)
+router.register(r'transferencias', TransferenciaViewSet)
+router.register(r'reportes/jobs', TrabajoReporteViewSet, basename='reportes-jobs')
 
 
 # Custom Token View that blocks inactive users
@@ -30,11 +35,19 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+# Refresh que verifica estado y revocaciones en la base de datos
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
+
 urlpatterns = [
     path('', include(router.urls)),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('perfil/', UserProfileView.as_view(), name='user_profile'),
+    path('dashboard/resumen/', DashboardResumenView.as_view(), name='dashboard_resumen'),
+    path('autocomplete/<str:tipo>/', AutocompletadoView.as_view(), name='autocomplete'),
+    path('batch/', BatchView.as_view(), name='batch'),
     
     # Reportes Ventas
     path('reportes/ventas/dashboard/', ReporteVentasDashboardView.as_view(), name='reportes_ventas_dashboard'),
@@ -45,4 +58,5 @@ urlpatterns = [
     path('reportes/servicios/dashboard/', ReporteServiciosDashboardView.as_view(), name='reportes_servicios_dashboard'),
     path('reportes/servicios/pdf/', ReporteServiciosPDFView.as_view(), name='reportes_servicios_pdf'),
     path('reportes/servicios/excel/', ReporteServiciosExcelView.as_view(), name='reportes_servicios_excel'),
+    path('reportes/servicios/analitica/', ReporteServiciosAnaliticaView.as_view(), name='reportes_servicios_analitica'),
 ]
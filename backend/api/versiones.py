@@ -0,0 +1,97 @@
+"""
+Contadores de versión para invalidar cachés en memoria de cada worker.
+
+Cada worker de Gunicorn guarda sus propios índices (p. ej. el catálogo por código
+de barras) junto con la versión con la que los construyó. Quien modifica los datos
+incrementa la versión; el worker compara en cada petición con una consulta por
+clave primaria y reconstruye solo si cambió.
+
+Claves usadas:
+- 'productos': catálogo (alta, edición, baja, importación)
+- 'clientes': alta, edición, baja y reactivación de clientes
+- 'servicios': cualquier escritura de un servicio técnico (conteos de inicio, que no
+  tienen rango de fechas)
+- 'categorias', 'sucursales', 'roles': datos de referencia (ETag de sus listados, ver condicional.py)
+- 'inventario:<id_sucursal>': stock de una sucursal
+
+Además, VersionDia lleva una versión por (ámbito, sucursal, día local) para los
+datos de reportes ('ventas', 'servicios'): la suma de versiones de un rango
+cambia si y solo si se escribió algo en ese rango.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import ContadorVersion, VersionDia
+
+PRODUCTOS = 'productos'
+CLIENTES = 'clientes'
+SERVICIOS = 'servicios'
+CATEGORIAS = 'categorias'
+SUCURSALES = 'sucursales'
+ROLES = 'roles'
+
+
+def clave_inventario(sucursal_id):
+    return f'inventario:{sucursal_id}'
+
+
+def _incrementar(claves):
+    for clave in claves:
+        if ContadorVersion.objects.filter(clave=clave).update(version=F('version') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                ContadorVersion.objects.create(clave=clave, version=1)
+        except IntegrityError:
+            ContadorVersion.objects.filter(clave=clave).update(version=F('version') + 1)
+
+
+def incrementar(*claves):
+    """
+    Incrementa las versiones al confirmar la transacción en curso (inmediato en autocommit).
+    Se hace fuera de la transacción de la escritura para que ventas concurrentes de una
+    misma sucursal no se serialicen sobre la fila del contador.
+    """
+    claves = tuple(dict.fromkeys(claves))
+    transaction.on_commit(lambda: _incrementar(claves))
+
+
+def obtener(*claves):
+    """Versión actual de cada clave en una sola consulta (0 si nunca se incrementó)"""
+    versiones = dict(ContadorVersion.objects.filter(clave__in=claves).values_list('clave', 'version'))
+    return tuple(versiones.get(clave, 0) for clave in claves)
+
+
+def _incrementar_dias(dias):
+    for ambito, sucursal_id, fecha in dias:
+        filtro = {'ambito': ambito, 'id_sucursal_id': sucursal_id, 'fecha': fecha}
+        if VersionDia.objects.filter(**filtro).update(version=F('version') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                VersionDia.objects.create(**filtro, version=1)
+        except IntegrityError:
+            VersionDia.objects.filter(**filtro).update(version=F('version') + 1)
+
+
+def incrementar_dia(ambito, sucursal_id, fecha):
+    """Marca como modificado un día local de una sucursal (al confirmar la transacción)"""
+    dia = (ambito, sucursal_id, fecha)
+    transaction.on_commit(lambda: _incrementar_dias([dia]))
+
+
+def version_rango(ambito, desde, hasta, sucursal_id=None):
+    """Huella de los datos de [desde, hasta] (días locales): suma de versiones, una consulta"""
+    versiones = VersionDia.objects.filter(ambito=ambito, fecha__range=(desde, hasta))
+    if sucursal_id:
+        versiones = versiones.filter(id_sucursal_id=sucursal_id)
+    return versiones.aggregate(total=Sum('version'))['total'] or 0
+
+
+def version_rangos(ambitos, desde, hasta, sucursal_id=None):
+    """version_rango de varios ámbitos en una sola consulta: {ámbito: suma}"""
+    versiones = VersionDia.objects.filter(ambito__in=ambitos, fecha__range=(desde, hasta))
+    if sucursal_id:
+        versiones = versiones.filter(id_sucursal_id=sucursal_id)
+    totales = dict(versiones.values('ambito').annotate(total=Sum('version')).values_list('ambito', 'total').order_by())
+    return {ambito: totales.get(ambito) or 0 for ambito in ambitos}
@@ -5,29 +5,67 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from rest_framework import filters
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse, HttpRequest, QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
 from django.utils import timezone
+from datetime import datetime, time
+from urllib.parse import urlsplit
 from .models import (
     Rol, Sucursal, Categoria, Usuario, Cliente, Producto, 
-    Inventario, Venta, DetalleVenta, ServicioTecnico
+    Inventario, Venta, DetalleVenta, ServicioTecnico, MovimientoInventario,
+    Transferencia, DetalleTransferencia
 )
 from .serializers import (
     RolSerializer, SucursalSerializer, CategoriaSerializer, 
     UsuarioSerializer, ClienteSerializer, ProductoSerializer, 
     InventarioSerializer, VentaSerializer, DetalleVentaSerializer, 
-    ServicioTecnicoSerializer, UserProfileSerializer
+    ServicioTecnicoSerializer, UserProfileSerializer, CheckoutVentaSerializer,
+    MovimientoInventarioSerializer, TransferenciaSerializer
+)
+from .importacion import (
+    ArchivoInvalidoError, leer_filas, importar_inventario, importar_productos,
+    filas_catalogo, exportar_csv, exportar_xlsx
+)
+from . import busqueda, resumen_ventas, versiones
+from .autocompletado import INDICES
+from .catalogo import indice_catalogo
+from .condicional import ETagVersionMixin
+from .idempotencia import IdempotenciaMixin, idempotente
+from .seleccion import SeleccionAutomaticaMixin
+from .autenticacion import revocar
+from .stock import (
+    StockInsuficienteError, descontar_stock, restaurar_stock, fijar_stock, stock_a_fecha, transferir_stock
 )
 
-class RolViewSet(viewsets.ModelViewSet):
+class RolViewSet(ETagVersionMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     queryset = Rol.objects.all().order_by('pk')
     serializer_class = RolSerializer
+    versiones_etag = (versiones.ROLES,)  # ETag / 304 (ver api/condicional.py)
+
+    def perform_create(self, serializer):
+        serializer.save()
+        versiones.incrementar(versiones.ROLES)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        versiones.incrementar(versiones.ROLES)
 
-class SucursalViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        instance.delete()
+        versiones.incrementar(versiones.ROLES)
+
+class SucursalViewSet(ETagVersionMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🔒 AISLADO: Cada usuario solo ve su sucursal asignada
     Super Admin (1) ve todas las sucursales
     """
     queryset = Sucursal.objects.all().order_by('pk')
     serializer_class = SucursalSerializer
+    versiones_etag = (versiones.SUCURSALES,)  # ETag / 304 (ver api/condicional.py)
     
     def get_queryset(self):
         user = self.request.user
@@ -35,9 +73,21 @@ class SucursalViewSet(viewsets.ModelViewSet):
         if user.id_rol.numero_rol == 1:
             return Sucursal.objects.all().order_by('pk')
         # Otros solo ven su sucursal
-        return Sucursal.objects.filter(pk=user.id_sucursal.pk).order_by('pk')
+        return Sucursal.objects.filter(pk=user.id_sucursal_id).order_by('pk')
+
+    def perform_create(self, serializer):
+        serializer.save()
+        versiones.incrementar(versiones.SUCURSALES)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        versiones.incrementar(versiones.SUCURSALES)
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        instance.delete()
+        versiones.incrementar(versiones.SUCURSALES)
+
+class CategoriaViewSet(ETagVersionMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🌍 GLOBAL: Todas las sucursales comparten las mismas categorías
     """
@@ -46,6 +96,7 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     # Búsqueda por nombre y tipo
     filter_backends = [filters.SearchFilter]
     search_fields = ['nombre_categoria', 'tipo']
+    versiones_etag = (versiones.CATEGORIAS,)  # ETag / 304 (ver api/condicional.py)
     
     def get_queryset(self):
         """
@@ -66,6 +117,14 @@ class CategoriaViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(tipo=tipo)
         
         return queryset
+
+    def perform_create(self, serializer):
+        serializer.save()
+        versiones.incrementar(versiones.CATEGORIAS)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        versiones.incrementar(versiones.CATEGORIAS)
     
     def destroy(self, request, *args, **kwargs):
         """
@@ -76,6 +135,7 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         # Soft delete directo
         categoria.activo = False
         categoria.save()
+        versiones.incrementar(versiones.CATEGORIAS)
         
         return Response({'mensaje': 'Categoría desactivada correctamente'}, status=status.HTTP_200_OK)
     
@@ -94,10 +154,11 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         
         categoria.activo = True
         categoria.save()
+        versiones.incrementar(versiones.CATEGORIAS)
         
         return Response({'mensaje': 'Categoría reactivada correctamente'}, status=status.HTTP_200_OK)
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+class UsuarioViewSet(SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🔒 AISLADO: Cada usuario solo ve compañeros de su sucursal
     Super Admin (1) ve todos los usuarios
@@ -116,7 +177,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             queryset = Usuario.objects.all()
         else:
             # Otros solo ven usuarios de su sucursal
-            queryset = Usuario.objects.filter(id_sucursal=user.id_sucursal)
+            queryset = Usuario.objects.filter(id_sucursal_id=user.id_sucursal_id)
         
         # Filtrar activos por defecto
         if not incluir_inactivos:
@@ -124,6 +185,15 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('pk')
     
+    def perform_update(self, serializer):
+        """Un cambio de rol, sucursal, estado o contraseña invalida los tokens del usuario (sus claims)"""
+        anterior = serializer.instance
+        antes = (anterior.id_rol_id, anterior.id_sucursal_id, anterior.activo)
+        with transaction.atomic():
+            usuario = serializer.save()
+            if (usuario.id_rol_id, usuario.id_sucursal_id, usuario.activo) != antes or 'password' in serializer.validated_data:
+                revocar(usuario.pk, 'Cambio de Permisos' if usuario.activo else 'Desactivado')
+
     def destroy(self, request, *args, **kwargs):
         """
         Soft delete: desactiva el usuario en lugar de eliminarlo.
@@ -138,8 +208,11 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        usuario.activo = False
-        usuario.save()
+        with transaction.atomic():
+            usuario.activo = False
+            usuario.save()
+            # Los tokens ya emitidos dejan de valer en la próxima petición
+            revocar(usuario.pk, 'Desactivado')
         return Response({'message': 'Usuario desactivado correctamente'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['patch'])
@@ -167,16 +240,18 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         usuario.save()
         return Response({'message': 'Usuario reactivado correctamente'})
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🌍 GLOBAL: Todos los clientes son compartidos entre sucursales
     Implementa soft delete (borrado lógico)
     """
     queryset = Cliente.objects.all().order_by('pk')
     serializer_class = ClienteSerializer
-    # Búsqueda por nombre, CI, celular y email
-    filter_backends = [filters.SearchFilter]
+    orden_cursor = 'pk'  # ?cursor= (ver api/paginacion.py)
+    # Búsqueda por nombre, CI, celular y email (índice de texto completo, ver api/busqueda.py)
+    filter_backends = [busqueda.BusquedaIndexada]
     search_fields = ['nombre_apellido', 'cedula_identidad', 'celular', 'correo_electronico']
+    indice_busqueda = [('cliente', 'pk')]
     
     def get_queryset(self):
         """
@@ -191,6 +266,22 @@ class ClienteViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(activo=True)
         
         return queryset
+
+    def perform_create(self, serializer):
+        cliente = serializer.save()
+        busqueda.indexar('cliente', cliente)
+        versiones.incrementar(versiones.CLIENTES)
+
+    def perform_update(self, serializer):
+        nombre_anterior = serializer.instance.nombre_apellido
+        cliente = serializer.save()
+        busqueda.indexar('cliente', cliente)
+        if cliente.nombre_apellido != nombre_anterior:
+            # El nombre del cliente también forma parte del texto de sus servicios
+            busqueda.indexar('servicio', *busqueda.instancias_indexables(
+                ServicioTecnico, busqueda.TIPOS['servicio'][1]
+            ).filter(id_cliente=cliente))
+        versiones.incrementar(versiones.CLIENTES)
     
     def destroy(self, request, *args, **kwargs):
         """
@@ -199,6 +290,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
         cliente = self.get_object()
         cliente.activo = False
         cliente.save()
+        versiones.incrementar(versiones.CLIENTES)
         
         return Response(
             {'message': f'Cliente "{cliente.nombre_apellido}" marcado como inactivo'},
@@ -221,20 +313,24 @@ class ClienteViewSet(viewsets.ModelViewSet):
         
         cliente.activo = True
         cliente.save()
+        versiones.incrementar(versiones.CLIENTES)
         
         return Response(
             {'message': f'Cliente "{cliente.nombre_apellido}" reactivado correctamente'},
             status=status.HTTP_200_OK
         )
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(ETagVersionMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🌍 GLOBAL: El catálogo de productos es compartido
     """
     queryset = Producto.objects.all().order_by('pk')
     serializer_class = ProductoSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [busqueda.BusquedaIndexada]
     search_fields = ['nombre_producto', 'codigo_barras', 'descripcion']
+    indice_busqueda = [('producto', 'pk')]
+    # ETag / 304 (ver api/condicional.py); nombre_categoria depende de las categorías
+    versiones_etag = (versiones.PRODUCTOS, versiones.CATEGORIAS)
     
     def get_queryset(self):
         """
@@ -248,6 +344,16 @@ class ProductoViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(activo=True)
         
         return queryset
+
+    def perform_create(self, serializer):
+        producto = serializer.save()
+        busqueda.indexar('producto', producto)
+        versiones.incrementar(versiones.PRODUCTOS)
+
+    def perform_update(self, serializer):
+        producto = serializer.save()
+        busqueda.indexar('producto', producto)
+        versiones.incrementar(versiones.PRODUCTOS)
     
     def destroy(self, request, *args, **kwargs):
         """
@@ -281,7 +387,9 @@ class ProductoViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Eliminar registros de inventario físicamente (stock ya es 0)
+        sucursales = {inv.id_sucursal_id for inv in inventarios}
         inventarios.delete()
+        versiones.incrementar(*[versiones.clave_inventario(id_sucursal) for id_sucursal in sucursales])
         
         # Eliminar imagen física si existe
         if producto.foto_producto:
@@ -291,6 +399,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
         # Soft delete del producto
         producto.activo = False
         producto.save()
+        versiones.incrementar(versiones.PRODUCTOS)
         
         return Response({
             'mensaje': 'Producto eliminado correctamente'
@@ -312,20 +421,110 @@ class ProductoViewSet(viewsets.ModelViewSet):
         
         producto.activo = True
         producto.save()
+        versiones.incrementar(versiones.PRODUCTOS)
         
         return Response({
             'mensaje': 'Producto reactivado correctamente'
         }, status=status.HTTP_200_OK)
 
-class InventarioViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path=r'barcode/(?P<codigo>[^/]+)')
+    def barcode(self, request, codigo=None):
+        """
+        Búsqueda exacta por código de barras para el escáner del POS.
+        GET /api/productos/barcode/{codigo}/?id_sucursal=X (id_sucursal solo Super Admin)
+        Se resuelve desde el índice en memoria del worker y devuelve precio y stock
+        de la sucursal, sin recorrer la tabla de productos.
+        """
+        user = request.user
+        sucursal_id = user.id_sucursal_id
+        if user.id_rol.numero_rol == 1 and request.query_params.get('id_sucursal'):
+            try:
+                sucursal_id = int(request.query_params['id_sucursal'])
+            except ValueError:
+                return Response({'error': 'id_sucursal inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        producto, cantidad = indice_catalogo.buscar(codigo, sucursal_id)
+        if producto is None:
+            return Response(
+                {'error': f'No existe un producto activo con código "{codigo}"'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({
+            'id_producto': producto.id_producto,
+            'codigo_barras': producto.codigo_barras,
+            'nombre_producto': producto.nombre_producto,
+            'precio': producto.precio,
+            'foto_producto': (
+                request.build_absolute_uri(settings.MEDIA_URL + producto.foto_producto)
+                if producto.foto_producto else None
+            ),
+            'id_sucursal': sucursal_id,
+            'cantidad': cantidad,
+        })
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta el catálogo completo en streaming.
+        GET /api/productos/exportar/?formato=csv (por defecto) o ?formato=xlsx
+        Usa ?incluir_inactivos=true para incluir productos inactivos.
+        """
+        formato = request.query_params.get('formato', 'csv').lower()
+        filas = filas_catalogo(self.filter_queryset(self.get_queryset()))
+        fecha = timezone.localdate().strftime("%Y%m%d")
+
+        if formato == 'xlsx':
+            return FileResponse(
+                exportar_xlsx(filas, titulo='Productos'),
+                as_attachment=True,
+                filename=f'productos_{fecha}.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        if formato != 'csv':
+            return Response({'error': 'Formato no soportado, use csv o xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(exportar_csv(filas), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename=productos_{fecha}.csv'
+        return response
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importa/actualiza el catálogo desde XLSX/CSV (upsert por codigo_barras).
+        POST /api/productos/importar/ (multipart)
+        Campos: archivo, dry_run=true para validar sin guardar.
+        Columnas: codigo_barras, nombre_producto, precio y opcionales descripcion,
+        categoria (por nombre, se crea si no existe), precio_compra, activo.
+        Roles permitidos: 1 (Super Admin), 2 (Admin)
+        """
+        if request.user.id_rol.numero_rol not in [1, 2]:
+            return Response(
+                {'error': 'No tiene permisos para importar productos'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'Debe adjuntar un archivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', 'false')).lower() == 'true'
+        try:
+            resumen = importar_productos(leer_filas(archivo, archivo.name), dry_run=dry_run)
+        except ArchivoInvalidoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumen)
+
+class InventarioViewSet(SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🔒 AISLADO: Cada sucursal solo ve su propio inventario
     Super Admin (1) ve todo el inventario
     """
     queryset = Inventario.objects.all()  # Base queryset for DRF router
     serializer_class = InventarioSerializer
-    filter_backends = [filters.SearchFilter]
+    orden_cursor = 'pk'  # ?cursor= (ver api/paginacion.py)
+    filter_backends = [busqueda.BusquedaIndexada]
     search_fields = ['id_producto__nombre_producto', 'id_producto__codigo_barras']
+    indice_busqueda = [('producto', 'id_producto')]
     
     def get_queryset(self):
         user = self.request.user
@@ -333,27 +532,180 @@ class InventarioViewSet(viewsets.ModelViewSet):
         if user.id_rol.numero_rol == 1:
             return Inventario.objects.all().order_by('pk')
         # Otros solo ven inventario de su sucursal
-        return Inventario.objects.filter(id_sucursal=user.id_sucursal).order_by('pk')
+        return Inventario.objects.filter(id_sucursal_id=user.id_sucursal_id).order_by('pk')
     
     def perform_create(self, serializer):
         """Auto-asignar sucursal si no es Super Admin"""
         user = self.request.user
+        cantidad = serializer.validated_data.pop('cantidad', 0)
+        with transaction.atomic():
+            if user.id_rol.numero_rol == 1:
+                # Super Admin puede especificar sucursal o usar la suya
+                inventario = serializer.save(cantidad=0)
+            else:
+                # Otros: forzar su sucursal
+                inventario = serializer.save(id_sucursal=user.id_sucursal, cantidad=0)
+            # El stock inicial se registra como ajuste del servicio de stock
+            fijar_stock(inventario.pk, cantidad, usuario=user)
+            inventario.cantidad = cantidad
+    
+    def perform_update(self, serializer):
+        """El ajuste manual de cantidad pasa por el servicio de stock (fila bloqueada)"""
+        cantidad = serializer.validated_data.pop('cantidad', None)
+        with transaction.atomic():
+            if cantidad is not None:
+                fijar_stock(serializer.instance.pk, cantidad, usuario=self.request.user)
+                serializer.instance.cantidad = cantidad
+            else:
+                # Releer bajo bloqueo para no pisar ventas concurrentes al guardar
+                serializer.instance.cantidad = Inventario.objects.select_for_update().values_list(
+                    'cantidad', flat=True
+                ).get(pk=serializer.instance.pk)
+            sucursal_anterior = serializer.instance.id_sucursal_id
+            inventario = serializer.save()
+            versiones.incrementar(
+                versiones.clave_inventario(sucursal_anterior), versiones.clave_inventario(inventario.id_sucursal_id)
+            )
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        versiones.incrementar(versiones.clave_inventario(instance.id_sucursal_id))
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Carga masiva de un conteo físico desde XLSX/CSV (columnas codigo_barras, cantidad).
+        POST /api/inventario/importar/ (multipart)
+        Campos: archivo, id_sucursal (solo Super Admin), dry_run=true para ver el diff sin guardar.
+        """
+        user = request.user
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'Debe adjuntar un archivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        sucursal_id = user.id_sucursal_id
+        if user.id_rol.numero_rol == 1 and request.data.get('id_sucursal'):
+            sucursal_id = request.data.get('id_sucursal')
+            if not Sucursal.objects.filter(pk=sucursal_id).exists():
+                return Response({'error': 'Sucursal no encontrada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', 'false')).lower() == 'true'
+        try:
+            resumen = importar_inventario(
+                leer_filas(archivo, archivo.name), sucursal_id, usuario=user, dry_run=dry_run
+            )
+        except ArchivoInvalidoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumen)
+
+    @action(detail=True, methods=['get'])
+    def movimientos(self, request, pk=None):
+        """
+        Kardex paginado de un registro de inventario (más reciente primero).
+        GET /api/inventario/{id}/movimientos/?fecha=YYYY-MM-DD
+        Con ?fecha= solo lista movimientos hasta el fin de ese día y devuelve
+        el stock que había en ese momento (stock_a_fecha).
+        """
+        inventario = self.get_object()
+        queryset = MovimientoInventario.objects.filter(
+            id_producto_id=inventario.id_producto_id,
+            id_sucursal_id=inventario.id_sucursal_id
+        ).select_related('id_venta', 'id_usuario').order_by('-fecha', '-pk')
+
+        fecha = request.query_params.get('fecha')
+        if fecha:
+            try:
+                fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {'error': 'Formato de fecha inválido, use YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            fecha_corte = timezone.make_aware(datetime.combine(fecha, time.max))
+            queryset = queryset.filter(fecha__lte=fecha_corte)
+            stock = stock_a_fecha(inventario, fecha_corte)
+        else:
+            stock = inventario.cantidad
+
+        page = self.paginate_queryset(queryset)
+        response = self.get_paginated_response(MovimientoInventarioSerializer(page, many=True).data)
+        response.data['stock_a_fecha'] = stock
+        return response
+
+class TransferenciaViewSet(viewsets.ModelViewSet):
+    """
+    🔒 AISLADO: Cada sucursal ve las transferencias que salen o llegan a ella
+    Super Admin (1) ve todas. Las transferencias no se editan ni eliminan.
+    """
+    queryset = Transferencia.objects.all()  # Base queryset for DRF router
+    serializer_class = TransferenciaSerializer
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Transferencia.objects.select_related(
+            'id_sucursal_origen', 'id_sucursal_destino', 'id_usuario'
+        ).prefetch_related('detalles__id_producto').order_by('-pk')
+        # Super Admin ve todo
         if user.id_rol.numero_rol == 1:
-            # Super Admin puede especificar sucursal o usar la suya
-            serializer.save()
+            return queryset
+        return queryset.filter(
+            Q(id_sucursal_origen_id=user.id_sucursal_id) | Q(id_sucursal_destino_id=user.id_sucursal_id)
+        )
+
+    def perform_create(self, serializer):
+        """
+        Crea la transferencia y mueve el stock en una sola transacción.
+        Solo el Super Admin elige la sucursal origen; el resto transfiere desde la suya.
+        """
+        user = self.request.user
+        data = serializer.validated_data
+        if user.id_rol.numero_rol == 1 and data.get('id_sucursal_origen'):
+            origen = data['id_sucursal_origen']
         else:
-            # Otros: forzar su sucursal
-            serializer.save(id_sucursal=user.id_sucursal)
+            origen = user.id_sucursal
+        destino = data['id_sucursal_destino']
+        if origen.pk == destino.pk:
+            raise serializers.ValidationError({'id_sucursal_destino': 'La sucursal destino debe ser distinta del origen.'})
 
-class VentaViewSet(viewsets.ModelViewSet):
+        cantidades = {}
+        for detalle in data['detalles']:
+            cantidades[detalle['id_producto_id']] = cantidades.get(detalle['id_producto_id'], 0) + detalle['cantidad']
+
+        with transaction.atomic():
+            transferencia = Transferencia.objects.create(
+                id_sucursal_origen=origen,
+                id_sucursal_destino=destino,
+                id_usuario=user,
+                observacion=data.get('observacion')
+            )
+            try:
+                transferir_stock(origen.pk, destino.pk, cantidades, transferencia=transferencia, usuario=user)
+            except StockInsuficienteError as e:
+                raise serializers.ValidationError({'detalles': [
+                    {'id_producto': f['id_producto'],
+                     'error': 'El producto no existe en el inventario de origen.' if f['disponible'] is None
+                     else f'Stock insuficiente. Disponible: {f["disponible"]}, Solicitado: {f["solicitado"]}'}
+                    for f in e.fallidos
+                ]})
+            DetalleTransferencia.objects.bulk_create([
+                DetalleTransferencia(id_transferencia=transferencia, id_producto_id=id_producto, cantidad=cantidad)
+                for id_producto, cantidad in cantidades.items()
+            ])
+        serializer.instance = self.get_queryset().get(pk=transferencia.pk)
+
+class VentaViewSet(IdempotenciaMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🔒 AISLADO: Cada sucursal solo ve sus propias ventas
     Super Admin (1) ve todas las ventas
     """
     queryset = Venta.objects.all()  # Base queryset for DRF router
     serializer_class = VentaSerializer
-    filter_backends = [filters.SearchFilter]
+    orden_cursor = '-pk'  # ?cursor= (ver api/paginacion.py)
+    filter_backends = [busqueda.BusquedaIndexada]
     search_fields = ['numero_boleta', 'id_cliente__nombre_apellido', 'id_cliente__cedula_identidad']
+    indice_busqueda = [('cliente', 'id_cliente')]
+    busqueda_prefijo = ['numero_boleta']
     
     def get_queryset(self):
         user = self.request.user
@@ -361,18 +713,126 @@ class VentaViewSet(viewsets.ModelViewSet):
         if user.id_rol.numero_rol == 1:
             return Venta.objects.all().order_by('-pk')
         # Otros solo ven ventas de su sucursal
-        return Venta.objects.filter(id_sucursal=user.id_sucursal).order_by('-pk')
+        return Venta.objects.filter(id_sucursal_id=user.id_sucursal_id).order_by('-pk')
     
     def perform_create(self, serializer):
         """Auto-asignar sucursal y usuario del request"""
         user = self.request.user
-        if user.id_rol.numero_rol == 1:
-            # Super Admin puede especificar sucursal, pero siempre se asigna el usuario
-            serializer.save(id_usuario=user)
-        else:
-            # Otros: forzar su sucursal y usuario
-            serializer.save(id_sucursal=user.id_sucursal, id_usuario=user)
+        with transaction.atomic():
+            if user.id_rol.numero_rol == 1:
+                # Super Admin puede especificar sucursal, pero siempre se asigna el usuario
+                venta = serializer.save(id_usuario=user)
+            else:
+                # Otros: forzar su sucursal y usuario
+                venta = serializer.save(id_sucursal=user.id_sucursal, id_usuario=user)
+            # Recién creada: aún no tiene detalles, el costo se suma al crear cada uno
+            resumen_ventas.aplicar(despues=resumen_ventas.huella(venta, costo=0))
+
+    def perform_update(self, serializer):
+        """Mantiene el resumen diario si cambia el total o el tipo de pago"""
+        with transaction.atomic():
+            antes = resumen_ventas.huella(serializer.instance)
+            venta = serializer.save()
+            resumen_ventas.aplicar(antes, resumen_ventas.huella(venta, costo=antes.costo))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            antes = resumen_ventas.huella(instance)
+            instance.delete()
+            resumen_ventas.aplicar(antes=antes)
     
+    @action(detail=False, methods=['post'])
+    @idempotente
+    def checkout(self, request):
+        """
+        Registra una venta completa (cabecera + detalles) en una sola petición.
+        POST /api/ventas/checkout/
+        Body: { "id_cliente": 1, "tipo_pago": "Efectivo",
+                "items": [{ "id_producto": 5, "cantidad": 2, "precio_venta": 75.25 }, ...] }
+
+        Todo ocurre en una transacción: descuenta el stock de todos los renglones
+        con un único UPDATE condicional (que bloquea las filas afectadas), crea los
+        detalles en bloque con el snapshot de costo y recalcula total_venta en el
+        servidor. Si algo falla no queda ninguna venta huérfana.
+
+        Acepta la cabecera Idempotency-Key: un reintento con la misma clave
+        devuelve la venta ya registrada sin volver a descontar stock.
+        """
+        serializer = CheckoutVentaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+
+        # Super Admin puede especificar sucursal, el resto usa la suya
+        if user.id_rol.numero_rol == 1 and data.get('id_sucursal'):
+            sucursal = data['id_sucursal']
+        else:
+            sucursal = user.id_sucursal
+
+        # Cantidad total pedida por producto (un producto puede repetirse en el carrito)
+        items = data['items']
+        cantidades = {}
+        for item in items:
+            cantidades[item['id_producto']] = cantidades.get(item['id_producto'], 0) + item['cantidad']
+
+        # Una sola consulta: inventario de la sucursal con su producto
+        inventarios = {
+            inv.id_producto_id: inv
+            for inv in Inventario.objects.select_related('id_producto')
+            .filter(id_sucursal=sucursal, id_producto__in=cantidades.keys())
+        }
+        faltantes = [
+            {'id_producto': id_producto,
+             'error': f'El producto no existe en el inventario de la sucursal "{sucursal.nombre}".'}
+            for id_producto in cantidades if id_producto not in inventarios
+        ]
+        if faltantes:
+            raise serializers.ValidationError({'items': faltantes})
+
+        detalles = []
+        total = 0
+        costo = 0
+        for item in items:
+            producto = inventarios[item['id_producto']].id_producto
+            precio_venta = item.get('precio_venta')
+            if precio_venta is None:
+                precio_venta = producto.precio
+            total += precio_venta * item['cantidad']
+            costo += (producto.precio_compra or 0) * item['cantidad']
+            detalles.append(DetalleVenta(
+                id_producto=producto,
+                cantidad=item['cantidad'],
+                precio_venta=precio_venta,
+                costo_unitario=producto.precio_compra or 0
+            ))
+
+        with transaction.atomic():
+            venta = Venta.objects.create(
+                id_cliente=data.get('id_cliente'),
+                id_usuario=user,
+                id_sucursal=sucursal,
+                total_venta=total,
+                tipo_pago=data['tipo_pago']
+            )
+
+            # UPDATE condicional único: bloquea y descuenta todas las filas o ninguna
+            try:
+                descontar_stock(sucursal.pk, cantidades, venta=venta, usuario=user)
+            except StockInsuficienteError as e:
+                raise serializers.ValidationError({'items': [
+                    {'id_producto': f['id_producto'],
+                     'error': f'Stock insuficiente para "{inventarios[f["id_producto"]].id_producto.nombre_producto}". '
+                              f'Disponible: {f["disponible"]}, Solicitado: {f["solicitado"]}'}
+                    for f in e.fallidos
+                ]})
+
+            for detalle in detalles:
+                detalle.id_venta = venta
+            DetalleVenta.objects.bulk_create(detalles)
+            resumen_ventas.aplicar(despues=resumen_ventas.huella(venta, costo=costo))
+
+        return Response(VentaSerializer(venta).data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['patch'])
     def anular(self, request, pk=None):
         """
@@ -397,28 +857,38 @@ class VentaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Restaurar inventario
-        detalles = DetalleVenta.objects.filter(id_venta=venta)
-        for detalle in detalles:
-            inventario = Inventario.objects.filter(
-                id_producto=detalle.id_producto,
-                id_sucursal=venta.id_sucursal
-            ).first()
-            if inventario:
-                inventario.cantidad += detalle.cantidad
-                inventario.save()
-        
-        # Anular venta
+        with transaction.atomic():
+            # Anular venta (condicional: evita doble anulación concurrente)
+            fecha_anulacion = timezone.now()
+            anuladas = Venta.objects.filter(pk=venta.pk, estado='Completada').update(
+                estado='Anulada', motivo_anulacion=motivo, fecha_anulacion=fecha_anulacion
+            )
+            if not anuladas:
+                return Response(
+                    {'error': 'Esta venta ya fue anulada'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Restaurar inventario de todos los renglones en una sola sentencia
+            cantidades = {}
+            for id_producto, cantidad in DetalleVenta.objects.filter(id_venta=venta).values_list('id_producto', 'cantidad'):
+                cantidades[id_producto] = cantidades.get(id_producto, 0) + cantidad
+            restaurar_stock(venta.id_sucursal_id, cantidades, venta=venta, usuario=request.user)
+
+            # Mover la venta de 'Completada' a 'Anulada' en el resumen diario
+            antes = resumen_ventas.huella(venta)
+            resumen_ventas.aplicar(antes, antes._replace(estado='Anulada'))
+        
         venta.estado = 'Anulada'
         venta.motivo_anulacion = motivo
-        venta.fecha_anulacion = timezone.now()
-        venta.save()
+        venta.fecha_anulacion = fecha_anulacion
         
         return Response(VentaSerializer(venta).data)
 
-class DetalleVentaViewSet(viewsets.ModelViewSet):
+class DetalleVentaViewSet(IdempotenciaMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     queryset = DetalleVenta.objects.all().order_by('pk')
     serializer_class = DetalleVentaSerializer
+    orden_cursor = 'pk'  # ?cursor= (ver api/paginacion.py)
     
     def get_queryset(self):
         """Permite filtrar por id_venta: /api/detalle_ventas/?id_venta=1"""
@@ -432,9 +902,8 @@ class DetalleVentaViewSet(viewsets.ModelViewSet):
         """
         Al crear un detalle de venta:
         1. Obtiene la sucursal de la venta
-        2. Valida que exista stock suficiente en esa sucursal
+        2. Valida y descuenta el stock de esa sucursal (UPDATE condicional atómico)
         3. Captura el costo del producto (snapshot)
-        4. Descuenta del inventario automáticamente
         """
         # Obtener datos del request
         id_venta = serializer.validated_data.get('id_venta')
@@ -444,45 +913,54 @@ class DetalleVentaViewSet(viewsets.ModelViewSet):
         # Obtener la sucursal de la venta
         sucursal = id_venta.id_sucursal
         
-        # Buscar inventario de este producto en esta sucursal
-        inventario = Inventario.objects.filter(
-            id_producto=id_producto,
-            id_sucursal=sucursal
-        ).first()
-        
-        # Validar existencia de inventario
-        if not inventario:
-            raise serializers.ValidationError({
-                'id_producto': f'El producto "{id_producto.nombre_producto}" no existe en el inventario de la sucursal "{sucursal.nombre}".'
-            })
-        
-        # Validar stock suficiente
-        if inventario.cantidad < cantidad:
-            raise serializers.ValidationError({
-                'cantidad': f'Stock insuficiente para "{id_producto.nombre_producto}". Disponible: {inventario.cantidad}, Solicitado: {cantidad}'
-            })
-        
         # Capturar snapshot del costo
         costo_actual = id_producto.precio_compra or 0
         
-        # Guardar el detalle con el snapshot
-        serializer.save(costo_unitario=costo_actual)
-        
-        # Descontar del inventario
-        inventario.cantidad -= cantidad
-        inventario.save()
+        with transaction.atomic():
+            # Validar y descontar stock en un único UPDATE condicional
+            try:
+                descontar_stock(sucursal.pk, {id_producto.pk: cantidad}, venta=id_venta, usuario=self.request.user)
+            except StockInsuficienteError as e:
+                disponible = e.fallidos[0]['disponible']
+                if disponible is None:
+                    raise serializers.ValidationError({
+                        'id_producto': f'El producto "{id_producto.nombre_producto}" no existe en el inventario de la sucursal "{sucursal.nombre}".'
+                    })
+                raise serializers.ValidationError({
+                    'cantidad': f'Stock insuficiente para "{id_producto.nombre_producto}". Disponible: {disponible}, Solicitado: {cantidad}'
+                })
+            
+            # Guardar el detalle con el snapshot
+            serializer.save(costo_unitario=costo_actual)
+            resumen_ventas.sumar_costo(id_venta, costo_actual * cantidad)
+
+    def perform_update(self, serializer):
+        """Mantiene el costo del resumen diario si cambia la cantidad o el costo del renglón"""
+        anterior = serializer.instance.costo_unitario * serializer.instance.cantidad
+        venta_anterior = serializer.instance.id_venta
+        with transaction.atomic():
+            detalle = serializer.save()
+            resumen_ventas.sumar_costo(venta_anterior, -anterior)
+            resumen_ventas.sumar_costo(detalle.id_venta, detalle.costo_unitario * detalle.cantidad)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            resumen_ventas.sumar_costo(instance.id_venta, -(instance.costo_unitario * instance.cantidad))
 
-class ServicioTecnicoViewSet(viewsets.ModelViewSet):
+class ServicioTecnicoViewSet(IdempotenciaMixin, SeleccionAutomaticaMixin, viewsets.ModelViewSet):
     """
     🔒 AISLADO: Cada sucursal solo ve sus propios servicios técnicos
     Super Admin (1) ve todos los servicios
     """
     queryset = ServicioTecnico.objects.all()  # Base queryset for DRF router
     serializer_class = ServicioTecnicoSerializer
-    # Búsqueda server-side
-    filter_backends = [filters.SearchFilter]
+    orden_cursor = '-pk'  # ?cursor= (ver api/paginacion.py)
+    # Búsqueda server-side (índice de texto completo, ver api/busqueda.py)
+    filter_backends = [busqueda.BusquedaIndexada]
     search_fields = ['numero_servicio', 'id_cliente__nombre_apellido', 'marca_dispositivo', 
                      'modelo_dispositivo', 'descripcion_problema']
+    indice_busqueda = [('servicio', 'pk'), ('cliente', 'id_cliente')]
     
     def get_queryset(self):
         user = self.request.user
@@ -490,7 +968,7 @@ class ServicioTecnicoViewSet(viewsets.ModelViewSet):
         
         # Aislamiento por sucursal (excepto Super Admin)
         if user.id_rol.numero_rol != 1:
-            queryset = queryset.filter(id_sucursal=user.id_sucursal)
+            queryset = queryset.filter(id_sucursal_id=user.id_sucursal_id)
         
         # Filtro por técnico asignado (para vista "Mis Servicios")
         id_tecnico = self.request.query_params.get('id_tecnico_asignado', None)
@@ -524,10 +1002,12 @@ class ServicioTecnicoViewSet(viewsets.ModelViewSet):
         
         if user.id_rol.numero_rol == 1:
             # Super Admin puede especificar sucursal, pero siempre se asigna el usuario
-            serializer.save(id_usuario=user, saldo=saldo)
+            servicio = serializer.save(id_usuario=user, saldo=saldo)
         else:
             # Otros: forzar su sucursal y usuario
-            serializer.save(id_sucursal=user.id_sucursal, id_usuario=user, saldo=saldo)
+            servicio = serializer.save(id_sucursal=user.id_sucursal, id_usuario=user, saldo=saldo)
+        busqueda.indexar('servicio', servicio)
+        self._marcar_modificado(servicio)
     
     def perform_update(self, serializer):
         """
@@ -559,9 +1039,27 @@ class ServicioTecnicoViewSet(viewsets.ModelViewSet):
         
         # Si cambia a Entregado y no tiene fecha_entrega, capturarla
         if nuevo_estado == 'Entregado' and not instance.fecha_entrega:
-            serializer.save(fecha_entrega=timezone.now(), saldo=saldo)
+            servicio = serializer.save(fecha_entrega=timezone.now(), saldo=saldo)
         else:
-            serializer.save(saldo=saldo)
+            servicio = serializer.save(saldo=saldo)
+        busqueda.indexar('servicio', servicio)
+        self._marcar_modificado(servicio)
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        instance.delete()
+        busqueda.desindexar('servicio', pk)
+        self._marcar_modificado(instance)
+
+    def _marcar_modificado(self, servicio):
+        """
+        Invalida los reportes cacheados del día (local) de recepción del servicio y
+        los conteos de inicio, que cubren servicios de cualquier fecha
+        """
+        versiones.incrementar_dia(
+            'servicios', servicio.id_sucursal_id, timezone.localtime(servicio.fecha_inicio).date()
+        )
+        versiones.incrementar(versiones.SERVICIOS)
 
     @action(detail=True, methods=['patch'])
     def anular(self, request, pk=None):
@@ -602,6 +1100,7 @@ class ServicioTecnicoViewSet(viewsets.ModelViewSet):
         servicio.motivo_anulacion = motivo
         servicio.fecha_anulacion = timezone.now()
         servicio.save()
+        self._marcar_modificado(servicio)
         
         return Response({
             'message': 'Servicio anulado correctamente',
@@ -611,15 +1110,120 @@ class ServicioTecnicoViewSet(viewsets.ModelViewSet):
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_usuario(self, request):
+        """
+        request.user se arma desde el token (sin consultar la base de datos):
+        el perfil se lee y guarda desde la fila real.
+        """
+        return Usuario.objects.select_related('id_rol', 'id_sucursal').get(pk=request.user.pk)
+
     def get(self, request):
         """Obtener perfil del usuario autenticado"""
-        serializer = UserProfileSerializer(request.user)
+        serializer = UserProfileSerializer(self.get_usuario(request))
         return Response(serializer.data)
 
     def patch(self, request):
         """Actualizar perfil del usuario autenticado"""
-        serializer = UserProfileSerializer(request.user, data=request.data, partial=True)
+        serializer = UserProfileSerializer(self.get_usuario(request), data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AutocompletadoView(APIView):
+    """
+    Sugerencias para los selectores del POS desde el índice de prefijos del worker.
+    GET /api/autocomplete/{clientes|productos}/?search=term&limite=10
+    Devuelve una lista de tuplas (ver api/autocompletado.py), sin paginación ni COUNT.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, tipo):
+        indice = INDICES.get(tipo)
+        if indice is None:
+            return Response({'error': f'Tipo inválido: {tipo}'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limite = min(max(int(request.query_params.get('limite', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'limite inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(indice.buscar(request.query_params.get('search', ''), limite))
+
+
+class BatchView(APIView):
+    """
+    Varias lecturas en una sola llamada HTTP (carga inicial de las páginas).
+    POST /api/batch/
+    {"peticiones": [{"id": "roles", "ruta": "/roles/"}, {"id": "sucursales", "ruta": "/sucursales/?page=1"}]}
+    -> {"respuestas": {"roles": {"status": 200, "data": {...}}, "sucursales": {...}}}
+
+    Cada ruta (relativa a /api, como en apiGet) se resuelve con las URLs de
+    siempre y la atiende su vista con sus permisos y filtros, pero con el usuario
+    ya autenticado de esta petición (sin volver a validar el token) y en la misma
+    conexión a la base de datos.
+
+    Solo GET de vistas JSON, comprobado antes de ejecutar la vista (una descarga
+    de PDF/Excel no llega a generarse): listado o detalle de los recursos del
+    router, o una de VISTAS_JSON.
+    """
+    permission_classes = [IsAuthenticated]
+    VISTAS_JSON = {
+        'user_profile', 'dashboard_resumen', 'autocomplete', 'reportes_ventas_dashboard',
+        'reportes_servicios_dashboard', 'reportes_servicios_analitica',
+    }
+
+    def post(self, request):
+        peticiones = request.data.get('peticiones') if isinstance(request.data, dict) else None
+        if not isinstance(peticiones, list) or not peticiones:
+            return Response({'error': 'Se requiere una lista "peticiones"'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(peticiones) > settings.BATCH_MAX_PETICIONES:
+            return Response(
+                {'error': f'Máximo {settings.BATCH_MAX_PETICIONES} peticiones por llamada'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids = [p.get('id') if isinstance(p, dict) else None for p in peticiones]
+        rutas = [p.get('ruta') if isinstance(p, dict) else None for p in peticiones]
+        if not all(isinstance(valor, str) and valor for valor in ids + rutas) or len(set(ids)) != len(ids):
+            return Response(
+                {'error': 'Cada petición requiere "id" (único) y "ruta"'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        respuestas = {id_peticion: self._ejecutar(request, ruta) for id_peticion, ruta in zip(ids, rutas)}
+        return Response({'respuestas': respuestas})
+
+    def _ejecutar(self, request, ruta):
+        url = urlsplit(ruta)
+        path = url.path if url.path.startswith('/api/') else '/api/' + url.path.lstrip('/')
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'data': {'error': f'Ruta no encontrada: {ruta}'}}
+        if not self._permitida(match):
+            return {'status': status.HTTP_400_BAD_REQUEST, 'data': {'error': f'Ruta no permitida en /batch/: {ruta}'}}
+
+        sub = HttpRequest()
+        sub.method = 'GET'
+        sub.path = sub.path_info = path
+        sub.META = {
+            clave: valor for clave, valor in request._request.META.items()
+            if clave not in ('CONTENT_LENGTH', 'CONTENT_TYPE')
+        }
+        sub.META.update(REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=url.query)
+        sub.GET = QueryDict(url.query)
+        sub.resolver_match = match
+        # DRF usa este usuario en lugar de autenticar de nuevo (ForcedAuthentication)
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+
+        response = match.func(sub, *match.args, **match.kwargs)
+        return {'status': response.status_code, 'data': response.data}
+
+    def _permitida(self, match):
+        vista = getattr(match.func, 'cls', None)
+        if vista is None or not issubclass(vista, APIView):
+            return False
+        acciones = getattr(match.func, 'actions', None)
+        if acciones is not None:
+            # ViewSet: las acciones extra (exportar, descargar...) pueden devolver archivos
+            return acciones.get('get') in ('list', 'retrieve')
+        return match.url_name in self.VISTAS_JSON
@@ -1,22 +1,36 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import status
-from django.db.models import Sum, Count, F, Q
+from rest_framework.decorators import action
+from rest_framework import status, viewsets
+from django.db.models import Count
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from datetime import datetime, time
-import openpyxl
-from decimal import Decimal
-from collections import defaultdict
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 import io
+import os
+import tempfile
 
-from .models import Venta, ServicioTecnico, Sucursal
+from .cache_reportes import dashboard_cacheado, resumen_inicio
+from .consultas_reportes import ConsultaServicios, ConsultaVentas
+from .models import TrabajoReporte
+from .reportes import (
+    GENERADORES, generar_excel_servicios, generar_excel_ventas, generar_pdf_servicios, generar_pdf_ventas,
+)
+from .serializers import TrabajoReporteSerializer
+from .trabajos import encolar, ruta_archivo
+
+def respuesta_excel(archivo, nombre):
+    """
+    Libro write_only ya volcado a `archivo` y enviado por FileResponse
+    (StreamingHttpResponse por bloques): la memoria del worker no crece con las filas.
+    """
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f'{nombre}_{timezone.localdate().strftime("%Y%m%d")}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
 
 class ReporteBaseView(APIView):
     permission_classes = [IsAuthenticated]
@@ -52,109 +66,67 @@ class ReporteBaseView(APIView):
             return None # Todas las sucursales
         else:
             # Otros roles: forzados a su sucursal
-            return user.id_sucursal.id_sucursal
+            return user.id_sucursal_id
 
 class ReporteVentasDashboardView(ReporteBaseView):
+    @dashboard_cacheado('ventas')
     def get(self, request):
         fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
         sucursal_id = self.get_sucursal_filtro(request)
-        
-        queryset_base = Venta.objects.filter(
-            fecha_venta__range=(fecha_desde, fecha_hasta)
-        )
-        
-        if sucursal_id:
-            queryset_base = queryset_base.filter(id_sucursal_id=sucursal_id)
 
-        # 1. Gráfico de Estados (Completada vs Anulada) - Usamos el queryset base
-        por_estado = queryset_base.values('estado').annotate(cantidad=Count('id_venta')).order_by('-estado') # Completada primero
+        # Todas las secciones comparten los mismos filtros y se agregan en SQL
+        consulta = ConsultaVentas(fecha_desde, fecha_hasta, sucursal_id)
+
+        # 1. KPIs, días, estados y tipo de pago: una consulta sobre el resumen diario
+        resumen = consulta.resumen_diario()
+
         data_estados = {
-            'labels': [item['estado'] for item in por_estado],
-            'data': [item['cantidad'] for item in por_estado]
+            'labels': [estado for estado, _ in resumen['estados']],
+            'data': [cantidad for _, cantidad in resumen['estados']]
         }
 
-        # 2. Filtrar para el resto de KPIs y gráficos (Solo Completadas)
-        queryset = queryset_base.filter(estado='Completada')
-            
-        ventas_por_dia = defaultdict(lambda: {"total": Decimal("0"), "cantidad": 0, "costo": Decimal("0")})
-        
-        # Necesitamos iterar para calcular costos (ya que precio_compra está en Producto, no en DetalleVenta)
-        # Optimizamos con prefetch_related
-        queryset_con_detalle = queryset.prefetch_related('detalleventa_set__id_producto')
-        
-        total_costo_global = Decimal("0")
-        
-        for venta in queryset_con_detalle:
-            dia_local = timezone.localtime(venta.fecha_venta).date()
-            ventas_por_dia[dia_local]["total"] += venta.total_venta or Decimal("0")
-            ventas_por_dia[dia_local]["cantidad"] += 1
-            
-            # Calcular costo usando snapshot
-            costo_venta = Decimal("0")
-            for detalle in venta.detalleventa_set.all():
-                costo_venta += detalle.costo_unitario * detalle.cantidad
-            
-            ventas_por_dia[dia_local]["costo"] += costo_venta
-            total_costo_global += costo_venta
-
         labels = []
         data_monto = []
         data_cantidad = []
         data_ganancia = [] # Nueva serie
-        
-        for dia in sorted(ventas_por_dia.keys()):
+
+        for dia, valores in resumen['dias']:
             labels.append(dia.strftime('%d/%m/%Y'))
-            total_dia = float(ventas_por_dia[dia]["total"])
-            costo_dia = float(ventas_por_dia[dia]["costo"])
-            
+            total_dia = float(valores['total'])
+            costo_dia = float(valores['costo'])
+
             data_monto.append(total_dia)
-            data_cantidad.append(ventas_por_dia[dia]["cantidad"])
+            data_cantidad.append(valores['cantidad'])
             data_ganancia.append(total_dia - costo_dia)
-            
+
         # Totales Generales
-        total_acumulado = queryset.aggregate(Sum('total_venta'))['total_venta__sum'] or 0
-        total_transacciones = queryset.count()
-        total_ganancia = total_acumulado - total_costo_global
-        
-        por_tipo_pago = queryset.values('tipo_pago').annotate(
-            total=Count('tipo_pago'),
-            monto=Sum('total_venta')
-        )
-        
+        totales = resumen['totales']
+        total_acumulado = totales['total']
+        total_transacciones = totales['cantidad']
+        total_ganancia = total_acumulado - totales['costo']
+
         data_tipo_pago = {
-            'labels': [item['tipo_pago'] for item in por_tipo_pago],
-            'data': [item['monto'] for item in por_tipo_pago]
+            'labels': [tipo for tipo, _ in resumen['tipos_pago']],
+            'data': [valores['total'] for _, valores in resumen['tipos_pago']]
         }
-        
-        # Productos Más Vendidos... (Sin cambios)
-        from api.models import DetalleVenta
-        ventas_ids = queryset.values_list('id_venta', flat=True)
-        productos_vendidos = DetalleVenta.objects.filter(id_venta__in=ventas_ids).values('id_producto__nombre_producto').annotate(
-            cantidad_total=Sum('cantidad'),
-            monto_total=Sum(F('cantidad') * F('precio_venta'))
-        ).order_by('-cantidad_total')[:10]
-        
+
+        # 2. Productos más vendidos (JOIN detalle -> venta, sin subconsulta de ids)
+        productos_vendidos = consulta.top_productos()
         data_productos = {
             'labels': [item['id_producto__nombre_producto'] for item in productos_vendidos],
             'data': [item['cantidad_total'] for item in productos_vendidos],
             'monto': [float(item['monto_total']) for item in productos_vendidos]
         }
-        
-        # Horas... (Sin cambios)
-        horas_dict = {i: 0 for i in range(24)}
-        for fecha_venta in queryset.values_list('fecha_venta', flat=True):
-            hora_local = timezone.localtime(fecha_venta).hour
-            horas_dict[hora_local] += 1
+
+        # 3. Ventas por hora local, agrupadas en la base de datos
+        horas_dict = consulta.por_hora()
         data_por_hora = {
             'labels': [f"{h:02d}:00" for h in range(24)],
-            'data': [horas_dict[h] for h in range(24)]
+            'data': [horas_dict.get(h, 0) for h in range(24)]
         }
 
-        # Vendedores... (Sin cambios)
-        racha_vendedores = queryset.values('id_usuario__nombre_apellido').annotate(
-            cantidad_ventas=Count('id_venta'),
-            monto_total=Sum('total_venta')
-        ).order_by('-cantidad_ventas')[:10]
+        # 4. Vendedores
+        racha_vendedores = consulta.top_vendedores()
         data_vendedores = {
             'labels': [item['id_usuario__nombre_apellido'] or 'Sin Usuario' for item in racha_vendedores],
             'data': [item['cantidad_ventas'] for item in racha_vendedores],
@@ -186,111 +158,9 @@ class ReporteVentasPDFView(ReporteBaseView):
     def get(self, request):
         fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
         sucursal_id = self.get_sucursal_filtro(request)
-        
-        queryset = Venta.objects.filter(
-            fecha_venta__range=(fecha_desde, fecha_hasta)
-        ).select_related('id_cliente', 'id_usuario', 'id_sucursal').order_by('-fecha_venta')
-        
-        if sucursal_id:
-            queryset = queryset.filter(id_sucursal_id=sucursal_id)
-            
-        # Generar PDF
+
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Titulo
-        titulo = f"Reporte de Ventas"
-        if sucursal_id:
-            sucursal = Sucursal.objects.get(pk=sucursal_id)
-            titulo += f" - {sucursal.nombre}"
-        else:
-            titulo += " - Todas las Sucursales"
-            
-        elements.append(Paragraph(titulo, styles['Title']))
-        elements.append(Paragraph(f"Desde: {fecha_desde.strftime('%d/%m/%Y')} Hasta: {fecha_hasta.strftime('%d/%m/%Y')}", styles['Normal']))
-        elements.append(Spacer(1, 20))
-        
-        # Tabla con columnas detalladas
-        data_tabla = [['#', 'Fecha', 'Boleta', 'Cliente', 'Vendedor', 'Estado', 
-                       'P. Compra', 'P. Venta', 'Ganancia']]
-        
-        total_general = 0
-        total_costo_general = 0
-        
-        queryset = queryset.prefetch_related('detalleventa_set')
-        
-        for idx, v in enumerate(queryset, start=1):
-            estado = "Anulado" if v.estado == 'Anulada' else "Completado"
-            
-            # Calcular usando snapshots
-            precio_compra = 0
-            precio_venta = 0
-            
-            if v.estado == 'Completada':
-                for det in v.detalleventa_set.all():
-                    precio_compra += (det.costo_unitario * det.cantidad)
-                    precio_venta += (det.precio_venta * det.cantidad)
-                total_general += precio_venta
-                total_costo_general += precio_compra
-            
-            ganancia = precio_venta - precio_compra
-            
-            row = [
-                idx,
-                timezone.localtime(v.fecha_venta).strftime('%d/%m/%Y %H:%M'),
-                v.numero_boleta,
-                v.id_cliente.nombre_apellido if v.id_cliente else 'S/N',
-                v.id_usuario.nombre_apellido if v.id_usuario else 'S/N',
-                estado,
-                f"{precio_compra:.2f}" if v.estado == 'Completada' else "0.00",
-                f"{precio_venta:.2f}" if v.estado == 'Completada' else f"({v.total_venta:.2f})",
-                f"{ganancia:.2f}" if v.estado == 'Completada' else "0.00"
-            ]
-            data_tabla.append(row)
-            
-        # Fila Total
-        data_tabla.append(['', '', '', '', '', 'TOTAL:', 
-                          f"{total_costo_general:.2f}", 
-                          f"{total_general:.2f}", 
-                          f"{total_general - total_costo_general:.2f}"])
-            
-        t = Table(data_tabla, colWidths=[30, 85, 70, 80, 80, 65, 60, 60, 60])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(t)
-        
-        # --- RESUMEN FINANCIERO ---
-        elements.append(Spacer(1, 20))
-        elements.append(Paragraph("Resumen Financiero", styles['Heading2']))
-        
-        # Usar totales ya calculados
-        ganancia_total = total_general - total_costo_general
-        
-        data_resumen = [
-            ['Total Ventas (Ingresos)', f"{total_general:.2f} Bs"],
-            ['Costo (Productos)', f"{total_costo_general:.2f} Bs"],
-            ['Ganancia (Utilidad)', f"{ganancia_total:.2f} Bs"]
-        ]
-        
-        t_resumen = Table(data_resumen, colWidths=[200, 100])
-        t_resumen.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'), # Negrita para fila de Ganancia
-            ('TEXTCOLOR', (0, 2), (-1, 2), colors.green),
-        ]))
-        elements.append(t_resumen)
-        
-        doc.build(elements)
+        generar_pdf_ventas(fecha_desde, fecha_hasta, sucursal_id, buffer)
         buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf')
 
@@ -298,73 +168,21 @@ class ReporteVentasExcelView(ReporteBaseView):
     def get(self, request):
         fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
         sucursal_id = self.get_sucursal_filtro(request)
-        
-        queryset = Venta.objects.filter(
-            fecha_venta__range=(fecha_desde, fecha_hasta)
-        ).select_related('id_cliente', 'id_usuario', 'id_sucursal').order_by('-fecha_venta')
-        
-        if sucursal_id:
-            queryset = queryset.filter(id_sucursal_id=sucursal_id)
-            
-        # Crear Workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Reporte Ventas"
-        
-        # Headers
-        headers = ['#', 'Fecha', 'Boleta', 'Cliente', 'Vendedor', 'Sucursal', 
-                   'Tipo Pago', 'Estado', 'Motivo Anulacion', 
-                   'Precio Compra', 'Precio Venta', 'Ganancia']
-        ws.append(headers)
-        
-        # Pre-fetch para optimizar
-        queryset = queryset.prefetch_related('detalleventa_set')
-        
-        for idx, v in enumerate(queryset, start=1):
-            precio_compra_total = 0
-            precio_venta_total = 0
-            
-            if v.estado == 'Completada':
-                for det in v.detalleventa_set.all():
-                    precio_compra_total += (det.costo_unitario * det.cantidad)
-                    precio_venta_total += (det.precio_venta * det.cantidad)
-            
-            ganancia = precio_venta_total - precio_compra_total
-
-            ws.append([
-                idx,
-                timezone.localtime(v.fecha_venta).strftime('%d/%m/%Y %H:%M'),
-                v.numero_boleta,
-                v.id_cliente.nombre_apellido if v.id_cliente else '',
-                v.id_usuario.nombre_apellido if v.id_usuario else '',
-                v.id_sucursal.nombre if v.id_sucursal else '',
-                v.tipo_pago,
-                v.estado,
-                v.motivo_anulacion or '',
-                float(precio_compra_total),
-                float(precio_venta_total),
-                float(ganancia)
-            ])
-            
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename=ventas_{timezone.localdate().strftime("%Y%m%d")}.xlsx'
-        wb.save(response)
-        return response
+
+        return respuesta_excel(generar_excel_ventas(fecha_desde, fecha_hasta, sucursal_id, tempfile.TemporaryFile()), 'ventas')
+
 
 # --- SERVICIOS TÉCNICOS ---
 
 class ReporteServiciosDashboardView(ReporteBaseView):
+    @dashboard_cacheado('servicios')
     def get(self, request):
         fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
         sucursal_id = self.get_sucursal_filtro(request)
         
-        queryset = ServicioTecnico.objects.filter(
-            fecha_inicio__range=(fecha_desde, fecha_hasta)
-        )
-        
-        if sucursal_id:
-            queryset = queryset.filter(id_sucursal_id=sucursal_id)
-            
+        consulta = ConsultaServicios(fecha_desde, fecha_hasta, sucursal_id)
+        queryset = consulta.servicios()
+
         # Agrupación por Estado
         por_estado = queryset.values('estado').annotate(
             total=Count('estado')
@@ -375,14 +193,10 @@ class ReporteServiciosDashboardView(ReporteBaseView):
             total=Count('marca_dispositivo')
         ).order_by('-total')[:5] # Top 5
         
-        # Datos cronológicos (opcional, por recepción)
-        servicios_por_dia = defaultdict(int)
-        for fecha_inicio in queryset.values_list('fecha_inicio', flat=True):
-            dia_local = timezone.localtime(fecha_inicio).date()
-            servicios_por_dia[dia_local] += 1
-
-        labels_dia = [dia.strftime('%d/%m') for dia in sorted(servicios_por_dia.keys())]
-        data_dia = [servicios_por_dia[dia] for dia in sorted(servicios_por_dia.keys())]
+        # Datos cronológicos (por recepción, día local agrupado en SQL)
+        por_dia = consulta.por_dia()
+        labels_dia = [dia.strftime('%d/%m') for dia, _ in por_dia]
+        data_dia = [cantidad for _, cantidad in por_dia]
 
         # Agrupación por Técnico (Solo Entregados)
         por_tecnico = queryset.filter(estado='Entregado').values('id_tecnico_asignado__nombre_apellido').annotate(
@@ -392,15 +206,11 @@ class ReporteServiciosDashboardView(ReporteBaseView):
         labels_tecnico = [item['id_tecnico_asignado__nombre_apellido'] or 'Sin Asignar' for item in por_tecnico]
         data_tecnico = [item['total'] for item in por_tecnico]
 
-        # Distribución por Hora del Día
-        horas_dict = {i: 0 for i in range(24)}
-        for fecha_inicio in queryset.values_list('fecha_inicio', flat=True):
-            hora_local = timezone.localtime(fecha_inicio).hour
-            horas_dict[hora_local] += 1
-        
+        # Distribución por Hora del Día (hora local agrupada en SQL)
+        horas_dict = consulta.por_hora()
         data_por_hora = {
             'labels': [f"{h:02d}:00" for h in range(24)],
-            'data': [horas_dict[h] for h in range(24)]
+            'data': [horas_dict.get(h, 0) for h in range(24)]
         }
 
         return Response({
@@ -424,74 +234,32 @@ class ReporteServiciosDashboardView(ReporteBaseView):
                 'labels': data_por_hora['labels'],
                 'data': data_por_hora['data']
             },
-            'kpis': {
-                # 1. Entregados (Realizados/Cobrados)
-                'monto_entregado': queryset.filter(estado='Entregado').aggregate(Sum('costo_estimado'))['costo_estimado__sum'] or 0,
-                'transacciones_entregado': queryset.filter(estado='Entregado').count(),
-                
-                # 2. Para Retirar (Listos para entrega)
-                'monto_para_retirar': queryset.filter(estado='Para Retirar').aggregate(Sum('costo_estimado'))['costo_estimado__sum'] or 0,
-                'transacciones_para_retirar': queryset.filter(estado='Para Retirar').count(),
-                
-                # 3. En Proceso (En Taller)
-                'monto_en_reparacion': queryset.filter(estado='En Reparación').aggregate(Sum('costo_estimado'))['costo_estimado__sum'] or 0,
-                'transacciones_en_reparacion': queryset.filter(estado='En Reparación').count()
-            }
+            # Entregados, Para Retirar, En Reparación (+ saldos): una sola consulta condicional
+            'kpis': consulta.kpis()
+        })
+
+class ReporteServiciosAnaliticaView(ReporteBaseView):
+    """
+    Analítica del taller: KPIs del rango, demoras de entrega (p50/p90) por técnico y
+    por categoría, y antigüedad de las órdenes abiertas hoy. Tres consultas.
+    GET /api/reportes/servicios/analitica/?fecha_desde=&fecha_hasta=&id_sucursal=
+    """
+    def get(self, request):
+        fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
+        consulta = ConsultaServicios(fecha_desde, fecha_hasta, self.get_sucursal_filtro(request))
+        return Response({
+            'kpis': consulta.kpis(),
+            'demoras': consulta.demoras(),
+            'antiguedad': consulta.antiguedad(),
         })
 
 class ReporteServiciosPDFView(ReporteBaseView):
     def get(self, request):
         fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
         sucursal_id = self.get_sucursal_filtro(request)
-        
-        queryset = ServicioTecnico.objects.filter(
-            fecha_inicio__range=(fecha_desde, fecha_hasta)
-        ).select_related('id_cliente', 'id_tecnico_asignado').order_by('-fecha_inicio')
-        
-        if sucursal_id:
-            queryset = queryset.filter(id_sucursal_id=sucursal_id)
 
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        elements.append(Paragraph("Reporte de Servicios Técnicos", styles['Title']))
-        elements.append(Paragraph(f"Periodo: {fecha_desde.strftime('%d/%m/%Y')} - {fecha_hasta.strftime('%d/%m/%Y')}", styles['Normal']))
-        elements.append(Spacer(1, 20))
-        
-        data_tabla = [['#', 'Recepción', 'Entrega', 'Ticket', 'Cliente', 'Dispositivo', 'Estado', 'Tec. asignado', 'Costo']]
-        total_estimado = 0
-        
-        for idx, s in enumerate(queryset, start=1):
-            if s.estado != 'Anulado':
-                total_estimado += s.costo_estimado
-            
-            row = [
-                idx,
-                timezone.localtime(s.fecha_inicio).strftime('%d/%m/%Y'),
-                timezone.localtime(s.fecha_entrega).strftime('%d/%m/%Y') if s.fecha_entrega else '-',
-                s.numero_servicio,
-                s.id_cliente.nombre_apellido if s.id_cliente else '-',
-                f"{s.marca_dispositivo} {s.modelo_dispositivo}",
-                s.estado,
-                s.id_tecnico_asignado.nombre_apellido if s.id_tecnico_asignado else '-',
-                f"{s.costo_estimado:.2f}"
-            ]
-            data_tabla.append(row)
-            
-        data_tabla.append(['', '', '', '', '', '', '', 'TOTAL:', f"{total_estimado:.2f}"])
-            
-        t = Table(data_tabla)
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(t)
-        
-        doc.build(elements)
+        generar_pdf_servicios(fecha_desde, fecha_hasta, sucursal_id, buffer)
         buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf')
 
@@ -499,36 +267,78 @@ class ReporteServiciosExcelView(ReporteBaseView):
     def get(self, request):
         fecha_desde, fecha_hasta = self.get_fechas_filtro(request)
         sucursal_id = self.get_sucursal_filtro(request)
-        
-        queryset = ServicioTecnico.objects.filter(
-            fecha_inicio__range=(fecha_desde, fecha_hasta)
-        ).order_by('-fecha_inicio')
-        
-        if sucursal_id:
-            queryset = queryset.filter(id_sucursal_id=sucursal_id)
-            
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Servicios"
-        
-        headers = ['#', 'Nro Servicio', 'Fecha Recepción', 'Fecha Entrega', 'Cliente', 'Dispositivo', 'Problema', 'Estado', 'Tec. asignado', 'Costo']
-        ws.append(headers)
-        
-        for idx, s in enumerate(queryset, start=1):
-            ws.append([
-                idx,
-                s.numero_servicio,
-                timezone.localtime(s.fecha_inicio).strftime('%d/%m/%Y %H:%M') if s.fecha_inicio else '',
-                timezone.localtime(s.fecha_entrega).strftime('%d/%m/%Y %H:%M') if s.fecha_entrega else '',
-                s.id_cliente.nombre_apellido if s.id_cliente else '',
-                f"{s.marca_dispositivo} {s.modelo_dispositivo}",
-                s.descripcion_problema,
-                s.estado,
-                s.id_tecnico_asignado.nombre_apellido if s.id_tecnico_asignado else '',
-                float(s.costo_estimado)
-            ])
-            
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename=servicios_{timezone.localdate().strftime("%Y%m%d")}.xlsx'
-        wb.save(response)
+
+        return respuesta_excel(generar_excel_servicios(fecha_desde, fecha_hasta, sucursal_id, tempfile.TemporaryFile()), 'servicios')
+
+# --- PÁGINA DE INICIO ---
+
+class DashboardResumenView(ReporteBaseView):
+    """
+    Todo lo que dibuja la página de inicio en una sola petición: conteos, ventas de hoy
+    y del mes, series de 7 días y 12 meses, y últimas ventas/servicios. Cacheado por
+    sucursal (ver cache_reportes.resumen_inicio).
+    GET /api/dashboard/resumen/?id_sucursal=
+    """
+    def get(self, request):
+        datos, hit, clave = resumen_inicio(self.get_sucursal_filtro(request))
+        response = Response({**datos, 'cache': {'hit': hit, 'clave': clave}})
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
         return response
+
+# --- REPORTES EN SEGUNDO PLANO ---
+
+class TrabajoReporteViewSet(viewsets.ModelViewSet):
+    """
+    Cola de reportes: POST encola y devuelve el id del trabajo, GET /{id}/ informa
+    el estado y GET /{id}/descargar/ entrega el archivo cuando está Completado.
+    Los genera el worker `python manage.py procesar_reportes`.
+    🔒 Cada usuario ve sus trabajos; Super Admin (1) ve todos.
+    """
+    queryset = TrabajoReporte.objects.all()  # Base queryset for DRF router
+    serializer_class = TrabajoReporteSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = TrabajoReporte.objects.select_related('id_sucursal').order_by('-pk')
+        if user.id_rol.numero_rol == 1:
+            return queryset
+        return queryset.filter(id_usuario=user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+        # Super Admin elige la sucursal (o todas); el resto, forzado a la suya
+        if user.id_rol.numero_rol == 1:
+            sucursal_id = data['id_sucursal'].pk if data.get('id_sucursal') else None
+        else:
+            sucursal_id = user.id_sucursal_id
+
+        trabajo = encolar(data['tipo'], data['fecha_desde'], data['fecha_hasta'], sucursal_id, user)
+        return Response(
+            self.get_serializer(trabajo).data,
+            status=status.HTTP_201_CREATED if trabajo.estado == 'Completado' else status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        trabajo = self.get_object()
+        if trabajo.estado != 'Completado':
+            return Response({'error': f'El reporte está {trabajo.estado}'}, status=status.HTTP_409_CONFLICT)
+        ruta = ruta_archivo(trabajo.archivo)
+        if not os.path.exists(ruta):
+            return Response(
+                {'error': 'El archivo ya no está disponible, vuelva a solicitar el reporte'},
+                status=status.HTTP_410_GONE
+            )
+        # Marca de uso para la limpieza por antigüedad (procesar_reportes --limpiar-dias)
+        os.utime(ruta)
+        ambito, extension = GENERADORES[trabajo.tipo][1:]
+        return FileResponse(
+            open(ruta, 'rb'),
+            as_attachment=True,
+            filename=f'{ambito}_{trabajo.fecha_desde:%Y%m%d}_{trabajo.fecha_hasta:%Y%m%d}.{extension}',
+        )
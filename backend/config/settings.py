@@ -133,18 +133,27 @@ STATIC_URL = 'static/'
 
 # REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # ?page=N como siempre; ?cursor= activa la paginación por clave (ver api/paginacion.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.paginacion.PaginacionHibrida',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Usuario armado desde los claims del token, sin consultas (ver api/autenticacion.py)
+        'api.autenticacion.JWTClaimsAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny', 
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # ?format=compact: columnas una vez + filas como listas (ver api/renderizadores.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderizadores.RenderizadorCompacto',
+    ],
 }
 
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60), 
@@ -165,11 +174,48 @@ SPECTACULAR_SETTINGS = {
 
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True # For dev
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
+# Idempotencia (reintentos del POS): horas que se conserva cada clave
+IDEMPOTENCIA_TTL_HORAS = int(os.getenv('IDEMPOTENCIA_TTL_HORAS', '24'))
 
 # Media Files (Uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Caché compartida entre workers de Gunicorn (dashboards de reportes). Por defecto en disco;
+# se puede apuntar a otro backend, p. ej. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000'))},
+    }
+}
+# Segundos que vive un dashboard cacheado cuyo rango incluye hoy (los rangos cerrados no vencen)
+DASHBOARD_CACHE_TTL_HOY = int(os.getenv('DASHBOARD_CACHE_TTL_HOY', '3600'))
+
+# Segundos que se reutiliza el total (?total=1) de un listado paginado por cursor
+PAGINACION_TOTAL_TTL = int(os.getenv('PAGINACION_TOTAL_TTL', '60'))
+
+# Segundos que vive en caché la lista de tokens revocados (se invalida al revocar; es solo un respaldo)
+REVOCACIONES_CACHE_SEGUNDOS = int(os.getenv('REVOCACIONES_CACHE_SEGUNDOS', '300'))
+
+# Máximo de coincidencias de una búsqueda indexada (?search=); con más, el término es demasiado
+# amplio y se usa SearchFilter para que el listado y su total sigan siendo exactos
+BUSQUEDA_MAX_RESULTADOS = int(os.getenv('BUSQUEDA_MAX_RESULTADOS', '500'))
+
+# Máximo de lecturas por llamada a /api/batch/
+BATCH_MAX_PETICIONES = int(os.getenv('BATCH_MAX_PETICIONES', '20'))
+
+# Reportes en segundo plano (python manage.py procesar_reportes): carpeta de archivos generados
+REPORTES_DIR = os.getenv('REPORTES_DIR', os.path.join(BASE_DIR, 'reportes_cache'))
+# Cada cuántos segundos el worker renueva el latido de un trabajo en generación, y cuántos
+# segundos sin latido hacen falta para darlo por muerto y volverlo a la cola
+REPORTES_LATIDO_SEGUNDOS = int(os.getenv('REPORTES_LATIDO_SEGUNDOS', '30'))
+REPORTES_VENCIMIENTO_SEGUNDOS = int(os.getenv('REPORTES_VENCIMIENTO_SEGUNDOS', '300'))
+
 # File Upload Limits (10 MB)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
@@ -174,10 +174,24 @@ async function apiGet(endpoint) {
     }
 }
 
-// POST request
-async function apiPost(endpoint, data) {
+/**
+ * Genera una clave de idempotencia para una escritura del POS.
+ * Reutilizar la MISMA clave al reintentar la misma operación: si el servidor ya la
+ * había registrado (p. ej. timeout con Wi-Fi inestable) devuelve el resultado original.
+ */
+function nuevaClaveIdempotencia() {
+    if (window.crypto?.randomUUID) {
+        return crypto.randomUUID();
+    }
+    // Fallback para contextos sin HTTPS (randomUUID solo existe en contextos seguros)
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// POST request (idempotencyKey opcional: ver nuevaClaveIdempotencia)
+async function apiPost(endpoint, data, idempotencyKey = null) {
     try {
-        const response = await api.post(endpoint, data);
+        const config = idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : {};
+        const response = await api.post(endpoint, data, config);
         return response.data;
     } catch (error) {
         throw error;
@@ -215,13 +229,13 @@ async function apiDelete(endpoint) {
 }
 
 // POST with FormData (for file uploads)
-async function apiPostFormData(endpoint, formData) {
+async function apiPostFormData(endpoint, formData, idempotencyKey = null) {
     try {
-        const response = await api.post(endpoint, formData, {
-            headers: {
-                'Content-Type': 'multipart/form-data',
-            },
-        });
+        const headers = { 'Content-Type': 'multipart/form-data' };
+        if (idempotencyKey) {
+            headers['Idempotency-Key'] = idempotencyKey;
+        }
+        const response = await api.post(endpoint, formData, { headers });
         return response.data;
     } catch (error) {
         throw error;
@@ -255,3 +269,92 @@ async function apiPatchFormData(endpoint, formData) {
         throw error;
     }
 }
+
+/**
+ * Paginación por cursor (?cursor=) para listados grandes (ventas, servicios):
+ * el servidor no cuenta ni salta filas, así que la página 5000 cuesta lo mismo que la 1.
+ * Recuerda el cursor de cada página visitada para seguir navegando por número de página
+ * con "Anterior"/"Siguiente". El total (?total=1) viene cacheado unos segundos.
+ * Uso: const paginas = new PaginasCursor('/ventas/');
+ *      const data = await paginas.cargar(page, '&search=...');  // data.page = página cargada
+ */
+class PaginasCursor {
+    constructor(endpoint) {
+        this.endpoint = endpoint;
+        this.reiniciar('');
+    }
+
+    reiniciar(filtros) {
+        this.filtros = filtros;
+        this.cursores = { 1: '' };
+    }
+
+    async cargar(page, filtros = '') {
+        // Filtros nuevos o página no visitada: se vuelve a empezar desde la primera
+        if (filtros !== this.filtros || !(page in this.cursores)) {
+            this.reiniciar(filtros);
+            page = 1;
+        }
+        const cursor = encodeURIComponent(this.cursores[page]);
+        const data = await apiGet(`${this.endpoint}?cursor=${cursor}&total=1${filtros}`);
+        if (data.next) {
+            this.cursores[page + 1] = new URL(data.next, window.location.origin).searchParams.get('cursor');
+        }
+        data.page = page;
+        return data;
+    }
+}
+
+/**
+ * Sugerencias para los selectores de cliente/producto (/autocomplete/{tipo}/).
+ * El servidor responde tuplas cortas desde un índice en memoria; aquí se vuelven
+ * objetos con los mismos nombres de campo que el serializer para no cambiar el render.
+ */
+const CAMPOS_AUTOCOMPLETADO = {
+    clientes: ['id_cliente', 'nombre_apellido', 'cedula_identidad', 'celular'],
+    productos: ['id_producto', 'nombre_producto', 'codigo_barras', 'precio'],
+};
+
+async function apiAutocompletar(tipo, term, limite = 10) {
+    const filas = await apiGet(`/autocomplete/${tipo}/?search=${encodeURIComponent(term)}&limite=${limite}`);
+    const campos = CAMPOS_AUTOCOMPLETADO[tipo];
+    return filas.map(fila => Object.fromEntries(campos.map((campo, i) => [campo, fila[i]])));
+}
+
+/**
+ * Varias lecturas en una sola llamada (/batch/): para la carga inicial de las páginas,
+ * donde cada apiGet por separado paga su propio viaje de ida y vuelta.
+ * Uso: const { roles, sucursales } = await apiBatch({ roles: '/roles/', sucursales: '/sucursales/' });
+ * Las rutas son las mismas que en apiGet. Si alguna falla, se lanza el error de esa ruta.
+ */
+async function apiBatch(rutas) {
+    const peticiones = Object.entries(rutas).map(([id, ruta]) => ({ id, ruta }));
+    const { respuestas } = await apiPost('/batch/', { peticiones });
+    const datos = {};
+    for (const [id, respuesta] of Object.entries(respuestas)) {
+        if (respuesta.status >= 400) {
+            const error = new Error(`${rutas[id]}: ${respuesta.data?.error || respuesta.data?.detail || respuesta.status}`);
+            error.response = respuesta;
+            throw error;
+        }
+        datos[id] = respuesta.data;
+    }
+    return datos;
+}
+
+/**
+ * Solicita un reporte a la cola (/reportes/jobs/) y espera a que el worker lo genere.
+ * Devuelve el trabajo Completado (descargar con /reportes/jobs/{id}/descargar/).
+ * Si el mismo rango ya se había generado y no cambió, vuelve Completado al instante.
+ */
+async function solicitarReporte(datos, intervaloMs = 1500) {
+    let trabajo = await apiPost('/reportes/jobs/', datos);
+    while (trabajo.estado === 'Pendiente' || trabajo.estado === 'En Proceso') {
+        await new Promise(resolve => setTimeout(resolve, intervaloMs));
+        trabajo = await apiGet(`/reportes/jobs/${trabajo.id_trabajo}/`);
+    }
+    if (trabajo.estado !== 'Completado') {
+        throw new Error(trabajo.error || 'Error al generar el reporte');
+    }
+    return trabajo;
+}
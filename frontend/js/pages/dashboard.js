@@ -1,6 +1,7 @@
 /**
  * Dashboard Page Logic
- * Client-side Data Processing - Loads real data and calculates KPIs
+ * Loads the precomputed summary from /dashboard/resumen/ (counts, today's totals,
+ * chart series and latest rows) in a single request.
  * Includes Chart.js integration with Day/Month view selector
  */
 
@@ -12,8 +13,7 @@ let serviciosBarChart = null;
 
 // Chart view state
 let currentChartView = 'day'; // 'day' or 'month'
-let cachedVentasData = [];
-let cachedServiciosData = [];
+let cachedResumen = null;
 
 /**
  * Load all dashboard data
@@ -22,30 +22,18 @@ async function loadDashboardData() {
     showLoader();
 
     try {
-        // 1. Fetch data in parallel (optimized)
-        const [ventasRes, productosRes, clientesRes, serviciosRes] = await Promise.all([
-            apiGet('/ventas/?page_size=1000'),  // Get all sales for charts
-            apiGet('/productos/?page_size=1'),  // Only need count
-            apiGet('/clientes/?page_size=1'),   // Only need count
-            apiGet('/servicios_tecnicos/?page_size=1000')  // Get all services for charts
-        ]);
-
-        const ventas = ventasRes.results || ventasRes;
-        const totalProductos = productosRes.count || (Array.isArray(productosRes) ? productosRes.length : 0);
-        const totalClientes = clientesRes.count || (Array.isArray(clientesRes) ? clientesRes.length : 0);
-        const servicios = serviciosRes.results || serviciosRes;
-        const totalServicios = serviciosRes.count || (Array.isArray(serviciosRes) ? serviciosRes.length : 0);
+        // 1. One aggregated request (cached per sucursal on the server)
+        const resumen = await apiGet('/dashboard/resumen/');
 
         // Cache data for chart view switching
-        cachedVentasData = ventas;
-        cachedServiciosData = servicios;
+        cachedResumen = resumen;
 
-        // 2. Client-side Processing
-        processAndRenderKPIs(ventas, totalProductos, totalClientes, totalServicios);
+        // 2. KPIs
+        renderKPIs(resumen);
 
         // 3. Render Latest Tables
-        renderLatestSalesTable(ventas.slice(0, 5));
-        renderLatestServicesTable(servicios.slice(0, 5));
+        renderLatestSalesTable(resumen.ultimas_ventas);
+        renderLatestServicesTable(resumen.ultimos_servicios);
 
         // 4. Render Charts
         renderAllCharts();
@@ -84,44 +72,21 @@ function restrictReportingButtons() {
 }
 
 /**
- * Process sales data and calculate KPIs
+ * Render KPIs (current month's completed sales and global counts)
  */
-function processAndRenderKPIs(ventas, totalProductos, totalClientes, totalServicios) {
-    // Filter out cancelled sales
-    const ventasValidas = ventas.filter(v => v.estado !== 'Anulada');
+function renderKPIs(resumen) {
+    const { conteos, ventas } = resumen;
 
-    // Get current month's sales
-    const now = new Date();
-    const startOfMonth = new Date(now.getFullYear(), now.getMonth(), 1);
-
-    const ventasMes = ventasValidas.filter(v => {
-        const fechaVenta = new Date(v.fecha_venta);
-        return fechaVenta >= startOfMonth;
-    });
-
-    // Calculate KPIs
-    const totalIngresosMes = ventasMes.reduce((sum, v) => sum + parseFloat(v.total_venta || 0), 0);
-    const cantidadVentasMes = ventasMes.length;
-
-    // Render KPIs
     document.getElementById('totalVentas').innerHTML = `
-        <strong>${cantidadVentasMes}</strong>
+        <strong>${ventas.mes.cantidad}</strong>
         <small class="d-block text-muted" style="font-size: 0.75rem; margin-top: 4px;">
-            ${formatCurrency(totalIngresosMes)}
+            ${formatCurrency(ventas.mes.total)}
         </small>
     `;
 
-    document.getElementById('totalProductos').textContent = totalProductos.toLocaleString();
-    document.getElementById('totalClientes').textContent = totalClientes.toLocaleString();
-    document.getElementById('totalServicios').textContent = totalServicios.toLocaleString();
-
-    // Log stats for debugging
-    console.log('Dashboard Stats:', {
-        ventasDelMes: cantidadVentasMes,
-        ingresosDelMes: totalIngresosMes,
-        totalVentas: ventas.length,
-        ventasValidas: ventasValidas.length
-    });
+    document.getElementById('totalProductos').textContent = conteos.productos.toLocaleString();
+    document.getElementById('totalClientes').textContent = conteos.clientes.toLocaleString();
+    document.getElementById('totalServicios').textContent = conteos.servicios.toLocaleString();
 }
 
 /**
@@ -230,200 +195,34 @@ function switchChartView(view) {
 }
 
 /**
- * Get last 7 days labels (format: dd/mm)
- */
-function getLast7DaysLabels() {
-    const labels = [];
-    for (let i = 6; i >= 0; i--) {
-        const date = new Date();
-        date.setDate(date.getDate() - i);
-        labels.push(`${date.getDate()}/${date.getMonth() + 1}`);
-    }
-    return labels;
-}
-
-/**
- * Get last 12 months labels (format: MMM)
- */
-function getLast12MonthsLabels() {
-    const labels = [];
-    const monthNames = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic'];
-
-    for (let i = 11; i >= 0; i--) {
-        const date = new Date();
-        date.setMonth(date.getMonth() - i);
-        labels.push(monthNames[date.getMonth()]);
-    }
-    return labels;
-}
-
-/**
- * Group sales by date (last 7 days)
- */
-function processSalesDataForCharts(ventas) {
-    const labels = getLast7DaysLabels();
-    const last7Days = [];
-
-    for (let i = 6; i >= 0; i--) {
-        const date = new Date();
-        date.setDate(date.getDate() - i);
-        date.setHours(0, 0, 0, 0);
-        last7Days.push(date);
-    }
-
-    // Filter valid sales (not cancelled)
-    const ventasValidas = ventas.filter(v => v.estado !== 'Anulada');
-
-    // Group by date
-    const dataByDate = last7Days.map(targetDate => {
-        const nextDate = new Date(targetDate);
-        nextDate.setDate(nextDate.getDate() + 1);
-
-        const ventasDelDia = ventasValidas.filter(v => {
-            const fechaVenta = new Date(v.fecha_venta);
-            return fechaVenta >= targetDate && fechaVenta < nextDate;
-        });
-
-        const totalEfectivo = ventasDelDia
-            .filter(v => v.tipo_pago === 'Efectivo')
-            .reduce((sum, v) => sum + parseFloat(v.total_venta || 0), 0);
-
-        const totalQR = ventasDelDia
-            .filter(v => v.tipo_pago === 'QR')
-            .reduce((sum, v) => sum + parseFloat(v.total_venta || 0), 0);
-
-        return {
-            total: totalEfectivo + totalQR,
-            efectivo: totalEfectivo,
-            qr: totalQR,
-            cantidad: ventasDelDia.length
-        };
-    });
-
-    return { labels, dataByDate };
-}
-
-/**
- * Group sales by month (last 12 months)
+ * Day labels (dd/mm) from ISO dates (YYYY-MM-DD)
  */
-function processSalesDataByMonth(ventas) {
-    const labels = getLast12MonthsLabels();
-    const last12Months = [];
-
-    for (let i = 11; i >= 0; i--) {
-        const date = new Date();
-        date.setMonth(date.getMonth() - i);
-        date.setDate(1);
-        date.setHours(0, 0, 0, 0);
-        last12Months.push(date);
-    }
-
-    // Filter valid sales
-    const ventasValidas = ventas.filter(v => v.estado !== 'Anulada');
-
-    // Group by month
-    const dataByDate = last12Months.map(targetDate => {
-        const nextMonth = new Date(targetDate);
-        nextMonth.setMonth(nextMonth.getMonth() + 1);
-
-        const ventasDelMes = ventasValidas.filter(v => {
-            const fechaVenta = new Date(v.fecha_venta);
-            return fechaVenta >= targetDate && fechaVenta < nextMonth;
-        });
-
-        const totalEfectivo = ventasDelMes
-            .filter(v => v.tipo_pago === 'Efectivo')
-            .reduce((sum, v) => sum + parseFloat(v.total_venta || 0), 0);
-
-        const totalQR = ventasDelMes
-            .filter(v => v.tipo_pago === 'QR')
-            .reduce((sum, v) => sum + parseFloat(v.total_venta || 0), 0);
-
-        return {
-            total: totalEfectivo + totalQR,
-            efectivo: totalEfectivo,
-            qr: totalQR,
-            cantidad: ventasDelMes.length
-        };
+function getDayLabels(fechas) {
+    return fechas.map(fecha => {
+        const [, month, day] = fecha.split('-').map(Number);
+        return `${day}/${month}`;
     });
-
-    return { labels, dataByDate };
 }
 
 /**
- * Group services by date (last 7 days)
+ * Month labels (MMM) from YYYY-MM
  */
-function processServicesDataForCharts(servicios) {
-    const labels = getLast7DaysLabels();
-    const last7Days = [];
-
-    for (let i = 6; i >= 0; i--) {
-        const date = new Date();
-        date.setDate(date.getDate() - i);
-        date.setHours(0, 0, 0, 0);
-        last7Days.push(date);
-    }
-
-    // Filter valid services (not cancelled)
-    const serviciosValidos = servicios.filter(s => s.estado !== 'Anulado');
-
-    // Group by date and state
-    const dataByDate = last7Days.map(targetDate => {
-        const nextDate = new Date(targetDate);
-        nextDate.setDate(nextDate.getDate() + 1);
-
-        const serviciosDelDia = serviciosValidos.filter(s => {
-            const fechaInicio = new Date(s.fecha_inicio);
-            return fechaInicio >= targetDate && fechaInicio < nextDate;
-        });
-
-        return {
-            total: serviciosDelDia.length,
-            enReparacion: serviciosDelDia.filter(s => s.estado === 'En Reparación').length,
-            paraRetirar: serviciosDelDia.filter(s => s.estado === 'Para Retirar').length,
-            entregado: serviciosDelDia.filter(s => s.estado === 'Entregado').length
-        };
-    });
-
-    return { labels, dataByDate };
+function getMonthLabels(fechas) {
+    const monthNames = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic'];
+    return fechas.map(fecha => monthNames[Number(fecha.split('-')[1]) - 1]);
 }
 
 /**
- * Group services by month (last 12 months)
+ * Turn a server series (parallel arrays) into chart labels and one object per period
  */
-function processServicesDataByMonth(servicios) {
-    const labels = getLast12MonthsLabels();
-    const last12Months = [];
-
-    for (let i = 11; i >= 0; i--) {
-        const date = new Date();
-        date.setMonth(date.getMonth() - i);
-        date.setDate(1);
-        date.setHours(0, 0, 0, 0);
-        last12Months.push(date);
-    }
-
-    // Filter valid services
-    const serviciosValidos = servicios.filter(s => s.estado !== 'Anulado');
-
-    // Group by month and state
-    const dataByDate = last12Months.map(targetDate => {
-        const nextMonth = new Date(targetDate);
-        nextMonth.setMonth(nextMonth.getMonth() + 1);
-
-        const serviciosDelMes = serviciosValidos.filter(s => {
-            const fechaInicio = new Date(s.fecha_inicio);
-            return fechaInicio >= targetDate && fechaInicio < nextMonth;
-        });
-
-        return {
-            total: serviciosDelMes.length,
-            enReparacion: serviciosDelMes.filter(s => s.estado === 'En Reparación').length,
-            paraRetirar: serviciosDelMes.filter(s => s.estado === 'Para Retirar').length,
-            entregado: serviciosDelMes.filter(s => s.estado === 'Entregado').length
-        };
+function seriesToChartData(serie, view) {
+    const labels = view === 'day' ? getDayLabels(serie.fechas) : getMonthLabels(serie.fechas);
+    const campos = Object.keys(serie).filter(campo => campo !== 'fechas');
+    const dataByDate = serie.fechas.map((_, i) => {
+        const periodo = {};
+        campos.forEach(campo => { periodo[campo] = Number(serie[campo][i]); });
+        return periodo;
     });
-
     return { labels, dataByDate };
 }
 
@@ -431,15 +230,11 @@ function processServicesDataByMonth(servicios) {
  * Render all charts based on current view (day/month)
  */
 function renderAllCharts() {
-    let salesChartData, servicesChartData;
+    if (!cachedResumen) return;
 
-    if (currentChartView === 'day') {
-        salesChartData = processSalesDataForCharts(cachedVentasData);
-        servicesChartData = processServicesDataForCharts(cachedServiciosData);
-    } else {
-        salesChartData = processSalesDataByMonth(cachedVentasData);
-        servicesChartData = processServicesDataByMonth(cachedServiciosData);
-    }
+    const periodo = currentChartView === 'day' ? 'dias' : 'meses';
+    const salesChartData = seriesToChartData(cachedResumen.ventas[periodo], currentChartView);
+    const servicesChartData = seriesToChartData(cachedResumen.servicios[periodo], currentChartView);
 
     createVentasLineChart(salesChartData.labels, salesChartData.dataByDate);
     createVentasBarChart(salesChartData.labels, salesChartData.dataByDate);
@@ -587,14 +382,14 @@ function createServiciosBarChart(labels, data) {
             datasets: [
                 {
                     label: 'En Reparación',
-                    data: data.map(d => d.enReparacion),
+                    data: data.map(d => d.en_reparacion),
                     backgroundColor: 'rgba(54, 162, 235, 0.7)',
                     borderColor: 'rgb(54, 162, 235)',
                     borderWidth: 1
                 },
                 {
                     label: 'Para Retirar',
-                    data: data.map(d => d.paraRetirar),
+                    data: data.map(d => d.para_retirar),
                     backgroundColor: 'rgba(255, 206, 86, 0.7)',
                     borderColor: 'rgb(255, 206, 86)',
                     borderWidth: 1
@@ -12,31 +12,63 @@ let totalPages = 1;
 let searchQuery = '';
 
 /**
- * Load inventory with pagination and search
+ * Carga inicial de la página en una sola llamada (/batch/): inventario, productos
+ * del selector, perfil (RBAC) y sucursales. Antes eran tres cadenas de peticiones.
  */
-async function loadInventario(page = 1) {
+async function cargarInicial() {
     try {
         showLoader();
-        currentPage = page;
+        currentPage = 1;
+        const datos = await apiBatch({
+            inventario: inventarioUrl(1),
+            productos: '/productos/?page_size=10',
+            perfil: '/perfil/',
+            sucursales: '/sucursales/'
+        });
+        mostrarInventario(datos.inventario);
+        mostrarProductosIniciales(datos.productos);
+        aplicarPerfil(datos.perfil);
+        mostrarSucursales(datos.sucursales);
+    } catch (error) {
+        console.error('Error loading initial data:', error);
+        showToast('Error al cargar inventario', 'danger');
+    } finally {
+        hideLoader();
+    }
+}
 
-        let url = `/inventario/?page=${page}`;
-        if (searchQuery) {
-            url += `&search=${encodeURIComponent(searchQuery)}`;
-        }
+function inventarioUrl(page) {
+    let url = `/inventario/?page=${page}`;
+    if (searchQuery) {
+        url += `&search=${encodeURIComponent(searchQuery)}`;
+    }
+    return url;
+}
 
-        const data = await apiGet(url);
+function mostrarInventario(data) {
+    inventarios = data.results || data;
 
-        inventarios = data.results || data;
+    // Calculate pagination if using DRF pagination
+    if (data.count) {
+        totalPages = Math.ceil(data.count / 10); // 10 items per page
+    } else {
+        totalPages = 1;
+    }
 
-        // Calculate pagination if using DRF pagination
-        if (data.count) {
-            totalPages = Math.ceil(data.count / 10); // 10 items per page
-        } else {
-            totalPages = 1;
-        }
+    renderInventarioTable();
+    renderPagination();
+}
+
+/**
+ * Load inventory with pagination and search
+ */
+async function loadInventario(page = 1) {
+    try {
+        showLoader();
+        currentPage = page;
 
-        renderInventarioTable();
-        renderPagination();
+        const data = await apiGet(inventarioUrl(page));
+        mostrarInventario(data);
     } catch (error) {
         console.error('Error loading inventory:', error);
         showToast('Error al cargar inventario', 'danger');
@@ -54,16 +86,18 @@ async function loadProductos() {
     try {
         // Load only 10 initial products
         const data = await apiGet('/productos/?page_size=10');
-        const prods = data.results || data;
-
-        renderProductosList(prods);
-        setupProductoSearch();
+        mostrarProductosIniciales(data);
 
     } catch (error) {
         console.error('Error loading products:', error);
     }
 }
 
+function mostrarProductosIniciales(data) {
+    renderProductosList(data.results || data);
+    setupProductoSearch();
+}
+
 /**
  * Search products on server (Server-Side Search)
  */
@@ -158,36 +192,41 @@ async function loadSucursales() {
     try {
         // 1. Get User Profile first to know role and sucursal
         try {
-            const userProfile = await apiGet('/perfil/');
-            currentUserRole = userProfile.numero_rol;
-
-            // Handle id_sucursal whether it's an object (nested) or ID (PK)
-            if (userProfile.id_sucursal && typeof userProfile.id_sucursal === 'object') {
-                currentUserSucursalId = userProfile.id_sucursal.id_sucursal;
-            } else {
-                currentUserSucursalId = userProfile.id_sucursal;
-            }
-
+            aplicarPerfil(await apiGet('/perfil/'));
         } catch (err) {
             console.error('Error fetching user profile for RBAC:', err);
         }
 
-        const data = await apiGet('/sucursales/');
-        sucursales = data.results || data;
-
-        const select = document.getElementById('idSucursal');
-        select.innerHTML = '<option value="">Seleccione sucursal...</option>';
-        sucursales.forEach(suc => {
-            if (suc.activo) {
-                select.innerHTML += `<option value="${suc.id_sucursal}">${suc.nombre}</option>`;
-            }
-        });
+        mostrarSucursales(await apiGet('/sucursales/'));
 
     } catch (error) {
         console.error('Error loading branches:', error);
     }
 }
 
+function aplicarPerfil(userProfile) {
+    currentUserRole = userProfile.numero_rol;
+
+    // Handle id_sucursal whether it's an object (nested) or ID (PK)
+    if (userProfile.id_sucursal && typeof userProfile.id_sucursal === 'object') {
+        currentUserSucursalId = userProfile.id_sucursal.id_sucursal;
+    } else {
+        currentUserSucursalId = userProfile.id_sucursal;
+    }
+}
+
+function mostrarSucursales(data) {
+    sucursales = data.results || data;
+
+    const select = document.getElementById('idSucursal');
+    select.innerHTML = '<option value="">Seleccione sucursal...</option>';
+    sucursales.forEach(suc => {
+        if (suc.activo) {
+            select.innerHTML += `<option value="${suc.id_sucursal}">${suc.nombre}</option>`;
+        }
+    });
+}
+
 /**
  * Render inventory table
  */
@@ -250,25 +250,35 @@ function renderChart(canvasId, type, labels, datasets, extraOptions = {}) {
 /**
  * Download Handler
  */
-function downloadReport(type) {
+async function downloadReport(type) {
     const fechaDesde = document.getElementById('fechaDesde').value;
     const fechaHasta = document.getElementById('fechaHasta').value;
     const sucursalId = document.getElementById('sucursalSelect').value;
 
     if (!fechaDesde || !fechaHasta) return;
 
-    const baseUrl = type === 'pdf' ? '/reportes/servicios/pdf/' : '/reportes/servicios/excel/';
-    let qParams = `?fecha_desde=${fechaDesde}&fecha_hasta=${fechaHasta}`;
-    if (sucursalId) qParams += `&id_sucursal=${sucursalId}`;
+    // Se genera en la cola de reportes (no bloquea al servidor con rangos grandes)
+    showToast('Generando reporte...', 'info');
+    let trabajo;
+    try {
+        trabajo = await solicitarReporte({
+            tipo: type === 'pdf' ? 'servicios_pdf' : 'servicios_excel',
+            fecha_desde: fechaDesde,
+            fecha_hasta: fechaHasta,
+            ...(sucursalId ? { id_sucursal: sucursalId } : {})
+        });
+    } catch (error) {
+        console.error('Report job error:', error);
+        showToast('Error al generar el reporte', 'error');
+        return;
+    }
 
-    downloadSecurely(`${baseUrl}${qParams}`, `servicios_reporte.${type === 'pdf' ? 'pdf' : 'xlsx'}`);
+    downloadSecurely(`/reportes/jobs/${trabajo.id_trabajo}/descargar/`, `servicios_reporte.${type === 'pdf' ? 'pdf' : 'xlsx'}`);
 }
 
 async function downloadSecurely(endpoint, filename) {
     const token = localStorage.getItem('access_token');
 
-    showToast('Generando reporte...', 'info');
-
     try {
         const response = await fetch(`${API_BASE_URL}${endpoint}`, {
             method: 'GET',
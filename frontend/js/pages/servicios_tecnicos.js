@@ -9,8 +9,15 @@
 let servicios = [];
 let currentPage = 1;
 let totalPages = 1;
+// Paginación por cursor: costo constante aunque la tabla de servicios sea enorme
+const paginasServicios = new PaginasCursor('/servicios_tecnicos/');
+const CAMPOS_TABLA_SERVICIOS = [
+    'id_servicio', 'numero_servicio', 'nombre_cliente', 'marca_dispositivo', 'modelo_dispositivo',
+    'nombre_categoria', 'costo_estimado', 'estado', 'fecha_inicio', 'id_tecnico_asignado', 'nombre_tecnico_asignado',
+].join(',');
 let searchQuery = '';
 let editingId = null;
+let claveIdempotencia = null; // Se conserva entre reintentos del mismo servicio
 
 // Selecciones
 let clienteSeleccionado = null;
@@ -175,29 +182,27 @@ function setupEventListeners() {
 async function loadServicios(page = 1) {
     try {
         showLoader();
-        currentPage = page;
 
-        let url = `/servicios_tecnicos/?page=${page}`;
+        // Solo las columnas de la tabla (?fields=): editar y ver detalle piden el servicio completo
+        let filtros = `&fields=${CAMPOS_TABLA_SERVICIOS}`;
         if (searchQuery) {
-            url += `&search=${encodeURIComponent(searchQuery)}`;
+            filtros += `&search=${encodeURIComponent(searchQuery)}`;
         }
 
         // Filtro por técnico asignado (vista "Mis Servicios")
         if (vistaActual === 'mios') {
             const userId = localStorage.getItem('user_id_usuario');
             if (userId) {
-                url += `&id_tecnico_asignado=${userId}`;
+                filtros += `&id_tecnico_asignado=${userId}`;
             }
         }
 
-        const data = await apiGet(url);
+        const data = await paginasServicios.cargar(page, filtros);
+        currentPage = data.page;
         servicios = data.results || [];
 
-        if (data.count) {
-            totalPages = Math.ceil(data.count / 10);
-        } else {
-            totalPages = 1;
-        }
+        // El total viene cacheado: si hay `next`, siempre existe la página siguiente
+        totalPages = Math.max(Math.ceil((data.count || 0) / 10), data.next ? currentPage + 1 : currentPage);
 
         renderServiciosTable();
         renderPagination();
@@ -310,6 +315,7 @@ function renderPagination() {
 // ============================================
 function mostrarNuevoServicio() {
     editingId = null;
+    claveIdempotencia = null;
     resetFormulario();
 
     document.getElementById('vistaListaServicios').style.display = 'none';
@@ -486,8 +492,7 @@ async function searchClientes(term) {
     }
 
     try {
-        const response = await apiGet(`/clientes/?search=${encodeURIComponent(term)}`);
-        const clientes = response.results || [];
+        const clientes = await apiAutocompletar('clientes', term);
         renderClienteResultados(clientes);
     } catch (error) {
         console.error('Error buscando clientes:', error);
@@ -727,7 +732,8 @@ async function guardarServicio() {
             result = await apiPatchFormData(`/servicios_tecnicos/${editingId}/`, formData);
             showToast('Servicio actualizado correctamente', 'success');
         } else {
-            result = await apiPostFormData('/servicios_tecnicos/', formData);
+            claveIdempotencia = claveIdempotencia || nuevaClaveIdempotencia();
+            result = await apiPostFormData('/servicios_tecnicos/', formData, claveIdempotencia);
             showToast(`Servicio ${result.numero_servicio} creado correctamente`, 'success');
         }
 
@@ -16,16 +16,17 @@ document.addEventListener('DOMContentLoaded', () => {
 });
 
 /**
- * Load initial data (Roles and Sucursales catalogs first, then Users)
+ * Load initial data (Roles, Sucursales and first page of Users) in one /batch/ call
  */
 async function loadInitialData() {
     showLoading();
     try {
-        // Load catalogs concurrently
-        const [rolesRes, sucursalesRes] = await Promise.all([
-            apiGet('/roles/'),
-            apiGet('/sucursales/')
-        ]);
+        // Catálogos y primera página de usuarios en una sola llamada
+        const { roles: rolesRes, sucursales: sucursalesRes, usuarios } = await apiBatch({
+            roles: '/roles/',
+            sucursales: '/sucursales/',
+            usuarios: usuariosUrl(1)
+        });
 
         // Handle pagination results if present in catalogs
         rolesCache = Array.isArray(rolesRes) ? rolesRes : (rolesRes.results || []);
@@ -34,15 +35,34 @@ async function loadInitialData() {
         // Populate modal selects
         populateSelects();
 
-        // Now load users
-        loadUsuarios();
+        mostrarUsuarios(usuarios, 1);
 
     } catch (error) {
         console.error('Error loading catalogs:', error);
         showToast('Error al cargar datos iniciales. Verifique su conexión.', 'error');
+    } finally {
+        hideLoading();
     }
 }
 
+function usuariosUrl(page) {
+    return `/usuarios/?page=${page}&page_size=${ITEMS_PER_PAGE}&incluir_inactivos=true`;
+}
+
+/**
+ * Render a page of users (DRF paginated response)
+ */
+function mostrarUsuarios(response, page) {
+    const results = response.results ? response.results : response;
+    const count = response.count ? response.count : results.length;
+
+    totalPages = Math.ceil(count / ITEMS_PER_PAGE);
+    currentPage = page;
+
+    renderTable(results);
+    renderPagination(count);
+}
+
 /**
  * Load Users from API with pagination
  * @param {number} page - Page number to load
@@ -52,18 +72,8 @@ async function loadUsuarios(page = 1) {
     if (page !== currentPage) showLoadingTable(); // Use a lighter loading indicator for pagination if preferred
 
     try {
-        const response = await apiGet(`/usuarios/?page=${page}&page_size=${ITEMS_PER_PAGE}&incluir_inactivos=true`);
-
-        // Handle DRF pagination
-        const results = response.results ? response.results : response;
-        const count = response.count ? response.count : results.length;
-
-        totalPages = Math.ceil(count / ITEMS_PER_PAGE);
-        currentPage = page;
-
-        renderTable(results);
-        renderPagination(count);
-
+        const response = await apiGet(usuariosUrl(page));
+        mostrarUsuarios(response, page);
     } catch (error) {
         console.error('Error loading users:', error);
         showToast('Error al cargar usuarios', 'error');
@@ -7,12 +7,16 @@
 let ventas = [];
 let currentPage = 1;
 let totalPages = 1;
+// Paginación por cursor: costo constante aunque la tabla de ventas sea enorme
+const paginasVentas = new PaginasCursor('/ventas/');
+const CAMPOS_TABLA_VENTAS = 'id_venta,numero_boleta,nombre_cliente,fecha_venta,total_venta,tipo_pago,estado';
 let searchQuery = '';
 
 // Nueva Venta
 let clienteSeleccionado = null;
 let carrito = []; // [{ id_producto, nombre_producto, precio, cantidad }]
 let metodoPago = 'Efectivo';
+let claveIdempotencia = null; // Se conserva entre reintentos de la misma venta
 
 // Debounce timers
 let searchClienteTimeout = null;
@@ -28,22 +32,20 @@ let searchProductoTimeout = null;
 async function loadVentas(page = 1) {
     try {
         showLoader();
-        currentPage = page;
 
-        let url = `/ventas/?page=${page}`;
+        // Solo las columnas de la tabla (?fields=): el detalle se pide aparte
+        let filtros = `&fields=${CAMPOS_TABLA_VENTAS}`;
         if (searchQuery) {
-            url += `&search=${encodeURIComponent(searchQuery)}`;
+            filtros += `&search=${encodeURIComponent(searchQuery)}`;
         }
 
-        const data = await apiGet(url);
+        const data = await paginasVentas.cargar(page, filtros);
+        currentPage = data.page;
 
         ventas = data.results || data;
 
-        if (data.count) {
-            totalPages = Math.ceil(data.count / 10);
-        } else {
-            totalPages = 1;
-        }
+        // El total viene cacheado: si hay `next`, siempre existe la página siguiente
+        totalPages = Math.max(Math.ceil((data.count || 0) / 10), data.next ? currentPage + 1 : currentPage);
 
         renderVentasTable();
         renderPagination();
@@ -247,6 +249,7 @@ function resetNuevaVenta() {
     clienteSeleccionado = null;
     carrito = [];
     metodoPago = 'Efectivo';
+    claveIdempotencia = null;
 
     document.getElementById('searchClienteInput').value = '';
     document.getElementById('clienteResultados').style.display = 'none';
@@ -275,8 +278,7 @@ async function searchClientes(term) {
     }
 
     try {
-        const data = await apiGet(`/clientes/?search=${encodeURIComponent(term)}`);
-        const clientes = data.results || data;
+        const clientes = await apiAutocompletar('clientes', term);
         renderClienteResultados(clientes);
     } catch (error) {
         console.error('Error searching clients:', error);
@@ -383,14 +385,42 @@ async function searchProductos(term) {
     }
 
     try {
-        const data = await apiGet(`/productos/?search=${encodeURIComponent(term)}`);
-        const productos = data.results || data;
+        const productos = await apiAutocompletar('productos', term);
         renderProductoResultados(productos);
     } catch (error) {
         console.error('Error searching products:', error);
     }
 }
 
+/**
+ * Escaneo de código de barras (Enter): búsqueda exacta en el índice del backend.
+ * Si el código existe agrega el producto directo al carrito; si no, cae a la búsqueda normal.
+ */
+async function escanearCodigo(codigo) {
+    if (!codigo || /\s/.test(codigo)) {
+        searchProductos(codigo);
+        return;
+    }
+
+    clearTimeout(searchProductoTimeout);
+    try {
+        const producto = await apiGet(`/productos/barcode/${encodeURIComponent(codigo)}/`);
+        if (producto.cantidad === null || producto.cantidad <= 0) {
+            showToast(`"${producto.nombre_producto}" sin stock en esta sucursal`, 'warning');
+            return;
+        }
+        agregarProductoCarrito(producto);
+        document.getElementById('searchProductoInput').value = '';
+        document.getElementById('productoResultados').innerHTML = '';
+    } catch (error) {
+        if (error.response?.status === 404) {
+            searchProductos(codigo);
+        } else {
+            console.error('Error scanning barcode:', error);
+        }
+    }
+}
+
 /**
  * Renderizar resultados de búsqueda de productos
  */
@@ -559,46 +589,31 @@ async function confirmarVenta() {
     try {
         showLoader();
 
-        // 1. Crear la venta
+        // Venta completa en una sola petición (cabecera + detalles + stock, atómico en backend)
         const ventaData = {
             id_cliente: clienteSeleccionado.id_cliente,
-            total_venta: calcularTotal(),
-            tipo_pago: metodoPago
+            tipo_pago: metodoPago,
+            items: carrito.map(item => ({
+                id_producto: item.id_producto,
+                cantidad: item.cantidad,
+                precio_venta: item.precio
+            }))
         };
 
-        const ventaCreada = await apiPost('/ventas/', ventaData);
-
-        // 2. Crear los detalles de venta (con validación de stock en backend)
-        let detallesCreados = 0;
-        for (const item of carrito) {
-            try {
-                await apiPost('/detalle_ventas/', {
-                    id_venta: ventaCreada.id_venta,
-                    id_producto: item.id_producto,
-                    cantidad: item.cantidad,
-                    precio_venta: item.precio
-                });
-                detallesCreados++;
-            } catch (detalleError) {
-                // Si falla un detalle, mostrar error específico de stock
-                const errorMsg = detalleError.response?.data?.cantidad ||
-                    detalleError.response?.data?.id_producto ||
-                    'Error al agregar producto';
-
-                showToast(errorMsg, 'danger');
-
-                // Si no se creó ningún detalle, eliminar la venta huérfana
-                if (detallesCreados === 0) {
-                    try {
-                        await apiDelete(`/ventas/${ventaCreada.id_venta}/`);
-                    } catch (e) {
-                        console.error('Error cleaning up orphan sale:', e);
-                    }
-                }
-
-                hideLoader();
-                return;
-            }
+        let ventaCreada;
+        try {
+            // Misma clave en cada reintento: si el primer intento sí llegó, no se duplica la venta
+            claveIdempotencia = claveIdempotencia || nuevaClaveIdempotencia();
+            ventaCreada = await apiPost('/ventas/checkout/', ventaData, claveIdempotencia);
+        } catch (checkoutError) {
+            // Mostrar error específico de stock (el backend no deja ventas huérfanas)
+            const itemsError = checkoutError.response?.data?.items;
+            const errorMsg = Array.isArray(itemsError)
+                ? itemsError.map(e => e.error || JSON.stringify(e)).join(' | ')
+                : (checkoutError.response?.data?.detail || 'Error al crear la venta');
+
+            showToast(errorMsg, 'danger');
+            return;
         }
 
         showToast(`Venta ${ventaCreada.numero_boleta} creada exitosamente`, 'success');
@@ -648,6 +663,14 @@ document.addEventListener('DOMContentLoaded', () => {
                 searchProductos(e.target.value.trim());
             }, 300);
         });
+
+        // Los lectores de código de barras envían Enter al final del código
+        searchProductoInput.addEventListener('keydown', (e) => {
+            if (e.key === 'Enter') {
+                e.preventDefault();
+                escanearCodigo(e.target.value.trim());
+            }
+        });
     }
 });
 